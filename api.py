@@ -0,0 +1,611 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import json
+import hashlib
+from datetime import datetime, timedelta, timezone
+from flask import Blueprint, Response, request, current_app, url_for
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import NoResultFound
+from werkzeug.exceptions import BadRequest, NotFound, Conflict
+try:
+    import orjson
+except ImportError:
+    orjson = None
+from models import db, Venue, Artist, Show, TableVersion
+from queries import (decode_cursor, page_size, keyset_page, row_dict,
+                     venue_detail, artist_detail, show_listing)
+from search import search
+from browse import browse_filters, browse_query, facets
+from importer import FIELDS, validate, InvalidRecord, timestamp
+from counters import count_new_shows
+from schedule import (expand, schedule_shows, InvalidSchedule,
+                      ScheduleConflict)
+from bookings import booking_conflict, conflicts, booked, free_slots
+from recommend import recommended_artists, recommended_venues
+from formatting import zone
+from cache import cache
+from replicas import read_replica
+#----------------------------------------------------------------------------#
+# JSON API, version 1.
+#
+# Mirrors the pages: list, detail, search, genre browse and create for
+# venues, artists and shows under /api/v1, plus recurring show schedules
+# (POST /shows/schedule), venue / artist availability, their calendars as
+# JSON or iCalendar, and their recommendations. A double booking is a 409.
+# Lists are keyset paginated (limit / after / before cursors, as on the
+# pages), and ?fields=a,b selects the fields of each item.
+#
+# Every GET carries an ETag made from the request and the versions of the
+# tables it reads (table_version, bumped by a trigger on each write), plus,
+# for detail responses, the start of the next upcoming show, when the
+# upcoming / past split changes by itself. A matching If-None-Match gets a
+# 304 after that one small read, before any data query or serialization,
+# and serialized bodies are cached under their ETag.
+#----------------------------------------------------------------------------#
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def encode(value):
+    # what JSON lacks: datetimes as ISO 8601, durations in minutes
+    if isinstance(value, timedelta):
+        return int(value.total_seconds() // 60)
+    return value.isoformat()
+
+
+def dumps(data):
+    # compact JSON bytes; orjson when installed (optional dependency)
+    if orjson is not None:
+        return orjson.dumps(data, default=encode)
+    return json.dumps(data, separators=(',', ':'), default=encode).encode()
+
+
+# by code: the app's own 400 / 404 / 405 / 500 pages would win otherwise
+@api.errorhandler(400)
+@api.errorhandler(404)
+@api.errorhandler(405)
+@api.errorhandler(409)
+@api.errorhandler(500)
+def api_error(error):
+    return Response(dumps({"error": error.description}), error.code,
+                    mimetype='application/json')
+
+#----------------------------------------------------------------------------#
+# ETags and responses.
+#----------------------------------------------------------------------------#
+
+
+def table_versions(*tables):
+    # [(table, version)]: each table's slots summed
+    return sorted(db.session.query(
+        TableVersion.table_name, db.func.sum(TableVersion.version)).filter(
+            TableVersion.table_name.in_(tables)).group_by(
+                TableVersion.table_name).all())
+
+
+def make_etag(*parts):
+    # the request (path, query string) and `parts` hashed into an ETag
+    digest = hashlib.sha1(request.full_path.encode())
+    for part in parts:
+        digest.update(repr(part).encode())
+    return digest.hexdigest()[:20]
+
+
+def next_show_start(column, entity_id, timenow):
+    # when the upcoming / past split of a venue or artist next changes
+    return db.session.query(db.func.min(Show.start_time)).filter(
+        column == entity_id, Show.start_time > timenow).scalar()
+
+
+def conditional(etag, build, status=200, serialize=dumps,
+                mimetype='application/json'):
+    # 304 if the client has `etag`, else build() serialized (cached under
+    # the ETag, so repeat unconditional polls skip the queries too)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        body = cache.get_or_set(['api'], etag, lambda: serialize(build()))
+        response = Response(body, status, mimetype=mimetype)
+    response.set_etag(etag)
+    # clients may keep the response but must revalidate it
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def created(data, location):
+    response = Response(dumps(data), 201, mimetype='application/json')
+    response.headers['Location'] = location
+    return response
+
+
+def select_fields(items, allowed):
+    # keep the ?fields= of every item; unknown names are a 400
+    fields = request.args.get('fields')
+    if not fields:
+        return items
+    fields = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = set(fields) - set(allowed)
+    if unknown:
+        raise BadRequest(f'Unknown fields: {", ".join(sorted(unknown))}')
+    return [{field: item[field] for field in fields} for item in items]
+
+
+def api_page(query, keys, *types):
+    # one keyset page from the limit / after / before query arguments
+    return keyset_page(
+        query, keys,
+        page_size(request.args.get('limit'),
+                  current_app.config['LISTING_PAGE_SIZE']),
+        after=decode_cursor(request.args.get('after'), *types),
+        before=decode_cursor(request.args.get('before'), *types))
+
+
+def listing(items, pager, allowed):
+    return {"data": select_fields(items, allowed), "next": pager["next"],
+            "prev": pager["prev"], "limit": pager["limit"]}
+
+
+def json_body():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise BadRequest('Expected a JSON object')
+    return data
+
+
+def insert(model, table, data):
+    # a new `model` row from a JSON object checked against the importer's
+    # field rules (the id is assigned by the database)
+    columns = [column for column in FIELDS[table]
+               if column != 'id' and (column in data or
+                                      FIELDS[table][column][1])]
+    try:
+        row = validate(data, FIELDS[table], columns)
+    except InvalidRecord as error:
+        raise BadRequest(str(error))
+    instance = model(**dict(zip(columns, row)))
+    db.session.add(instance)
+    try:
+        db.session.flush()
+    except IntegrityError as error:
+        db.session.rollback()
+        conflict = booking_conflict(error)
+        if conflict is not None:
+            raise Conflict(conflict)
+        raise BadRequest('Violates a constraint (unknown venue or artist?)')
+    return instance
+
+
+ENTITY_FIELDS = {
+    'venues': [column.name for column in Venue.__table__.columns],
+    'artists': [column.name for column in Artist.__table__.columns],
+}
+SHOW_FIELDS = ['id', 'start_time', 'venue_id', 'venue_name', 'artist_id',
+               'artist_name', 'artist_image_link']
+SEARCH_FIELDS = ['id', 'name', 'city', 'state', 'num_upcoming_shows', 'rank']
+BROWSE_FIELDS = ['id', 'name', 'city', 'state', 'genres', 'num_upcoming_shows']
+
+#----------------------------------------------------------------------------#
+# Venues and artists.
+#----------------------------------------------------------------------------#
+
+
+def entity_list(model, table, keys, *types):
+    def build():
+        rows, pager = api_page(model.query, keys, *types)
+        return listing([row_dict(row) for row in rows], pager,
+                       ENTITY_FIELDS[table])
+    return conditional(make_etag(table_versions(table)), build)
+
+
+def entity_detail(column, entity_id, detail, tables):
+    timenow = datetime.now()
+
+    def build():
+        try:
+            data = detail(
+                entity_id, timenow, current_app.config['DETAIL_SHOWS_LIMIT'],
+                decode_cursor(request.args.get('past_before'),
+                              datetime.fromisoformat, int))
+        except NoResultFound:
+            raise NotFound(f'No such id {entity_id}')
+        return select_fields([data], data)[0]
+    return conditional(make_etag(table_versions(*tables),
+                                 next_show_start(column, entity_id, timenow)),
+                       build)
+
+
+def entity_search(model, table):
+    def build():
+        rows, next_cursor = search(
+            model, request.args.get('q', ''),
+            page_size(request.args.get('limit'),
+                      current_app.config['SEARCH_PAGE_SIZE']),
+            request.args.get('cursor'))
+        return {"data": select_fields([row._asdict() for row in rows],
+                                      SEARCH_FIELDS),
+                "next": next_cursor}
+    return conditional(make_etag(table_versions(table)), build)
+
+
+def entity_browse(model, table):
+    # ?genre=Jazz&genre=...&match=all|any&city=&state=&upcoming=1: a page
+    # of the matches by name, and the genre counts over all of them
+    try:
+        filters = browse_filters(request.args)
+    except ValueError as error:
+        raise BadRequest(str(error))
+
+    def build():
+        rows, pager = api_page(browse_query(model, filters),
+                               [model.name, model.id], str, int)
+        data = listing([row._asdict() for row in rows], pager, BROWSE_FIELDS)
+        data["facets"] = [{"genre": genre, "count": count}
+                          for genre, count in facets(model, filters)]
+        return data
+    return conditional(make_etag(table_versions(table)), build)
+
+
+@api.route('/venues')
+@read_replica
+def venues():
+    return entity_list(Venue, 'venues', [Venue.id], int)
+
+
+@api.route('/venues/search')
+@read_replica
+def search_venues():
+    return entity_search(Venue, 'venues')
+
+
+@api.route('/venues/browse')
+@read_replica
+def browse_venues():
+    return entity_browse(Venue, 'venues')
+
+
+@api.route('/venues/<int:venue_id>')
+@read_replica
+def venue(venue_id):
+    return entity_detail(Show.venue_id, venue_id, venue_detail,
+                         ('venues', 'artists', 'show'))
+
+
+@api.route('/venues', methods=['POST'])
+def create_venue():
+    venue = insert(Venue, 'venues', json_body())
+    db.session.commit()
+    cache.invalidate('venues')
+    return created(row_dict(venue), url_for('api.venue', venue_id=venue.id))
+
+
+@api.route('/artists')
+@read_replica
+def artists():
+    return entity_list(Artist, 'artists', [Artist.name, Artist.id], str, int)
+
+
+@api.route('/artists/search')
+@read_replica
+def search_artists():
+    return entity_search(Artist, 'artists')
+
+
+@api.route('/artists/browse')
+@read_replica
+def browse_artists():
+    return entity_browse(Artist, 'artists')
+
+
+@api.route('/artists/<int:artist_id>')
+@read_replica
+def artist(artist_id):
+    return entity_detail(Show.artist_id, artist_id, artist_detail,
+                         ('venues', 'artists', 'show'))
+
+
+@api.route('/artists', methods=['POST'])
+def create_artist():
+    artist = insert(Artist, 'artists', json_body())
+    db.session.commit()
+    cache.invalidate('artists')
+    return created(row_dict(artist),
+                   url_for('api.artist', artist_id=artist.id))
+
+#----------------------------------------------------------------------------#
+# Shows.
+#----------------------------------------------------------------------------#
+
+
+@api.route('/shows')
+@read_replica
+def shows():
+    def build():
+        rows, pager = api_page(show_listing(), [Show.start_time, Show.id],
+                               datetime.fromisoformat, int)
+        return listing([
+            {
+                "id": row.id,
+                "start_time": row.start_time,
+                "venue_id": row.venue_id,
+                "venue_name": row.venue_name,
+                "artist_id": row.artist_id,
+                "artist_name": row.artist_name,
+                "artist_image_link": row.image_link,
+            }
+            for row in rows
+        ], pager, SHOW_FIELDS)
+    return conditional(
+        make_etag(table_versions('venues', 'artists', 'show')), build)
+
+
+@api.route('/shows/<int:show_id>')
+@read_replica
+def show(show_id):
+    def build():
+        row = show_listing().filter(Show.id == show_id).first()
+        if row is None:
+            raise NotFound(f'No such id {show_id}')
+        return select_fields([{
+            "id": row.id,
+            "start_time": row.start_time,
+            "venue_id": row.venue_id,
+            "venue_name": row.venue_name,
+            "artist_id": row.artist_id,
+            "artist_name": row.artist_name,
+            "artist_image_link": row.image_link,
+        }], SHOW_FIELDS)[0]
+    return conditional(
+        make_etag(table_versions('venues', 'artists', 'show')), build)
+
+
+@api.route('/shows', methods=['POST'])
+def create_show():
+    show = insert(Show, 'show', json_body())
+    count_new_shows([show])
+    db.session.commit()
+    cache.invalidate(f'venue:{show.venue_id}', f'artist:{show.artist_id}',
+                     'venues', 'shows')
+    return created(row_dict(show), url_for('api.show', show_id=show.id))
+
+
+@api.route('/shows/schedule', methods=['POST'])
+def create_schedule():
+    # {"venue_id", "artist_id", "recurrence": "weekly" | "dates" | "rrule",
+    #  "start_time", "count", "until", "interval", "dates", "rrule",
+    #  "duration" (minutes)}
+    data = json_body()
+    try:
+        starts = expand(data.get('recurrence'),
+                        start_time=data.get('start_time'),
+                        count=data.get('count'), until=data.get('until'),
+                        interval=data.get('interval'),
+                        dates=data.get('dates'), rule=data.get('rrule'))
+        shows = schedule_shows(data.get('venue_id'), data.get('artist_id'),
+                               starts, data.get('duration'))
+    except ScheduleConflict as error:
+        db.session.rollback()
+        raise Conflict(str(error))
+    except InvalidSchedule as error:
+        db.session.rollback()
+        raise BadRequest(str(error))
+    db.session.commit()
+    cache.invalidate(f'venue:{shows[0].venue_id}',
+                     f'artist:{shows[0].artist_id}', 'venues', 'shows')
+    return Response(dumps({
+        "count": len(shows),
+        "data": [{"id": show.id, "start_time": show.start_time}
+                 for show in shows],
+    }), 201, mimetype='application/json')
+
+#----------------------------------------------------------------------------#
+# Availability.
+#----------------------------------------------------------------------------#
+
+
+def availability(column, entity_id):
+    # is the venue / artist free over [start, end)? One probe of the
+    # double-booking constraint's index (bookings.py)
+    try:
+        start = timestamp(request.args['start'])
+        end = timestamp(request.args['end'])
+    except (KeyError, ValueError):
+        raise BadRequest('start and end must be ISO 8601 times')
+    if end <= start:
+        raise BadRequest('end must be after start')
+
+    def build():
+        shows = conflicts(column, entity_id, start, end).all()
+        return {"free": not shows, "start": start, "end": end,
+                "conflicts": [{"id": show.id, "start_time": show.start_time,
+                               "end_time": show.end_time}
+                              for show in shows]}
+    return conditional(make_etag(table_versions('show')), build)
+
+
+@api.route('/venues/<int:venue_id>/availability')
+@read_replica
+def venue_availability(venue_id):
+    return availability(Show.venue_id, venue_id)
+
+
+@api.route('/artists/<int:artist_id>/availability')
+@read_replica
+def artist_availability(artist_id):
+    return availability(Show.artist_id, artist_id)
+
+
+#----------------------------------------------------------------------------#
+# Calendars.
+#
+#   /venues/<id>/calendar?month=2030-01        booked and free slots, JSON
+#   /venues/<id>/calendar.ics?start=...&end=...  the same as iCalendar
+#
+# and likewise for artists. The window is ?month (default: this month) or
+# ?start / ?end, at most CALENDAR_MAX_DAYS; bookings.booked() reads it from
+# the (venue_id, start_time) / (artist_id, start_time) index, a cost set by
+# the window, not by the venue's history. In iCalendar each show is a
+# VEVENT and the window a VFREEBUSY, all in UTC.
+#----------------------------------------------------------------------------#
+
+ICAL_TIME = '%Y%m%dT%H%M%SZ'
+
+
+def calendar_window():
+    # [start, end) of the request's calendar
+    if 'start' in request.args or 'end' in request.args:
+        try:
+            start = timestamp(request.args['start'])
+            end = timestamp(request.args['end'])
+        except (KeyError, ValueError):
+            raise BadRequest('start and end must be ISO 8601 times')
+    else:
+        month = request.args.get('month') or datetime.now().strftime('%Y-%m')
+        try:
+            start = datetime.strptime(month, '%Y-%m')
+        except ValueError:
+            raise BadRequest('month must be YYYY-MM')
+        end = (start + timedelta(days=32)).replace(day=1)
+    if end <= start:
+        raise BadRequest('end must be after start')
+    longest = current_app.config['CALENDAR_MAX_DAYS']
+    if end - start > timedelta(days=longest):
+        raise BadRequest(f'the window may span at most {longest} days')
+    return start, end
+
+
+def calendar(model, column, entity_id, other, ical=False):
+    # the calendar of venue / artist `entity_id`; `other` is the model
+    # on the other side of its shows
+    start, end = calendar_window()
+    other_key = 'artist_id' if other is Artist else 'venue_id'
+
+    def build():
+        entity = db.session.query(model.name).filter(
+            model.id == entity_id).first()
+        if entity is None:
+            raise NotFound(f'No such id {entity_id}')
+        rows = booked(column, entity_id, start, end, other.name)
+        return {"id": entity_id, "name": entity.name,
+                "start": start, "end": end,
+                "booked": [{"id": show.id, other_key: getattr(show, other_key),
+                            "name": name, "start_time": show.start_time,
+                            "end_time": show.end_time,
+                            "duration": show.duration}
+                           for show, name in rows],
+                "free": [{"start": slot.start, "end": slot.end}
+                         for slot in free_slots(
+                             [show for show, _ in rows], start, end)]}
+    # the window is part of the ETag: a default month changes by itself
+    etag = make_etag(table_versions('venues', 'artists', 'show'), start, end)
+    if ical:
+        return conditional(etag, build, serialize=ical_calendar,
+                           mimetype='text/calendar')
+    return conditional(etag, build)
+
+
+def ical_text(value):
+    # a TEXT value, escaped (RFC 5545 3.3.11)
+    return str(value).replace('\\', '\\\\').replace(';', '\\;').replace(
+        ',', '\\,').replace('\n', '\\n')
+
+
+def ical_line(line):
+    # a content line folded into 75-octet lines (RFC 5545 3.1), never
+    # inside a UTF-8 sequence
+    encoded = line.encode()
+    lines = []
+    while len(encoded) > 75:
+        cut = 75 if not lines else 74
+        while encoded[cut] & 0xC0 == 0x80:
+            cut -= 1
+        lines.append(encoded[:cut])
+        encoded = encoded[cut:]
+    lines.append(encoded)
+    return b'\r\n '.join(lines)
+
+
+def ical_calendar(data):
+    # a calendar() as an iCalendar (RFC 5545) document
+    source = zone(current_app.config['SHOW_TIMEZONE'])
+
+    def utc(moment):
+        return source.localize(moment).astimezone(
+            timezone.utc).strftime(ICAL_TIME)
+
+    host = request.host
+    stamp = datetime.now(timezone.utc).strftime(ICAL_TIME)
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//Fyyur//Calendar//EN',
+             'CALSCALE:GREGORIAN', f'X-WR-CALNAME:{ical_text(data["name"])}']
+    for show in data['booked']:
+        lines += ['BEGIN:VEVENT', f'UID:show-{show["id"]}@{host}',
+                  f'DTSTAMP:{stamp}', f'DTSTART:{utc(show["start_time"])}',
+                  f'DTEND:{utc(show["end_time"])}',
+                  f'SUMMARY:{ical_text(show["name"])}', 'TRANSP:OPAQUE',
+                  'END:VEVENT']
+    lines += ['BEGIN:VFREEBUSY',
+              f'UID:{request.path}-{utc(data["start"])}@{host}',
+              f'DTSTAMP:{stamp}', f'DTSTART:{utc(data["start"])}',
+              f'DTEND:{utc(data["end"])}']
+    lines += [f'FREEBUSY;FBTYPE=BUSY:{utc(show["start_time"])}/'
+              f'{utc(show["end_time"])}' for show in data['booked']
+              if show['duration'] > timedelta(0)]
+    lines += [f'FREEBUSY;FBTYPE=FREE:{utc(slot["start"])}/{utc(slot["end"])}'
+              for slot in data['free']]
+    lines += ['END:VFREEBUSY', 'END:VCALENDAR']
+    return b'\r\n'.join(ical_line(line) for line in lines) + b'\r\n'
+
+
+@api.route('/venues/<int:venue_id>/calendar')
+@read_replica
+def venue_calendar(venue_id):
+    return calendar(Venue, Show.venue_id, venue_id, Artist)
+
+
+@api.route('/venues/<int:venue_id>/calendar.ics')
+@read_replica
+def venue_calendar_ics(venue_id):
+    return calendar(Venue, Show.venue_id, venue_id, Artist, ical=True)
+
+
+@api.route('/artists/<int:artist_id>/calendar')
+@read_replica
+def artist_calendar(artist_id):
+    return calendar(Artist, Show.artist_id, artist_id, Venue)
+
+
+@api.route('/artists/<int:artist_id>/calendar.ics')
+@read_replica
+def artist_calendar_ics(artist_id):
+    return calendar(Artist, Show.artist_id, artist_id, Venue, ical=True)
+
+#----------------------------------------------------------------------------#
+# Recommendations.
+#
+# The rows `flask compute-recommendations` stored (recommend.py), read by
+# index; the ETag follows the recommendation table, rewritten by each run.
+#----------------------------------------------------------------------------#
+
+
+def entity_recommendations(model, entity_id, recommended, tables):
+    def build():
+        if db.session.query(model.id).filter(
+                model.id == entity_id).first() is None:
+            raise NotFound(f'No such id {entity_id}')
+        return {"data": [row._asdict() for row in recommended(entity_id)]}
+    return conditional(make_etag(table_versions(*tables)), build)
+
+
+@api.route('/venues/<int:venue_id>/recommendations')
+@read_replica
+def venue_recommendations(venue_id):
+    return entity_recommendations(Venue, venue_id, recommended_artists,
+                                  ('recommendation', 'artists'))
+
+
+@api.route('/artists/<int:artist_id>/recommendations')
+@read_replica
+def artist_recommendations(artist_id):
+    return entity_recommendations(Artist, artist_id, recommended_venues,
+                                  ('recommendation', 'venues'))
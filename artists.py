@@ -0,0 +1,267 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import sys
+from datetime import datetime
+from flask import (Blueprint, render_template, request, current_app, flash,
+                   redirect, url_for, abort)
+from sqlalchemy.orm.exc import NoResultFound
+from werkzeug.exceptions import BadRequest, MethodNotAllowed
+from models import db, Artist
+from forms import ArtistForm
+from queries import page_size, decode_cursor, artist_detail
+from search import search
+from browse import known_genres
+from cache import cache
+from replicas import read_replica, replica_cache_ttl
+from pages import paginate, browse, recommendations, invalidate_artist
+from recommend import recommended_venues
+#----------------------------------------------------------------------------#
+# Artist pages: listing, search, detail, create, edit and delete.
+#----------------------------------------------------------------------------#
+
+bp = Blueprint('artists', __name__)
+
+
+@bp.route('/artists')
+@read_replica
+def artists():
+    try:
+        def artist_page():
+            # one page of artist (id, name) rows, ordered by name
+            artists, pager = paginate(
+                db.session.query(Artist.id, Artist.name),
+                [Artist.name, Artist.id], str, int)
+            return [
+                {
+                    "id": artist.id,
+                    "name": artist.name
+                }
+                for artist in artists
+            ], pager
+        data, pager = cache.get_or_set(
+            ['artists'], request.query_string.decode(), artist_page,
+            ttl=replica_cache_ttl())
+    except BadRequest:
+        abort(400)
+    return render_template('pages/artists.html', artists=data, pager=pager)
+
+
+# Search Artist
+@bp.route('/artists/search', methods=['GET', 'POST'])
+@read_replica
+def search_artists():
+    try:
+        # get value from searchbox (GET for the next-page links)
+        search_term = request.values.get('search_term', '')
+        # ranked, paginated search by name, city, state and genre
+        artists, next_cursor = search(
+            Artist, search_term,
+            page_size(request.values.get('limit'),
+                      current_app.config['SEARCH_PAGE_SIZE']),
+            request.values.get('cursor'))
+        response = {
+            "count": len(artists),
+            "next_cursor": next_cursor,
+            "data": [
+                {
+                    "id": artist.id,
+                    "name": artist.name,
+                    "num_upcoming_shows": artist.num_upcoming_shows,
+                }
+                for artist in artists
+            ]
+        }
+        # error Method Not Allowed
+    except MethodNotAllowed as mt:
+        abort(405)
+    except BadRequest:
+        abort(400)
+    except Exception as e:
+        flash(f'Error: {str(sys.exc_info()[0])}')
+    return render_template('pages/search_artists.html',
+                           results=response, search_term=search_term)
+
+
+# artists by genre, city / state and upcoming shows, with genre counts
+@bp.route('/artists/browse')
+@read_replica
+def browse_artists():
+    return browse(Artist, 'artists')
+
+
+# Show Artist data by id
+@bp.route('/artists/<int:artist_id>')
+@read_replica
+def show_artist(artist_id):
+    # shows the artist page with the given artist_id
+    try:
+        past_before = request.args.get('past_before')
+        data = cache.get_or_set(
+            [f'artist:{artist_id}'], f'detail:{past_before}',
+            lambda: artist_detail(
+                artist_id, datetime.now(), current_app.config['DETAIL_SHOWS_LIMIT'],
+                decode_cursor(past_before, datetime.fromisoformat, int)),
+            ttl=replica_cache_ttl())
+    # error handling
+    except NoResultFound:
+        abort(404)
+    except BadRequest:
+        abort(400)
+    except Exception as e:
+        flash(f'Error: {str(sys.exc_info()[0])}')
+    return render_template('pages/show_artist.html', artist=data)
+
+
+# venues seeking talent, best matches first (`flask
+# compute-recommendations` scores them)
+@bp.route('/artists/<int:artist_id>/recommendations')
+@read_replica
+def artist_recommendations(artist_id):
+    return recommendations(Artist, artist_id, 'artist', recommended_venues)
+
+
+# Delete Artist
+# ---------------------------------------------------
+@bp.route('/artists/<artist_id>/delete', methods=['DELETE'])
+def delete_artist(artist_id):
+    try:
+        # delete artist data row using given id
+        Artist.query.filter(Artist.id == artist_id).delete()
+        db.session.commit()
+        invalidate_artist(artist_id)
+        flash(f'Artist {artist_id} was successfully deleted!')
+    # Error Handling
+    # error Method Not Allowed
+    except MethodNotAllowed as mt:
+        db.session.rollback()
+        abort(405)
+    except BadRequest:
+        db.session.rollback()
+        abort(400)
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error: {str(sys.exc_info()[0])}')
+    finally:
+        db.session.close()
+    return redirect(url_for('pages.index'))
+
+#  Update Artist
+#  ----------------------------------------------------------------
+
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+    form = ArtistForm()
+    # Select artist data from db using artist_id and store in list
+    artist_query = Artist.query.filter(Artist.id == artist_id).one()
+    artist = []
+    for u in [artist_query]:
+        artist_dict = u.__dict__
+        artist_dict.pop('_sa_instance_state', None)
+        artist.append(artist_dict)
+    return render_template('forms/edit_artist.html',
+                           form=form, artist=artist[0])
+
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+    # artist record with ID <artist_id> using the new attributes
+    artist = Artist.query.filter(Artist.id == artist_id).one()
+    try:
+        # take value and checked if available and then update db
+        if request.form['name']:
+            artist.name = request.form['name']
+        if request.form['city']:
+            artist.city = request.form['city']
+        if request.form['state']:
+            artist.state = request.form['state']
+        if request.form['phone']:
+            artist.phone = request.form['phone']
+        if request.form['image_link']:
+            artist.image_link = request.form['image_link']
+        if request.form['facebook_link']:
+            artist.facebook_link = request.form['facebook_link']
+        if request.form.getlist('genres'):
+            # every selected genre; form['genres'] is only the first
+            artist.genres = known_genres(request.form.getlist('genres'))
+        if request.form['website']:
+            artist.website = request.form['website']
+        if request.form['seeking_description']:
+            artist.seeking_description = request.form['seeking_description']
+        if request.form['seeking_description'] != '':
+            artist.seeking_venue = True
+        else:
+            artist.seeking_venue = False
+        # commit session
+        db.session.add(artist)
+        db.session.commit()
+        invalidate_artist(artist_id)
+        flash(f'Artist {request.form["name"]} was successfully updated!')
+    # Error Handling
+    # error handling
+    except NoResultFound:
+        db.session.rollback()
+        abort(404)
+    # error Method Not Allowed
+    except MethodNotAllowed as mt:
+        db.session.rollback()
+        abort(405)
+    except BadRequest:
+        db.session.rollback()
+        abort(400)
+    except Exception:
+        db.session.rollback()
+        flash(f'Error: {str(sys.exc_info()[0])}')
+    finally:
+        db.session.close()
+    return redirect(url_for('artists.show_artist', artist_id=artist_id))
+
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@bp.route('/artists/create', methods=['GET'])
+def create_artist_form():
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+
+@bp.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+    # called upon submitting the new artist listing form
+    form = ArtistForm()
+    error = False
+    try:
+        newArtist = Artist(name=request.form['name'],
+                           city=request.form['city'],
+                           state=request.form['state'],
+                           phone=request.form['phone'],
+                           image_link=request.form['image_link'],
+                           facebook_link=request.form['facebook_link'],
+                           genres=known_genres(request.form.getlist('genres')),
+                           website=request.form['website'],
+                           seeking_venue=True if "request.form['seeking_description']" != '' else False,
+                           seeking_description=request.form['seeking_description'])
+        db.session.add(newArtist)
+        db.session.commit()
+        # a new artist only shows up in the /artists listing
+        cache.invalidate('artists')
+        # on successful db insert, flash success
+        flash('Artist ' + request.form['name'] + ' was successfully listed!')
+    # error Method Not Allowed
+    except MethodNotAllowed as mt:
+        db.session.rollback()
+        abort(405)
+    except BadRequest:
+        abort(400)
+    except Exception:
+        error = True
+        db.session.rollback()
+        flash('An error occurred. Venue ' +
+              request.form['name'] + ' could not be listed.')
+    finally:
+        # Always Close the session.
+        db.session.close()
+    return render_template('pages/home.html')
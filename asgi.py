@@ -0,0 +1,247 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import re
+import asyncio
+import itertools
+from datetime import datetime
+import asyncpg
+from asgiref.wsgi import WsgiToAsgi
+from flask import render_template
+from sqlalchemy.dialects.postgresql.psycopg2 import PGDialect_psycopg2
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.orm.exc import NoResultFound
+from sqlalchemy.util import KeyedTuple
+from werkzeug.datastructures import Headers
+from werkzeug.exceptions import HTTPException, NotFound
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+from models import db, Venue, Artist, Show
+from queries import (decode_cursor, page_size, keyset_query, keyset_result,
+                     venue_areas_query, group_areas, show_listing, show_tiles,
+                     detail_queries, detail_data)
+from database import pool_settings
+from cache import cache
+#----------------------------------------------------------------------------#
+# ASGI entry point.
+#
+#   uvicorn asgi:application --workers 4
+#
+# The listing and detail pages (/venues, /artists, /shows, /venues/<id>,
+# /artists/<id>) are served by async handlers on an asyncpg pool; the
+# independent queries of a page (a venue row, its counts, upcoming and past
+# shows) run concurrently with asyncio.gather, on separate connections.
+# Every other route - forms, writes, search, the API, static files - goes to
+# the unchanged Flask app through asgiref's WSGI adapter, on its thread.
+#
+# SQLAlchemy 1.3 has no asyncio support, so the handlers build the same
+# queries as the sync views (queries.py), compile them for Postgres and run
+# the SQL on asyncpg. Rendering uses the app's templates and view cache
+# entries. Flask's request context is thread-local, not task-local, so it
+# is only pushed around synchronous steps, never across an await. Async
+# reads always go to the primary (DATABASE_URL), not the read replicas.
+#----------------------------------------------------------------------------#
+
+# %s placeholders (and %% escapes) for the rewrite to asyncpg's $1, $2...
+DIALECT = PGDialect_psycopg2(paramstyle='format')
+PLACEHOLDER = re.compile(r'%s|%%')
+
+
+def compile_query(query):
+    # (sql, parameters) of a Query for asyncpg
+    compiled = query.statement.compile(dialect=DIALECT)
+    numbers = itertools.count(1)
+    sql = PLACEHOLDER.sub(
+        lambda match: f'${next(numbers)}' if match.group() == '%s' else '%',
+        compiled.string)
+    return sql, [compiled.params[name] for name in compiled.positiontup]
+
+
+def environ_for(scope):
+    # a WSGI environ for the request context of an ASGI http scope
+    headers = Headers([(name.decode('latin-1'), value.decode('latin-1'))
+                       for name, value in scope['headers']])
+    host = headers.get('host') or '%s:%s' % tuple(
+        scope.get('server') or ('localhost', 80))
+    environ = EnvironBuilder(
+        path=scope['path'], method=scope['method'], headers=headers,
+        base_url=f'{scope.get("scheme", "http")}://{host}'
+                 f'{scope.get("root_path", "")}',
+        query_string=scope['query_string'].decode('latin-1')).get_environ()
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    return environ
+
+
+class AsyncReads:
+    # ASGI application: async read pages, everything else to `app`
+    def __init__(self, app):
+        self.app = app
+        self.wsgi = WsgiToAsgi(app)
+        self.pool = None
+        self._pool_lock = asyncio.Lock()
+        self.routes = [
+            (re.compile(r'/venues/?$'), self.venues),
+            (re.compile(r'/artists/?$'), self.artists),
+            (re.compile(r'/shows/?$'), self.shows),
+            (re.compile(r'/venues/(\d+)$'), self.show_venue),
+            (re.compile(r'/artists/(\d+)$'), self.show_artist),
+        ]
+
+    async def connect(self):
+        async with self._pool_lock:
+            if self.pool is not None:
+                return
+            config = self.app.config
+            url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+            url.drivername = 'postgresql'
+            timeout = pool_settings(config)['statement_timeout_ms']
+            self.pool = await asyncpg.create_pool(
+                str(url), min_size=config['ASYNC_DB_POOL_MIN'],
+                max_size=config['ASYNC_DB_POOL_MAX'],
+                server_settings={'statement_timeout': str(int(timeout or 0))},
+                # PgBouncer (transaction pooling) can't keep prepared
+                # statements
+                statement_cache_size=0 if config.get('DB_PGBOUNCER')
+                else 100)
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+            for pattern, handler in self.routes:
+                match = pattern.match(scope['path'])
+                if match:
+                    return await self.serve(scope, send, handler,
+                                            *match.groups())
+        return await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await self.connect()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def serve(self, scope, send, handler, *args):
+        # run `handler` (returns a template and its context) without the
+        # request context, then render inside it
+        environ = environ_for(scope)
+        if self.pool is None:
+            await self.connect()
+        try:
+            template, context = await handler(Request(environ), *args)
+            error = None
+        except NoResultFound:
+            error = NotFound()
+        except HTTPException as exception:
+            error = exception
+        with self.app.request_context(environ):
+            if error is None:
+                response = self.app.make_response(
+                    render_template(template, **context))
+            else:
+                response = self.app.make_response(
+                    self.app.handle_http_exception(error))
+            response = self.app.process_response(response)
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [(name.lower().encode('latin-1'),
+                         value.encode('latin-1'))
+                        for name, value in response.headers.items()],
+        })
+        await send({'type': 'http.response.body',
+                    'body': b'' if scope['method'] == 'HEAD'
+                    else response.get_data()})
+
+    async def fetch(self, query):
+        sql, parameters = compile_query(query)
+        records = await self.pool.fetch(sql, *parameters)
+        return [KeyedTuple(tuple(record.values()), list(record.keys()))
+                for record in records]
+
+    async def page(self, request, query, keys, *types):
+        # one keyset page, as paginate() in app.py
+        size = page_size(request.args.get('limit'),
+                         self.app.config['LISTING_PAGE_SIZE'])
+        after = decode_cursor(request.args.get('after'), *types)
+        before = decode_cursor(request.args.get('before'), *types)
+        rows = await self.fetch(keyset_query(query, keys, size, after, before))
+        return keyset_result(rows, keys, size, after, before)
+
+    async def detail(self, model, entity_id, past_before):
+        limit = self.app.config['DETAIL_SHOWS_LIMIT']
+        entity, counts, upcoming, past = await asyncio.gather(*[
+            self.fetch(query) for query in detail_queries(
+                model, entity_id, datetime.now(), limit,
+                decode_cursor(past_before, datetime.fromisoformat, int))])
+        return detail_data(entity[0] if entity else None, counts[0],
+                           upcoming, past, limit)
+
+    #  Pages: the same cache entries as the sync views.
+    #  ----------------------------------------------------------------
+
+    async def venues(self, request):
+        async def areas():
+            return group_areas(await self.fetch(venue_areas_query()))
+        data = await cache.get_or_set_async(['venues'], 'areas', areas)
+        return 'pages/venues.html', {'areas': data}
+
+    async def artists(self, request):
+        async def artist_page():
+            rows, pager = await self.page(
+                request, db.session.query(Artist.id, Artist.name),
+                [Artist.name, Artist.id], str, int)
+            return [{"id": row.id, "name": row.name} for row in rows], pager
+        data, pager = await cache.get_or_set_async(
+            ['artists'], request.query_string.decode(), artist_page)
+        return 'pages/artists.html', {'artists': data, 'pager': pager}
+
+    async def shows(self, request):
+        async def show_page():
+            rows, pager = await self.page(
+                request, show_listing(), [Show.start_time, Show.id],
+                datetime.fromisoformat, int)
+            return show_tiles(rows), pager
+        data, pager = await cache.get_or_set_async(
+            ['shows'], request.query_string.decode(), show_page)
+        return 'pages/shows.html', {'shows': data, 'pager': pager}
+
+    async def show_venue(self, request, venue_id):
+        venue_id = int(venue_id)
+        past_before = request.args.get('past_before')
+        data = await cache.get_or_set_async(
+            [f'venue:{venue_id}'], f'detail:{past_before}',
+            lambda: self.detail(Venue, venue_id, past_before))
+        return 'pages/show_venue.html', {'venue': data}
+
+    async def show_artist(self, request, artist_id):
+        artist_id = int(artist_id)
+        past_before = request.args.get('past_before')
+        data = await cache.get_or_set_async(
+            [f'artist:{artist_id}'], f'detail:{past_before}',
+            lambda: self.detail(Artist, artist_id, past_before))
+        return 'pages/show_artist.html', {'artist': data}
+
+
+def create_asgi_app(config=None):
+    from app import create_app
+    app = create_app(config)
+    # the handlers build their queries on db.session outside any app
+    # context (it is thread-local); this process serves this one app
+    db.app = app
+    return AsyncReads(app)
+
+
+application = create_asgi_app()
@@ -0,0 +1,390 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import os
+import sys
+import json
+import time
+import itertools
+import subprocess
+import resource
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import click
+import requests
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import event, func, or_
+from werkzeug.serving import make_server, WSGIRequestHandler
+from models import db, Show
+from plans import busiest
+from cache import cache, NullCache
+from replicas import replicas
+#----------------------------------------------------------------------------#
+# Route benchmark.
+#
+# Requests every route of the app repeatedly, either in-process through the
+# Flask test client or over HTTP against a threaded WSGI server, and reports
+# per-route p50/p95/p99 latency, SQL statements per request and peak memory.
+# Results can be saved as a baseline and later runs compared against it.
+#----------------------------------------------------------------------------#
+
+
+def percentile(samples, fraction):
+    # nearest-rank percentile of a sorted list
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+def peak_rss_mb():
+    # peak resident set size of this process (ru_maxrss is in KiB on Linux)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# the earliest show --include-writes creates
+FIRST_WRITE = datetime(2099, 1, 1, 20)
+# statuses of a write that went through (the form page, or a redirect)
+WRITE_OK = {200, 302}
+
+
+def bench_routes(term, include_writes):
+    # (name, method, url, form data) for every route worth timing; the
+    # data of a write is a function of the request's number
+    venue_id = busiest(Show.venue_id)
+    artist_id = busiest(Show.artist_id)
+    routes = [
+        ('index', 'GET', '/', None),
+        ('venues', 'GET', '/venues', None),
+        ('artists', 'GET', '/artists', None),
+        ('shows', 'GET', '/shows', None),
+        ('show_venue', 'GET', f'/venues/{venue_id}', None),
+        ('show_artist', 'GET', f'/artists/{artist_id}', None),
+        ('search_venues', 'POST', '/venues/search', {'search_term': term}),
+        ('search_artists', 'POST', '/artists/search', {'search_term': term}),
+        ('create_venue_form', 'GET', '/venues/create', None),
+        ('create_artist_form', 'GET', '/artists/create', None),
+        ('create_shows', 'GET', '/shows/create', None),
+        ('edit_venue', 'GET', f'/venues/{venue_id}/edit', None),
+        ('edit_artist', 'GET', f'/artists/{artist_id}/edit', None),
+    ]
+    if include_writes:
+        # adds a show per request, each a day after the one before and
+        # after any show the pair has: the same slot again would be a
+        # double booking (409)
+        latest = db.session.query(func.max(Show.start_time)).filter(or_(
+            Show.venue_id == venue_id, Show.artist_id == artist_id)).scalar()
+        base = datetime.combine(
+            max(latest or FIRST_WRITE, FIRST_WRITE).date(), FIRST_WRITE.time())
+        routes.append(('create_show_submission', 'POST', '/shows/create',
+                       lambda number: {
+                           'venue_id': venue_id, 'artist_id': artist_id,
+                           'start_time': str(base + timedelta(
+                               days=number + 1))}))
+    return routes
+
+
+class TestClientDriver:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def __call__(self, method, url, data):
+        return self.client.open(url, method=method, data=data).status_code
+
+    def close(self):
+        pass
+
+
+class QuietHandler(WSGIRequestHandler):
+    # no access log line per benchmark request
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class WSGIDriver:
+    # a real threaded WSGI server on a free local port, driven over HTTP
+    def __init__(self, app):
+        self.server = make_server('127.0.0.1', 0, app, threaded=True,
+                                  request_handler=QuietHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+        self.base = f'http://127.0.0.1:{self.server.server_port}'
+        self.session = requests.Session()
+
+    def __call__(self, method, url, data):
+        return self.session.request(method, self.base + url,
+                                    data=data).status_code
+
+    def close(self):
+        self.server.shutdown()
+        self.session.close()
+
+
+def run(driver, routes, repeat, warmup):
+    statements = {'count': 0}
+
+    def count(*args):
+        statements['count'] += 1
+
+    # reads served by a replica are statements too
+    engines = [db.engine, *replicas.engines]
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', count)
+    results = {}
+    try:
+        for name, method, url, data in routes:
+            numbers = itertools.count()
+            form = data if callable(data) else lambda number: data
+            for _ in range(warmup):
+                driver(method, url, form(next(numbers)))
+            timings = []
+            statements['count'] = 0
+            statuses = set()
+            for _ in range(repeat):
+                payload = form(next(numbers))
+                started = time.perf_counter()
+                statuses.add(driver(method, url, payload))
+                timings.append((time.perf_counter() - started) * 1000)
+            if callable(data) and not statuses <= WRITE_OK:
+                # timing the error path would say nothing about the write
+                raise click.ClickException(
+                    f'{name} answered {sorted(statuses)}, not 200 / 302')
+            timings.sort()
+            results[name] = {
+                "p50_ms": round(percentile(timings, 0.50), 2),
+                "p95_ms": round(percentile(timings, 0.95), 2),
+                "p99_ms": round(percentile(timings, 0.99), 2),
+                "queries": round(statements['count'] / repeat, 2),
+                "status": sorted(statuses),
+                "peak_rss_mb": round(peak_rss_mb(), 1),
+            }
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', count)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    # routes slower than the baseline p95 by more than `tolerance`, or
+    # issuing more statements than it did
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        if result['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f'{name}: p95 {before["p95_ms"]}ms -> '
+                               f'{result["p95_ms"]}ms')
+        if result['queries'] > before['queries']:
+            regressions.append(f'{name}: queries {before["queries"]} -> '
+                               f'{result["queries"]}')
+    return regressions
+
+
+@click.command('bench')
+@click.option('--server', type=click.Choice(['testclient', 'wsgi']),
+              default='testclient', show_default=True)
+@click.option('--repeat', default=50, show_default=True)
+@click.option('--warmup', default=3, show_default=True)
+@click.option('--term', default='a', show_default=True,
+              help='Search term for the search routes.')
+@click.option('--no-cache', is_flag=True, help='Bypass the view cache.')
+@click.option('--include-writes', is_flag=True,
+              help='Also time POST /shows/create (inserts shows).')
+@click.option('--baseline', type=click.Path(dir_okay=False),
+              help='Baseline JSON to compare against.')
+@click.option('--save-baseline', is_flag=True,
+              help='Write the results to --baseline instead of comparing.')
+@click.option('--tolerance', default=0.25, show_default=True,
+              help='Allowed p95 slowdown against the baseline.')
+@with_appcontext
+def bench(server, repeat, warmup, term, no_cache, include_writes, baseline,
+          save_baseline, tolerance):
+    """Benchmark every route: latency percentiles, queries, memory."""
+    app = current_app._get_current_object()
+    if no_cache:
+        cache.backend = NullCache()
+    routes = bench_routes(term, include_writes)
+    db.session.remove()
+    driver = (WSGIDriver if server == 'wsgi' else TestClientDriver)(app)
+    try:
+        results = run(driver, routes, repeat, warmup)
+    finally:
+        driver.close()
+
+    click.echo(f'{"route":<24}{"p50":>9}{"p95":>9}{"p99":>9}'
+               f'{"queries":>9}{"rss MB":>9}  status')
+    for name, result in results.items():
+        click.echo(f'{name:<24}{result["p50_ms"]:>9}{result["p95_ms"]:>9}'
+                   f'{result["p99_ms"]:>9}{result["queries"]:>9}'
+                   f'{result["peak_rss_mb"]:>9}  {result["status"]}')
+
+    if baseline and save_baseline:
+        with open(baseline, 'w') as out:
+            json.dump(results, out, indent=2, sort_keys=True)
+        click.echo(f'Saved baseline to {baseline}')
+    elif baseline:
+        with open(baseline) as source:
+            regressions = compare(results, json.load(source), tolerance)
+        for regression in regressions:
+            click.echo(f'REGRESSION {regression}', err=True)
+        if regressions:
+            raise SystemExit(1)
+        click.echo(f'No regressions against {baseline}')
+
+#----------------------------------------------------------------------------#
+# Throughput benchmark: the same app as threaded sync WSGI and as ASGI.
+#----------------------------------------------------------------------------#
+
+
+def rss_mb(pid):
+    # current resident set size of a process
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def wait_until_up(url, seconds=30):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    raise click.ClickException(f'{url} did not come up')
+
+
+def load(base, paths, clients, seconds):
+    # requests per second from `clients` concurrent clients
+    deadline = time.monotonic() + seconds
+
+    def client(offset):
+        done = 0
+        with requests.Session() as session:
+            for path in itertools.islice(itertools.cycle(paths), offset, None):
+                if time.monotonic() >= deadline:
+                    return done
+                session.get(base + path).raise_for_status()
+                done += 1
+    with ThreadPoolExecutor(clients) as executor:
+        return sum(executor.map(client, range(clients))) / seconds
+
+
+SERVERS = {
+    # one process each, so throughput per MB compares like with like
+    'wsgi': [sys.executable, '-m', 'flask', 'run', '--with-threads',
+             '--no-reload', '--no-debugger', '--port', '{port}'],
+    'asgi': [sys.executable, '-m', 'uvicorn', 'asgi:application',
+             '--no-access-log', '--log-level', 'warning', '--port', '{port}'],
+}
+
+
+@click.command('bench-asgi')
+@click.option('--clients', default=16, show_default=True)
+@click.option('--seconds', default=10, show_default=True)
+@click.option('--port', default=5077, show_default=True)
+@click.option('--no-cache', is_flag=True,
+              help='Run the servers with CACHE_BACKEND=null.')
+@with_appcontext
+def bench_asgi(clients, seconds, port, no_cache):
+    """Compare read throughput of the sync WSGI and the ASGI servers."""
+    venue_id = busiest(Show.venue_id)
+    artist_id = busiest(Show.artist_id)
+    paths = ['/venues', '/artists', '/shows', f'/venues/{venue_id}',
+             f'/artists/{artist_id}']
+    environ = dict(os.environ, FLASK_APP='app.py')
+    if no_cache:
+        environ['CACHE_BACKEND'] = 'null'
+    click.echo(f'{"server":<8}{"req/s":>10}{"RSS MB":>10}{"req/s/100MB":>14}')
+    for name, command in SERVERS.items():
+        server = subprocess.Popen(
+            [part.format(port=port) for part in command], env=environ,
+            cwd=current_app.root_path,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            base = f'http://127.0.0.1:{port}'
+            wait_until_up(base + '/')
+            load(base, paths, clients, 2)
+            rate = load(base, paths, clients, seconds)
+            memory = rss_mb(server.pid)
+        finally:
+            server.terminate()
+            server.wait()
+        click.echo(f'{name:<8}{rate:>10.1f}{memory:>10.1f}'
+                   f'{rate / memory * 100:>14.1f}')
+
+#----------------------------------------------------------------------------#
+# Startup benchmark: fresh interpreters importing and building the app.
+#----------------------------------------------------------------------------#
+
+STARTUP_RUNS = {
+    # name: (command, budget)
+    'import app': ([sys.executable, '-c', 'import app'], None),
+    'create_app()': ([sys.executable, '-c',
+                      'from app import create_app; create_app()'],
+                     'STARTUP_BUDGET_MS'),
+    'flask db heads': ([sys.executable, '-m', 'flask', 'db', 'heads'],
+                       'CLI_BUDGET_MS'),
+    'flask --help': ([sys.executable, '-m', 'flask', '--help'],
+                     'CLI_BUDGET_MS'),
+}
+
+
+def run_ms(command, environ, cwd):
+    started = time.perf_counter()
+    subprocess.run(command, env=environ, cwd=cwd, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return (time.perf_counter() - started) * 1000
+
+
+def import_times(command, environ, cwd):
+    # {top-level package: self import time in ms} from -X importtime
+    output = subprocess.run(
+        command[:1] + ['-X', 'importtime'] + command[1:], env=environ,
+        cwd=cwd, check=True, stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE, universal_newlines=True).stderr
+    totals = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        own, _, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        totals[package] = totals.get(package, 0) + int(own) / 1000
+    return totals
+
+
+@click.command('bench-startup')
+@click.option('--repeat', default=5, show_default=True,
+              help='Fresh processes per measurement (median reported).')
+@click.option('--top', default=12, show_default=True,
+              help='Packages listed by import time.')
+@with_appcontext
+def bench_startup(repeat, top):
+    """Time imports, app creation and the flask command against budgets."""
+    config = current_app.config
+    environ = dict(os.environ, FLASK_APP='app.py')
+    cwd = current_app.root_path
+    over = []
+    click.echo(f'{"run":<18}{"median ms":>11}{"budget":>9}')
+    for name, (command, budget) in STARTUP_RUNS.items():
+        run_ms(command, environ, cwd)
+        times = sorted(run_ms(command, environ, cwd) for _ in range(repeat))
+        median = times[len(times) // 2]
+        limit = config.get(budget) if budget else None
+        click.echo(f'{name:<18}{median:>11.0f}'
+                   f'{limit if limit else "-":>9}')
+        if limit and median > limit:
+            over.append(f'{name}: {median:.0f} ms > {limit} ms')
+
+    totals = import_times(STARTUP_RUNS['create_app()'][0], environ, cwd)
+    click.echo(f'\nimports of create_app(): {sum(totals.values()):.0f} ms')
+    for package, ms in sorted(totals.items(), key=lambda item: -item[1])[:top]:
+        click.echo(f'  {package:<24}{ms:>8.1f} ms')
+    for line in over:
+        click.echo(f'OVER BUDGET {line}', err=True)
+    if over:
+        raise SystemExit(1)
@@ -0,0 +1,104 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from datetime import timedelta
+from collections import namedtuple
+from sqlalchemy import func, literal_column
+from models import db, Show
+#----------------------------------------------------------------------------#
+# Double bookings.
+#
+# A show occupies [start_time, start_time + duration). Two shows of one
+# venue, or of one artist, may not overlap: the exclusion constraints
+# show_venue_no_overlap and show_artist_no_overlap (migration f3a9c1e5d7b2)
+# refuse the insert, whichever path it takes, without a racy check before
+# it. booking_conflict() turns such an IntegrityError into a message for
+# the form or the API.
+#
+# Availability uses the same GiST indexes: conflicts() filters on the
+# constraint's own expressions, so "is this venue free Friday?" is one
+# index probe.
+#
+# Calendars (booked and free slots over a window, at most CALENDAR_MAX_DAYS
+# long) read the (venue_id, start_time) / (artist_id, start_time) btree
+# indexes instead: the shows starting in the window are one range scan, and
+# as shows of one venue / artist never overlap, at most one show starting
+# before the window runs into it, the latest with a duration. Both stay the
+# same size however many years of shows the venue or artist has.
+#----------------------------------------------------------------------------#
+
+MESSAGES = {
+    'show_venue_no_overlap': 'The venue already has a show at that time',
+    'show_artist_no_overlap': 'The artist already has a show at that time',
+}
+
+# the duration of a show inserted without one, as SQL
+DEFAULT_DURATION = Show.__table__.c.duration.server_default.arg.text
+
+# the constraint's span of a show
+SPAN = func.tsrange(Show.start_time, Show.start_time + Show.duration)
+
+
+def key(column, value):
+    # `column` = `value` as the constraints compare it (a one-element range)
+    closed = literal_column("'[]'")
+    return func.int4range(column, column, closed) == \
+        func.int4range(value, value, closed)
+
+
+def conflicts(column, entity_id, start, end):
+    # the shows of venue / artist `entity_id` overlapping [start, end)
+    return db.session.query(Show).filter(
+        key(column, entity_id),
+        SPAN.op('&&')(func.tsrange(start, end))).order_by(Show.start_time)
+
+
+def is_free(column, entity_id, start, end):
+    return conflicts(column, entity_id, start, end).first() is None
+
+
+# a free stretch of a calendar, [start, end)
+Slot = namedtuple('Slot', 'start end')
+
+
+def booked(column, entity_id, start, end, name):
+    # (show, name) for the shows of venue / artist `entity_id` overlapping
+    # [start, end), by start_time; `name` is the other side's (Artist.name
+    # on a venue's calendar)
+    query = db.session.query(Show, name).join(name.class_)
+    earlier = query.filter(
+        column == entity_id, Show.start_time < start,
+        Show.duration > timedelta(0)).order_by(Show.start_time.desc()).first()
+    rows = query.filter(
+        column == entity_id, Show.start_time >= start,
+        Show.start_time < end).order_by(Show.start_time).all()
+    if earlier is not None and earlier[0].end_time > start:
+        rows.insert(0, earlier)
+    return rows
+
+
+def free_slots(shows, start, end):
+    # the stretches of [start, end) that `shows` (by start_time) leave free
+    slots = []
+    moment = start
+    for show in shows:
+        if show.duration <= timedelta(0):
+            # legacy shows left without a span book nothing
+            continue
+        if show.start_time > moment:
+            slots.append(Slot(moment, min(show.start_time, end)))
+        moment = max(moment, show.end_time)
+    if moment < end:
+        slots.append(Slot(moment, end))
+    return slots
+
+
+def booking_conflict(error):
+    # the message for an IntegrityError raised by a double booking, None
+    # for any other integrity error
+    original = getattr(error, 'orig', None)
+    if getattr(original, 'pgcode', None) != '23P01':
+        return None
+    return MESSAGES.get(original.diag.constraint_name,
+                        'Overlaps another show')
@@ -0,0 +1,84 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from sqlalchemy import func, cast
+from sqlalchemy.dialects.postgresql import ARRAY
+from forms import genre_choices
+from models import db
+#----------------------------------------------------------------------------#
+# Genre discovery: "Jazz venues in San Francisco with upcoming shows".
+#
+# Venues or artists are filtered by genre with array containment on the
+# genres column (@> for all of the genres, && for any of them), which the GIN
+# index on genres answers (migration 5f0c2b9a7d41), by exact city / state
+# (the (state, city) indexes of migration b7d2e4f6a8c3), and by the upcoming
+# show counter (counters.py), without a join to show.
+#
+# facets() counts, for every genre, how many of the matches have it, in one
+# aggregate over the unnested genres of the matching rows.
+#----------------------------------------------------------------------------#
+
+GENRES = [genre for genre, _ in genre_choices]
+MATCHES = ('all', 'any')
+
+
+def known_genres(values):
+    # `values` (a form's or a query string's list) as a genres array, in
+    # the order of the choices; ValueError for a genre not among them
+    values = {value.strip() for value in values if value.strip()}
+    unknown = values - set(GENRES)
+    if unknown:
+        raise ValueError(f'Unknown genres: {", ".join(sorted(unknown))}')
+    return [genre for genre in GENRES if genre in values]
+
+
+def browse_filters(args):
+    # the filters of a browse request from its query arguments (genre,
+    # repeated; match; city; state; upcoming); ValueError if malformed
+    match = args.get('match') or 'all'
+    if match not in MATCHES:
+        raise ValueError(f'match must be one of {", ".join(MATCHES)}')
+    return {
+        "genres": known_genres(args.getlist('genre')),
+        "match": match,
+        "city": args.get('city', '').strip(),
+        "state": args.get('state', '').strip(),
+        "upcoming": args.get('upcoming', '') not in ('', '0', 'false'),
+    }
+
+
+def conditions(model, genres=(), match='all', city='', state='',
+               upcoming=False):
+    # the WHERE clauses of a browse of `model` (Venue or Artist)
+    clauses = []
+    if genres:
+        array = cast(list(genres), ARRAY(db.String(120)))
+        clauses.append(model.genres.op('@>' if match == 'all' else '&&')(
+            array))
+    if state:
+        clauses.append(model.state == state)
+    if city:
+        clauses.append(model.city == city)
+    if upcoming:
+        clauses.append(model.upcoming_shows_count > 0)
+    return clauses
+
+
+def browse_query(model, filters):
+    # (id, name, city, state, genres, num_upcoming_shows) of the matches;
+    # callers page it by (name, id)
+    return db.session.query(
+        model.id, model.name, model.city, model.state, model.genres,
+        model.upcoming_shows_count.label('num_upcoming_shows')).filter(
+            *conditions(model, **filters))
+
+
+def facets(model, filters):
+    # [(genre, count)] over the matches, most common first
+    genre = func.unnest(model.genres).label('genre')
+    matched = db.session.query(genre).filter(
+        *conditions(model, **filters)).subquery()
+    count = func.count().label('count')
+    return db.session.query(matched.c.genre, count).group_by(
+        matched.c.genre).order_by(count.desc(), matched.c.genre).all()
@@ -0,0 +1,211 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import time
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+from uuid import uuid4
+try:
+    import redis
+except ImportError:
+    redis = None
+#----------------------------------------------------------------------------#
+# Backends.
+#
+# Every backend stores picklable values under string keys with an optional
+# time-to-live in seconds (None: no expiry) and offers get / set / delete.
+# get() returns MISSING for absent or expired keys, so None can be cached.
+#----------------------------------------------------------------------------#
+
+MISSING = object()
+
+
+class NullCache:
+    # caching disabled: every lookup misses
+    def get(self, key):
+        return MISSING
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+
+class LRUCache:
+    # In-process cache: least recently used entries are evicted once
+    # max_entries is reached, expired entries are dropped on access.
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key, MISSING)
+            if entry is MISSING:
+                return MISSING
+            value, expires = entry
+            if expires is not None and expires <= time.monotonic():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SQLiteCache:
+    # Cache shared by every worker on one host, kept in a SQLite file. Also
+    # the local stand-in for a networked shared cache such as Redis.
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        # one connection per thread; sqlite3 connections can't be shared
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5,
+                                         isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)')
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        row = self._db.execute(
+            'SELECT value FROM cache WHERE key = ? AND '
+            '(expires IS NULL OR expires > ?)', (key, time.time())).fetchone()
+        return MISSING if row is None else pickle.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        expires = None if ttl is None else time.time() + ttl
+        self._db.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)', (key, pickle.dumps(value), expires))
+
+    def delete(self, key):
+        self._db.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def purge(self):
+        # drop expired entries
+        self._db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+
+
+class RedisCache:
+    # cache shared by every worker and host through a Redis server
+    def __init__(self, url):
+        if redis is None:
+            raise RuntimeError('CACHE_BACKEND "redis" needs the redis package')
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._client.get(key)
+        return MISSING if value is None else pickle.loads(value)
+
+    def set(self, key, value, ttl=None):
+        self._client.set(key, pickle.dumps(value),
+                         ex=None if ttl is None else max(1, int(ttl)))
+
+    def delete(self, key):
+        self._client.delete(key)
+
+
+def make_backend(config):
+    # backend named by CACHE_BACKEND: null, lru, sqlite or redis
+    name = config.get('CACHE_BACKEND', 'lru')
+    if name == 'null':
+        return NullCache()
+    if name == 'lru':
+        return LRUCache(config.get('CACHE_MAX_ENTRIES', 4096))
+    if name == 'sqlite':
+        return SQLiteCache(config['CACHE_SQLITE_PATH'])
+    if name == 'redis':
+        return RedisCache(config['CACHE_REDIS_URL'])
+    raise ValueError(f'Unknown CACHE_BACKEND {name!r}')
+
+#----------------------------------------------------------------------------#
+# View data cache.
+#
+# Entries belong to one or more namespaces: 'venues', 'artists' and 'shows'
+# for the listings, 'venue:<id>' and 'artist:<id>' for one entity. Each
+# namespace has a generation token stored in the backend, and an entry's key
+# embeds the tokens of all its namespaces. Invalidating a namespace replaces
+# its token, so every entry under it stops matching at once (and ages out)
+# without tracking the keys, and it works the same across workers when the
+# backend is shared.
+#----------------------------------------------------------------------------#
+
+
+class ViewCache:
+    def __init__(self, backend=None):
+        self.backend = backend or NullCache()
+        self.default_ttl = None
+        # a function naming where the data being cached is read from (a
+        # replica or the primary), part of every key; None: not in the keys
+        self.source = None
+
+    def init_app(self, app):
+        self.backend = make_backend(app.config)
+        self.default_ttl = app.config.get('CACHE_DEFAULT_TTL')
+        app.extensions['view_cache'] = self
+
+    def _generation(self, namespace):
+        key = 'gen:' + namespace
+        generation = self.backend.get(key)
+        if generation is MISSING:
+            # a fresh token, never a reset counter: entries written under an
+            # evicted generation must not become visible again
+            generation = uuid4().hex
+            self.backend.set(key, generation)
+        return generation
+
+    def key(self, namespaces, name):
+        return ':'.join(
+            [f'{namespace}@{self._generation(namespace)}'
+             for namespace in namespaces] + [name] + (
+                [self.source()] if self.source is not None else []))
+
+    def get_or_set(self, namespaces, name, compute, ttl=None):
+        # cached value of `name` under `namespaces`, computing and storing
+        # it on a miss
+        key = self.key(namespaces, name)
+        value = self.backend.get(key)
+        if value is MISSING:
+            value = compute()
+            self.backend.set(key, value, ttl or self.default_ttl)
+        return value
+
+    async def get_or_set_async(self, namespaces, name, compute, ttl=None):
+        # get_or_set() for a coroutine function `compute` (the backend calls
+        # stay synchronous: local, or one short round trip)
+        key = self.key(namespaces, name)
+        value = self.backend.get(key)
+        if value is MISSING:
+            value = await compute()
+            self.backend.set(key, value, ttl or self.default_ttl)
+        return value
+
+    def invalidate(self, *namespaces):
+        for namespace in namespaces:
+            self.backend.set('gen:' + namespace, uuid4().hex)
+
+
+cache = ViewCache()
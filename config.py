@@ -3,15 +3,148 @@ SECRET_KEY = os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
+# Number of results per search page
+SEARCH_PAGE_SIZE = 20
+
+# Number of rows per /shows and /artists page
+LISTING_PAGE_SIZE = 50
+
+# Number of upcoming / past shows listed on a venue or artist page
+DETAIL_SHOWS_LIMIT = 12
+
+# Most shows one recurring schedule may create (schedule.py)
+SCHEDULE_MAX_SHOWS = 5000
+
+# Longest window one venue / artist calendar covers (api.py)
+CALENDAR_MAX_DAYS = 93
+
+# Recommendations stored per venue and per artist (recommend.py)
+RECOMMENDATIONS_PER_ENTITY = 20
+
+# View data cache: 'lru' (per process), 'sqlite' (shared by the workers on
+# one host), 'redis' (shared by every host) or 'null' (disabled)
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'lru')
+CACHE_DEFAULT_TTL = 60
+CACHE_MAX_ENTRIES = 4096
+CACHE_SQLITE_PATH = os.path.join(basedir, 'cache.sqlite3')
+CACHE_REDIS_URL = 'redis://localhost:6379/0'
+
+# Show start times are stored without a zone, in this timezone (see
+# formatting.py); pages show them in the visitor's timezone (`tz` cookie)
+# when known, else in this one
+SHOW_TIMEZONE = os.environ.get('SHOW_TIMEZONE', 'UTC')
+DATETIME_LOCALE = 'en_US'
+
+# Compiled templates are kept here between processes (None: no bytecode
+# cache); `flask compile-templates` fills it ahead of a deploy
+TEMPLATE_BYTECODE_DIR = os.path.join(basedir, '.jinja_cache')
+# time every template and block render (Server-Timing header, JSON log
+# line, totals at TEMPLATE_STATS_URL); off by default, it costs a little
+TEMPLATE_PROFILING = os.environ.get('TEMPLATE_PROFILING', '').lower() in (
+    '1', 'true', 'yes', 'on')
+TEMPLATE_STATS_URL = '/admin/template-stats'
+
+# SQL instrumentation: a statement shape run more than this many times in
+# one request is logged as a probable N+1
+SQL_REPEAT_THRESHOLD = 5
+# per-endpoint query stats (None disables), served to these addresses only
+SQL_STATS_URL = '/admin/sql-stats'
+SQL_STATS_ALLOWED_HOSTS = ('127.0.0.1', '::1')
+
+#----------------------------------------------------------------------------#
+# Database.
+#
+# Read from the environment so each deployment sets its own without code
+# changes. DB_PROFILE picks the pool defaults in database.py (development,
+# production or test); the other DB_* variables override single settings.
+#----------------------------------------------------------------------------#
 
-# Connect to the database
-class DatabaseURI:
-    DATABASE_NAME = "fyyurdb"
-    SQLALCHEMY_DATABASE_URI = "postgres:///{}".format(
-        DATABASE_NAME)
 
+def env_int(name):
+    value = os.environ.get(name)
+    return None if value in (None, '') else int(value)
+
+
+def env_flag(name):
+    value = os.environ.get(name)
+    return None if value in (None, '') else \
+        value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# Connect to the database
+SQLALCHEMY_DATABASE_URI = os.environ.get(
+    'DATABASE_URL', 'postgresql:///fyyurdb')
 # sqlalchemy track modification
-class SQLALCHEMY_TRACK_MODIFICATIONS:
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+DB_PROFILE = os.environ.get('DB_PROFILE', 'development')
+# Debug mode: on by default in development (DEBUG=0 turns it off), never in
+# production whatever DEBUG says
+DEBUG = DB_PROFILE != 'production' and (
+    env_flag('DEBUG') if env_flag('DEBUG') is not None
+    else DB_PROFILE == 'development')
+DB_POOL_SIZE = env_int('DB_POOL_SIZE')
+DB_MAX_OVERFLOW = env_int('DB_MAX_OVERFLOW')
+# seconds to wait for a free connection before failing the request
+DB_POOL_TIMEOUT = env_int('DB_POOL_TIMEOUT')
+# seconds after which a connection is replaced (-1: never)
+DB_POOL_RECYCLE = env_int('DB_POOL_RECYCLE')
+# test each connection with a round trip on checkout
+DB_POOL_PRE_PING = env_flag('DB_POOL_PRE_PING')
+# per-statement timeout (0: none)
+DB_STATEMENT_TIMEOUT_MS = env_int('DB_STATEMENT_TIMEOUT_MS')
+# behind PgBouncer in transaction pooling mode: keep no session state
+DB_PGBOUNCER = env_flag('DB_PGBOUNCER') or False
+# no client-side pool at all (PgBouncer does the pooling)
+DB_DISABLE_POOL = env_flag('DB_DISABLE_POOL') or False
+# Read replicas for the read-only views, as comma-separated URLs (none: all
+# reads go to the primary)
+DATABASE_REPLICA_URLS = [
+    url.strip() for url in
+    os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+# replicas lagging more than this are skipped
+REPLICA_MAX_LAG_SECONDS = env_int('REPLICA_MAX_LAG_SECONDS') or 5
+# seconds between health / lag checks of a replica
+REPLICA_CHECK_INTERVAL = 10
+REPLICA_CONNECT_TIMEOUT = 2
+# after a write, that client reads from the primary for this long
+REPLICA_STICKY_SECONDS = 10
+# view cache TTL for data read from a replica
+REPLICA_CACHE_TTL = 5
+# asyncpg pool of the ASGI entry point (asgi.py), per process
+ASYNC_DB_POOL_MIN = env_int('ASYNC_DB_POOL_MIN') or 2
+ASYNC_DB_POOL_MAX = env_int('ASYNC_DB_POOL_MAX') or 10
+# pool metrics (None disables), served to SQL_STATS_ALLOWED_HOSTS only
+POOL_STATS_URL = '/admin/pool-stats'
+
+#----------------------------------------------------------------------------#
+# Serving (`flask serve`, serving.py).
+#----------------------------------------------------------------------------#
+
+WEB_BIND = os.environ.get('WEB_BIND',
+                          f'0.0.0.0:{os.environ.get("PORT", "8000")}')
+# workers / threads per worker (None: derived from the cores and the pool)
+WEB_WORKERS = env_int('WEB_WORKERS')
+WEB_THREADS = env_int('WEB_THREADS')
+# connections all workers together may open on the primary
+DB_MAX_CONNECTIONS = env_int('DB_MAX_CONNECTIONS') or 90
+WEB_TIMEOUT = 30
+# seconds a worker gets to finish its requests on reload / shutdown
+WEB_GRACEFUL_TIMEOUT = 30
+WEB_MAX_REQUESTS = 5000
+WEB_PIDFILE = os.environ.get('WEB_PIDFILE', os.path.join(basedir,
+                                                          'gunicorn.pid'))
+# seconds `flask reload-server` leaves the new workers before retiring the
+# old master
+WEB_RELOAD_GRACE = 5
+# readiness probe (None disables): 200 when the database answers, else 503
+READINESS_URL = '/readyz'
+
+#----------------------------------------------------------------------------#
+# Startup budgets (`flask bench-startup`, bench.py).
+#----------------------------------------------------------------------------#
+
+# median ms for a fresh process to build the app (create_app())
+STARTUP_BUDGET_MS = env_int('STARTUP_BUDGET_MS') or 700
+# median ms for a flask command that loads the app (`flask db heads`)
+CLI_BUDGET_MS = env_int('CLI_BUDGET_MS') or 1000
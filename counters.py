@@ -0,0 +1,183 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+import click
+from flask.cli import with_appcontext
+from models import db
+from cache import cache
+#----------------------------------------------------------------------------#
+# Materialized show counters.
+#
+# venues and artists carry upcoming_shows_count and past_shows_count, so the
+# listings and searches read them instead of counting shows. The counters
+# are exact as of show_counter_state.rolled_until: a show counts as upcoming
+# when it starts after that watermark. Inserting shows bumps the counters in
+# the same transaction (count_new_shows), and the roll-forward job moves the
+# shows that started since the last run from upcoming to past, then advances
+# the watermark. Both lock the watermark row first (shared for inserts,
+# exclusive for the roll), so they never interleave.
+#
+# Run `flask roll-show-counters` from cron, every few minutes; between runs
+# shows that already started are still counted as upcoming.
+#----------------------------------------------------------------------------#
+
+# (table, foreign key column on show)
+COUNTED = (('venues', 'venue_id'), ('artists', 'artist_id'))
+
+# The new shows' counts added to their venues / artists. `ids` and `starts`
+# are parallel arrays, one element per new show.
+COUNT_NEW_SHOWS = '''
+UPDATE {table} AS t
+SET upcoming_shows_count = t.upcoming_shows_count + d.upcoming,
+    past_shows_count = t.past_shows_count + d.past
+FROM (
+    SELECT n.id,
+           count(*) FILTER (WHERE n.start_time > s.rolled_until) AS upcoming,
+           count(*) FILTER (WHERE n.start_time <= s.rolled_until) AS past
+    FROM unnest(CAST(:ids AS integer[]), CAST(:starts AS timestamp[]))
+         AS n(id, start_time),
+         (SELECT rolled_until FROM show_counter_state FOR SHARE) AS s
+    GROUP BY n.id
+) AS d
+WHERE t.id = d.id
+'''
+
+# Shows that started in (since, until] move from upcoming to past.
+ROLL_FORWARD = '''
+UPDATE {table} AS t
+SET upcoming_shows_count = t.upcoming_shows_count - d.started,
+    past_shows_count = t.past_shows_count + d.started
+FROM (
+    SELECT {column} AS id, count(*) AS started
+    FROM show
+    WHERE start_time > :since AND start_time <= :until
+    GROUP BY {column}
+) AS d
+WHERE t.id = d.id
+RETURNING t.id
+'''
+
+# Counters recomputed from show, for the rows where they drifted.
+DRIFT = '''
+SELECT t.id, t.upcoming_shows_count, t.past_shows_count,
+       COALESCE(c.upcoming, 0) AS upcoming, COALESCE(c.past, 0) AS past
+FROM {table} AS t
+LEFT JOIN (
+    SELECT {column} AS id,
+           count(*) FILTER (WHERE start_time > :rolled_until) AS upcoming,
+           count(*) FILTER (WHERE start_time <= :rolled_until) AS past
+    FROM show
+    GROUP BY {column}
+) AS c ON c.id = t.id
+WHERE t.upcoming_shows_count <> COALESCE(c.upcoming, 0)
+   OR t.past_shows_count <> COALESCE(c.past, 0)
+ORDER BY t.id
+'''
+
+FIX_DRIFT = '''
+UPDATE {table} AS t
+SET upcoming_shows_count = d.upcoming, past_shows_count = d.past
+FROM ({drift}) AS d
+WHERE t.id = d.id
+'''
+
+
+def count_new_shows(shows):
+    # Add newly inserted shows to the counters of their venues and artists.
+    # `shows` are Show instances (or anything with venue_id, artist_id and
+    # start_time); call in the transaction that inserts them.
+    shows = list(shows)
+    if not shows:
+        return
+    starts = [str(show.start_time) for show in shows]
+    for table, column in COUNTED:
+        db.session.execute(COUNT_NEW_SHOWS.format(table=table), {
+            'ids': [int(getattr(show, column)) for show in shows],
+            'starts': starts})
+
+
+def rolled_until(lock=None):
+    # the counters' watermark; `lock` is 'share' or 'update' to lock it
+    statement = 'SELECT rolled_until FROM show_counter_state'
+    if lock:
+        statement += f' FOR {lock.upper()}'
+    return db.session.execute(statement).scalar()
+
+
+def roll_forward(until):
+    # Move shows that started up to `until` from upcoming to past. Returns
+    # the ids of the venue / artist rows changed, by table.
+    since = rolled_until(lock='update')
+    if until <= since:
+        db.session.rollback()
+        return {}
+    changed = {}
+    for table, column in COUNTED:
+        changed[table] = [row.id for row in db.session.execute(
+            ROLL_FORWARD.format(table=table, column=column),
+            {'since': since, 'until': until})]
+    db.session.execute('UPDATE show_counter_state SET rolled_until = :until',
+                       {'until': until})
+    db.session.commit()
+    return changed
+
+
+def invalidate_counts(changed):
+    # The counters of the rows in `changed` ({table: ids}) moved: drop the
+    # cached pages that show them, the listings and browse pages (venues,
+    # artists, shows) and those venues' and artists' own pages.
+    cache.invalidate('venues', 'artists', 'shows', *[
+        f'{column[:-len("_id")]}:{entity_id}'
+        for table, column in COUNTED for entity_id in changed.get(table, ())])
+
+
+def counter_drift(fix=False):
+    # {table: [drifted rows]}, recomputing every counter from show; with
+    # `fix` the drifted counters are overwritten with the recomputed ones
+    watermark = rolled_until(lock='share')
+    drift = {}
+    for table, column in COUNTED:
+        query = DRIFT.format(table=table, column=column)
+        drift[table] = db.session.execute(
+            query, {'rolled_until': watermark}).fetchall()
+        if fix and drift[table]:
+            db.session.execute(
+                FIX_DRIFT.format(table=table, drift=query),
+                {'rolled_until': watermark})
+    db.session.commit()
+    return drift
+
+
+@click.command('roll-show-counters')
+@with_appcontext
+def roll_show_counters():
+    """Move shows that have started from the upcoming to the past counters."""
+    changed = roll_forward(datetime.now())
+    rows = sum(len(ids) for ids in changed.values())
+    if rows:
+        invalidate_counts(changed)
+    click.echo(f'Rolled show counters forward: {rows} row(s) changed')
+
+
+@click.command('check-show-counters')
+@click.option('--fix', is_flag=True, help='Overwrite drifted counters.')
+@click.option('--show', 'limit', default=20, show_default=True,
+              help='Drifted rows to list per table.')
+@with_appcontext
+def check_show_counters(fix, limit):
+    """Recompute the show counters and report (or fix) any drift."""
+    drift = counter_drift(fix)
+    for table, rows in drift.items():
+        click.echo(f'{table}: {len(rows)} row(s) drifted')
+        for row in rows[:limit]:
+            click.echo(f'  id {row.id}: upcoming {row.upcoming_shows_count} '
+                       f'(expected {row.upcoming}), past '
+                       f'{row.past_shows_count} (expected {row.past})')
+    if fix and any(drift.values()):
+        invalidate_counts({table: [row.id for row in rows]
+                           for table, rows in drift.items()})
+        click.echo('Fixed')
+    elif any(drift.values()):
+        raise SystemExit(1)
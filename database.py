@@ -0,0 +1,160 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import time
+import threading
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool, NullPool
+#----------------------------------------------------------------------------#
+# Engine factory.
+#
+# Builds the SQLALCHEMY_ENGINE_OPTIONS for the Postgres engine from a named
+# profile (DB_PROFILE) with single settings overridden by the DB_* config
+# values, which config.py reads from the environment.
+#
+# PgBouncer mode (DB_PGBOUNCER) is for transaction pooling, where a server
+# connection is shared between clients between transactions: no session
+# state may be left behind. The statement timeout is then set with SET LOCAL
+# at the start of each transaction instead of as a startup option (which
+# PgBouncer rejects). psycopg2 never creates server-side prepared
+# statements, so nothing else needs turning off.
+#----------------------------------------------------------------------------#
+
+PROFILES = {
+    'development': {
+        'pool_size': 5,
+        'max_overflow': 5,
+        'pool_timeout': 10,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+        'statement_timeout_ms': 30000,
+    },
+    # sized per worker process: workers x (pool_size + max_overflow) must
+    # stay under the server's (or PgBouncer's) connection limit
+    'production': {
+        'pool_size': 10,
+        'max_overflow': 10,
+        'pool_timeout': 5,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+        'statement_timeout_ms': 5000,
+    },
+    'test': {
+        'pool_size': 2,
+        'max_overflow': 0,
+        'pool_timeout': 5,
+        'pool_recycle': -1,
+        'pool_pre_ping': False,
+        'statement_timeout_ms': 10000,
+    },
+}
+
+# config key -> pool setting it overrides
+OVERRIDES = {
+    'DB_POOL_SIZE': 'pool_size',
+    'DB_MAX_OVERFLOW': 'max_overflow',
+    'DB_POOL_TIMEOUT': 'pool_timeout',
+    'DB_POOL_RECYCLE': 'pool_recycle',
+    'DB_POOL_PRE_PING': 'pool_pre_ping',
+    'DB_STATEMENT_TIMEOUT_MS': 'statement_timeout_ms',
+}
+
+
+def pool_settings(config):
+    # the profile's settings with any DB_* overrides applied
+    profile = config.get('DB_PROFILE', 'development')
+    if profile not in PROFILES:
+        raise ValueError(f'Unknown DB_PROFILE {profile!r}')
+    settings = dict(PROFILES[profile])
+    for key, setting in OVERRIDES.items():
+        if config.get(key) is not None:
+            settings[setting] = config[key]
+    return settings
+
+
+def engine_options(config):
+    # keyword arguments for create_engine(), as SQLALCHEMY_ENGINE_OPTIONS
+    settings = pool_settings(config)
+    options = {
+        'poolclass': MeteredQueuePool,
+        'pool_size': settings['pool_size'],
+        'max_overflow': settings['max_overflow'],
+        'pool_timeout': settings['pool_timeout'],
+        'pool_recycle': settings['pool_recycle'],
+        'pool_pre_ping': settings['pool_pre_ping'],
+    }
+    if config.get('DB_DISABLE_POOL'):
+        # every checkout opens a new connection: for PgBouncer in front of
+        # many short-lived processes, where it is the only pool
+        options = {'poolclass': NullPool,
+                   'pool_pre_ping': settings['pool_pre_ping']}
+    timeout = settings['statement_timeout_ms']
+    if timeout and not config.get('DB_PGBOUNCER'):
+        options['connect_args'] = {
+            'options': f'-c statement_timeout={int(timeout)}'}
+    return options
+
+
+def init_engine(engine, config):
+    # per-transaction statement timeout in PgBouncer mode
+    timeout = pool_settings(config)['statement_timeout_ms']
+    if config.get('DB_PGBOUNCER') and timeout:
+        @event.listens_for(engine, 'begin')
+        def set_statement_timeout(conn):
+            conn.execute(f'SET LOCAL statement_timeout = {int(timeout)}')
+    return engine
+
+#----------------------------------------------------------------------------#
+# Pool metrics.
+#----------------------------------------------------------------------------#
+
+
+class MeteredQueuePool(QueuePool):
+    # QueuePool that records how long checkouts take: waiting for a free
+    # connection, or opening a new one
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._wait_lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.failures = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self._wait_lock:
+                self.failures += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._wait_lock:
+                self.checkouts += 1
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        })
+    if isinstance(pool, MeteredQueuePool):
+        with pool._wait_lock:
+            stats.update({
+                "checkouts": pool.checkouts,
+                "failures": pool.failures,
+                "wait_ms_total": round(pool.wait_seconds * 1000, 2),
+                "wait_ms_avg": round(
+                    pool.wait_seconds * 1000 / max(pool.checkouts, 1), 3),
+                "wait_ms_max": round(pool.max_wait_seconds * 1000, 2),
+            })
+    return stats
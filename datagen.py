@@ -0,0 +1,171 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import os
+import json
+import random
+from datetime import datetime, timedelta
+import click
+from forms import genre_choices
+#----------------------------------------------------------------------------#
+# Synthetic catalog generator.
+#
+# Writes venues.jsonl, artists.jsonl and shows.jsonl for `flask import-data`.
+# Output depends only on the seed and the sizes. Cities, genres and show
+# placement are skewed like real traffic: a few big cities hold most venues,
+# a few genres dominate, and low-numbered venues and artists (the popular
+# ones) get most of the shows, though never two at once.
+#----------------------------------------------------------------------------#
+
+# (city, state, weight)
+CITIES = [
+    ('New York', 'NY', 30), ('Los Angeles', 'CA', 22), ('Chicago', 'IL', 15),
+    ('Houston', 'TX', 12), ('Phoenix', 'AZ', 8), ('Philadelphia', 'PA', 8),
+    ('San Antonio', 'TX', 6), ('San Diego', 'CA', 6), ('Dallas', 'TX', 6),
+    ('Austin', 'TX', 9), ('San Francisco', 'CA', 12), ('Seattle', 'WA', 9),
+    ('Denver', 'CO', 6), ('Nashville', 'TN', 10), ('New Orleans', 'LA', 8),
+    ('Boston', 'MA', 7), ('Portland', 'OR', 5), ('Atlanta', 'GA', 6),
+    ('Detroit', 'MI', 4), ('Minneapolis', 'MN', 4), ('Miami', 'FL', 5),
+    ('Memphis', 'TN', 3), ('Kansas City', 'MO', 2), ('Boise', 'ID', 1),
+    ('Burlington', 'VT', 1), ('Anchorage', 'AK', 1),
+]
+# genre weights follow the order of genre_choices
+GENRE_WEIGHTS = [5, 6, 4, 7, 6, 4, 3, 9, 4, 2, 8, 2, 12, 4, 6, 3, 10, 4, 1]
+ADJECTIVES = ['Blue', 'Golden', 'Velvet', 'Electric', 'Wild', 'Silver',
+              'Midnight', 'Rusty', 'Lucky', 'Crimson', 'Hollow', 'Neon']
+NOUNS = ['Room', 'Hall', 'Tavern', 'Lounge', 'Barn', 'Garden', 'Cellar',
+         'Theater', 'Club', 'Stage', 'Depot', 'Factory']
+# evening slots, on the hour: shows last the default 2 hours, so slots of
+# one evening (and the next evening's) never overlap
+SLOT_HOURS = (18, 20, 22)
+# slots tried forward from a taken one before drawing another pair
+SLOT_PROBES = 64
+BANDS = ['Wolves', 'Sparrows', 'Pilots', 'Saints', 'Ghosts', 'Rivers',
+         'Machines', 'Lanterns', 'Kings', 'Strangers', 'Comets', 'Daughters']
+
+
+def skewed(rng, size, skew):
+    # an index in [0, size); skew > 1 favours low indexes (1 is uniform)
+    return min(int(size * rng.random() ** skew), size - 1)
+
+
+def pick_genres(rng):
+    genres = {genre for genre, _ in rng.choices(
+        genre_choices, weights=GENRE_WEIGHTS, k=rng.randint(1, 4))}
+    return sorted(genres)
+
+
+def phone(rng):
+    return '{:03d}-{:03d}-{:04d}'.format(
+        rng.randint(200, 999), rng.randint(100, 999), rng.randint(0, 9999))
+
+
+def venue(rng, id):
+    city, state, _ = rng.choices(CITIES, weights=[c[2] for c in CITIES])[0]
+    name = f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}'
+    seeking = rng.random() < 0.3
+    return {
+        "id": id,
+        "name": f'The {name} {id}',
+        "city": city,
+        "state": state,
+        "address": f'{rng.randint(1, 9999)} {rng.choice(ADJECTIVES)} Street',
+        "phone": phone(rng),
+        "genres": pick_genres(rng),
+        "website": f'https://venue{id}.example.com',
+        "facebook_link": f'https://www.facebook.com/venue{id}',
+        "seeking_talent": seeking,
+        "seeking_description": 'Looking for local acts.' if seeking else None,
+    }
+
+
+def artist(rng, id):
+    city, state, _ = rng.choices(CITIES, weights=[c[2] for c in CITIES])[0]
+    seeking = rng.random() < 0.4
+    return {
+        "id": id,
+        "name": f'{rng.choice(ADJECTIVES)} {rng.choice(BANDS)} {id}',
+        "city": city,
+        "state": state,
+        "phone": phone(rng),
+        "genres": pick_genres(rng),
+        "website": f'https://artist{id}.example.com',
+        "facebook_link": f'https://www.facebook.com/artist{id}',
+        "seeking_venue": seeking,
+        "seeking_description": 'Looking for a residency.' if seeking else None,
+    }
+
+
+def show(rng, id, venues, artists, skew, start, days, booked):
+    # A show in an evening slot that neither its venue nor its artist has
+    # booked, so the catalog passes the double-booking constraints
+    # (migration f3a9c1e5d7b2). `booked` holds the slots taken, per venue
+    # and per artist; from a random slot the next free one is used, and a
+    # pair with none free nearby is drawn again.
+    slots = days * len(SLOT_HOURS)
+    venue_slots, artist_slots = booked
+    while True:
+        venue_id = skewed(rng, venues, skew) + 1
+        artist_id = skewed(rng, artists, skew) + 1
+        at_venue = venue_slots.setdefault(venue_id, set())
+        at_artist = artist_slots.setdefault(artist_id, set())
+        first = rng.randrange(slots)
+        for step in range(min(SLOT_PROBES, slots)):
+            slot = (first + step) % slots
+            if slot in at_venue or slot in at_artist:
+                continue
+            at_venue.add(slot)
+            at_artist.add(slot)
+            day, hour = divmod(slot, len(SLOT_HOURS))
+            return {
+                "id": id,
+                "venue_id": venue_id,
+                "artist_id": artist_id,
+                "start_time": (start + timedelta(
+                    days=day, hours=SLOT_HOURS[hour])).isoformat(),
+            }
+
+
+def write(path, records):
+    with open(path, 'w', encoding='utf-8') as out:
+        for record in records:
+            out.write(json.dumps(record) + '\n')
+
+
+@click.command('generate-data')
+@click.option('--venues', default=10000, show_default=True)
+@click.option('--artists', default=10000, show_default=True)
+@click.option('--shows', default=100000, show_default=True)
+@click.option('--seed', default=42, show_default=True)
+@click.option('--skew', default=3.0, show_default=True,
+              help='Popularity skew of venues and artists (1 = uniform).')
+@click.option('--past-days', default=3 * 365, show_default=True)
+@click.option('--future-days', default=365, show_default=True)
+@click.option('--out', default='data', show_default=True,
+              type=click.Path(file_okay=False))
+def generate_data(venues, artists, shows, seed, skew, past_days, future_days,
+                  out):
+    """Write a deterministic synthetic catalog as JSONL files."""
+    os.makedirs(out, exist_ok=True)
+    # one generator per file, so each file depends only on its own size
+    rngs = [random.Random(f'{seed}:{kind}')
+            for kind in ('venues', 'artists', 'shows')]
+    # anchor show dates to a fixed day, not today, for reproducible output
+    start = datetime(2026, 1, 1) - timedelta(days=past_days)
+    days = past_days + future_days
+    if shows > min(venues, artists) * days * len(SLOT_HOURS):
+        raise click.ClickException(
+            f'{shows} shows do not fit {days} days of evening slots at '
+            f'{min(venues, artists)} venues / artists without double booking')
+    # slots taken per venue and per artist
+    booked = ({}, {})
+    write(os.path.join(out, 'venues.jsonl'),
+          (venue(rngs[0], id) for id in range(1, venues + 1)))
+    write(os.path.join(out, 'artists.jsonl'),
+          (artist(rngs[1], id) for id in range(1, artists + 1)))
+    write(os.path.join(out, 'shows.jsonl'),
+          (show(rngs[2], id, venues, artists, skew, start, days, booked)
+           for id in range(1, shows + 1)))
+    click.echo(f'Wrote {venues} venues, {artists} artists and {shows} shows '
+               f'to {out}/')
@@ -1,4 +1,5 @@
-from app import db, Venue, Artist, Show
+from models import db, Venue, Artist, Show
+from counters import count_new_shows
 import sys
 
 artist_data1 = {
@@ -112,10 +113,9 @@ def dummy_venue_data():
     error = False
     try:
         venue_data = [venue_data1, venue_data2, venue_data3]
-        for data in venue_data:
-            vn = Venue(**data)
-            db.session.add(vn)
-            db.session.commit()
+        # one transaction for all rows
+        db.session.add_all([Venue(**data) for data in venue_data])
+        db.session.commit()
     except:
         error = True
         db.session.rollback()
@@ -128,10 +128,9 @@ def dummy_artist_data():
     error = False
     try:
         artist_data = [artist_data1, artist_data2, artist_data3]
-        for data in artist_data:
-            ar = Artist(**data)
-            db.session.add(ar)
-            db.session.commit()
+        # one transaction for all rows
+        db.session.add_all([Artist(**data) for data in artist_data])
+        db.session.commit()
     except:
         error = True
         db.session.rollback()
@@ -143,14 +142,25 @@ def dummy_artist_data():
 def dummy_show_data():
     error = False
     try:
-        for data in show_data:
-            sh = Show(**data)
-            db.session.add(sh)
-            db.session.commit()
-            print("data successfully created")
+        # one transaction for all rows, counted on their venues and artists
+        shows = [Show(**data) for data in show_data]
+        db.session.add_all(shows)
+        db.session.flush()
+        count_new_shows(shows)
+        db.session.commit()
+        print("data successfully created")
     except:
         error = True
         db.session.rollback()
         print(f'Show: {sys.exc_info()}')
     finally:
         db.session.close()
+
+
+if __name__ == '__main__':
+    # the models are not bound to an app; load the data in an app context
+    from app import create_app
+    with create_app().app_context():
+        dummy_venue_data()
+        dummy_artist_data()
+        dummy_show_data()
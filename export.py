@@ -0,0 +1,208 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import io
+import csv
+import sys
+import json
+import zlib
+from datetime import datetime
+import click
+from flask import Blueprint, Response, request, stream_with_context
+from flask.cli import with_appcontext
+from werkzeug.exceptions import BadRequest, NotFound
+from models import db, Venue, Artist, Show
+from queries import show_listing
+from replicas import read_replica
+from instrumentation import local_only
+#----------------------------------------------------------------------------#
+# Streaming exports.
+#
+# Full dumps of shows (joined with venue and artist names, as on /shows),
+# venues or artists as CSV or NDJSON, optionally gzipped, from
+# /export/<kind> or `flask export <kind>`. Rows come from a server-side
+# cursor (stream_results) in batches of BATCH_SIZE rows and are encoded
+# and sent one batch at a time, so memory stays flat however large the
+# table is. CSV output uses the importer's conventions (genres joined with
+# ';', booleans as true / false), so a dump can be loaded back with
+# `flask import-data`.
+#
+# The dumps hold every contact detail and each keeps a connection busy for
+# its whole length: like the other ops endpoints, /export answers local
+# requests only (SQL_STATS_ALLOWED_HOSTS).
+#----------------------------------------------------------------------------#
+
+export = Blueprint('export', __name__, url_prefix='/export')
+
+KINDS = ('shows', 'venues', 'artists')
+FORMATS = ('csv', 'ndjson')
+BATCH_SIZE = 2000
+
+
+def export_query(kind, start=None, end=None, city=None):
+    # Rows to export, as (columns, query). start / end bound the show start
+    # time (end exclusive) and only apply to shows; city applies to the
+    # venue of a show and to venues and artists themselves.
+    if kind == 'shows':
+        query = show_listing().add_columns(Venue.city.label('venue_city'))
+        if start:
+            query = query.filter(Show.start_time >= start)
+        if end:
+            query = query.filter(Show.start_time < end)
+        if city:
+            query = query.filter(Venue.city == city)
+        query = query.order_by(Show.start_time, Show.id)
+    else:
+        model = Venue if kind == 'venues' else Artist
+        if start or end:
+            raise BadRequest('start / end only apply to shows')
+        # plain columns, not entities: nothing is kept in the identity map
+        query = db.session.query(*model.__table__.columns)
+        if city:
+            query = query.filter(model.city == city)
+        query = query.order_by(model.id)
+    columns = [column['name'] for column in query.column_descriptions]
+    return columns, query
+
+
+def stream_rows(query, batch_size):
+    # Executes `query` right away on a server-side cursor and returns an
+    # iterator over its rows, fetched `batch_size` at a time.
+    return iter(query.execution_options(stream_results=True)
+                .yield_per(batch_size))
+
+#----------------------------------------------------------------------------#
+# Encoders: each turns rows into chunks of bytes, one per batch.
+#----------------------------------------------------------------------------#
+
+
+def csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, list):
+        return ';'.join(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def csv_chunks(columns, rows, batch_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for number, row in enumerate(rows, start=1):
+        writer.writerow([csv_value(value) for value in row])
+        if number % batch_size == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def ndjson_chunks(columns, rows, batch_size):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(
+            dict(zip(columns, row)), separators=(',', ':'),
+            default=lambda value: value.isoformat()))
+        if len(lines) == batch_size:
+            yield ('\n'.join(lines) + '\n').encode()
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+def gzip_chunks(chunks):
+    # a gzip stream (wbits 31: gzip header and trailer) compressed on the go
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+ENCODERS = {'csv': csv_chunks, 'ndjson': ndjson_chunks}
+MIMETYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+def export_chunks(kind, fmt, gzip=False, start=None, end=None, city=None,
+                  batch_size=BATCH_SIZE):
+    # (filename, chunks): the query is already running when this returns
+    columns, query = export_query(kind, start, end, city)
+    chunks = ENCODERS[fmt](columns, stream_rows(query, batch_size),
+                           batch_size)
+    filename = f'{kind}.{fmt}'
+    if gzip:
+        return filename + '.gz', gzip_chunks(chunks)
+    return filename, chunks
+
+
+def parse_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise BadRequest(f'Invalid date {value!r}')
+
+#----------------------------------------------------------------------------#
+# Endpoint and command.
+#----------------------------------------------------------------------------#
+
+
+@export.route('/<kind>')
+@read_replica
+def export_view(kind):
+    # /export/shows?format=ndjson&gzip=1&start=2026-01-01&end=2026-02-01
+    local_only()
+    if kind not in KINDS:
+        raise NotFound(f'Unknown export {kind!r}')
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        raise BadRequest(f'Unknown format {fmt!r}')
+    gzip = request.args.get('gzip') in ('1', 'true', 'yes')
+    # the query runs here, on the replica picked for this request; the
+    # rows are fetched while the response streams
+    filename, chunks = export_chunks(
+        kind, fmt, gzip,
+        parse_date(request.args.get('start')),
+        parse_date(request.args.get('end')),
+        request.args.get('city'))
+    response = Response(
+        stream_with_context(chunks),
+        mimetype='application/gzip' if gzip else MIMETYPES[fmt])
+    response.headers['Content-Disposition'] = \
+        f'attachment; filename="{filename}"'
+    return response
+
+
+@click.command('export')
+@click.argument('kind', type=click.Choice(KINDS))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), default='csv',
+              show_default=True)
+@click.option('--gzip', is_flag=True, help='Gzip the output.')
+@click.option('--start', type=click.DateTime(), help='Shows from (inclusive).')
+@click.option('--end', type=click.DateTime(), help='Shows until (exclusive).')
+@click.option('--city', help='Only this city (the venue city for shows).')
+@click.option('--out', type=click.Path(dir_okay=False),
+              help='Output file (default: standard output).')
+@click.option('--batch-size', default=BATCH_SIZE, show_default=True)
+@with_appcontext
+def export_command(kind, fmt, gzip, start, end, city, out, batch_size):
+    """Stream shows, venues or artists as CSV or NDJSON."""
+    try:
+        filename, chunks = export_chunks(kind, fmt, gzip, start, end, city,
+                                         batch_size)
+    except BadRequest as error:
+        raise click.UsageError(error.description)
+    target = open(out, 'wb') if out else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            target.write(chunk)
+    finally:
+        if out:
+            target.close()
@@ -0,0 +1,156 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import time
+import random
+from datetime import datetime, timedelta
+from functools import lru_cache
+import click
+import pytz
+import dateutil.parser
+import babel.dates
+from babel import Locale
+from flask import current_app, request, has_request_context
+from flask.cli import with_appcontext
+#----------------------------------------------------------------------------#
+# Show times and date formatting.
+#
+# Show start times are stored naive, as wall-clock time in SHOW_TIMEZONE.
+# That is the one convention for every naive time the app stores or takes:
+# aware times from the API, schedules and imports are converted to it
+# (show_time()), and naive ones are read as already in it.
+#
+# The `datetime` template filter displays each in the visitor's timezone
+# (the `tz` cookie, set by static/js/script.js from the browser, if it names
+# a known zone) or else in SHOW_TIMEZONE itself. Formatting goes through a
+# formatter built once per (format, locale, timezone) - pattern parsed,
+# locale and zones resolved - and results are memoized, as pages list the
+# same few timestamps over and over.
+#----------------------------------------------------------------------------#
+
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@lru_cache(maxsize=None)
+def zone(name):
+    # the pytz zone called `name`, None if there is no such zone
+    try:
+        return pytz.timezone(name)
+    except (pytz.UnknownTimeZoneError, AttributeError):
+        return None
+
+
+def show_time(moment):
+    # `moment` as start_time stores it: naive, in SHOW_TIMEZONE
+    if moment.tzinfo is None:
+        return moment
+    source = zone(current_app.config.get('SHOW_TIMEZONE', 'UTC'))
+    return moment.astimezone(source).replace(tzinfo=None)
+
+
+def display_timezone():
+    # the visitor's timezone name, falling back to SHOW_TIMEZONE
+    default = current_app.config.get('SHOW_TIMEZONE', 'UTC')
+    if not has_request_context():
+        return default
+    name = request.cookies.get('tz')
+    return name if name and zone(name) is not None else default
+
+
+@lru_cache(maxsize=256)
+def formatter(format, locale, source, target):
+    # a function formatting naive datetimes in `source` as `format` in
+    # `locale`, converted to `target`
+    pattern = babel.dates.parse_pattern(FORMATS.get(format, format))
+    locale = Locale.parse(locale)
+    source, target = zone(source), zone(target)
+    if source.zone == target.zone:
+        return lambda value: pattern.apply(value, locale)
+
+    def convert_and_format(value):
+        return pattern.apply(
+            target.normalize(source.localize(value).astimezone(target)),
+            locale)
+    return convert_and_format
+
+
+@lru_cache(maxsize=8192)
+def format_cached(value, format, locale, source, target):
+    return formatter(format, locale, source, target)(value)
+
+
+def format_datetime(value, format='medium'):
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        # older callers pass strings
+        value = dateutil.parser.parse(value)
+    config = current_app.config
+    return format_cached(value, format, config.get('DATETIME_LOCALE', 'en_US'),
+                         config.get('SHOW_TIMEZONE', 'UTC'),
+                         display_timezone())
+
+
+def init_formatting(app):
+    app.jinja_env.filters['datetime'] = format_datetime
+    # fragments holding dates vary with it
+    app.jinja_env.globals['display_timezone'] = display_timezone
+
+#----------------------------------------------------------------------------#
+# Micro-benchmark.
+#----------------------------------------------------------------------------#
+
+
+def legacy_format_datetime(value, format='medium'):
+    # the filter as it was: a string parsed and babel resolving everything
+    # on each call
+    date = dateutil.parser.parse(value)
+    return babel.dates.format_datetime(date, FORMATS.get(format, format))
+
+
+def time_calls(function, values):
+    started = time.perf_counter()
+    for value in values:
+        function(value)
+    return (time.perf_counter() - started) / len(values) * 1e6
+
+
+@click.command('bench-datetime')
+@click.option('--count', default=20000, show_default=True,
+              help='Values formatted per run.')
+@click.option('--distinct', default=500, show_default=True,
+              help='Distinct timestamps among them.')
+@click.option('--tz', 'tz_name', default=None,
+              help='Display timezone (default: SHOW_TIMEZONE).')
+@click.option('--format', 'fmt', default='full', show_default=True)
+@with_appcontext
+def bench_datetime(count, distinct, tz_name, fmt):
+    """Time the datetime filter against the previous implementation."""
+    config = current_app.config
+    locale = config.get('DATETIME_LOCALE', 'en_US')
+    source = config.get('SHOW_TIMEZONE', 'UTC')
+    target = tz_name or source
+    if zone(target) is None:
+        raise click.BadParameter(f'Unknown timezone {target!r}')
+    start = datetime(2026, 1, 1, 20)
+    pool = [start + timedelta(hours=random.randrange(24 * 365))
+            for _ in range(distinct)]
+    values = [random.choice(pool) for _ in range(count)]
+    strings = [str(value) for value in values]
+    runs = [
+        ('legacy (str + dateutil + babel)',
+         lambda value: legacy_format_datetime(value, fmt), strings),
+        ('prebuilt formatter, no memo',
+         formatter(fmt, locale, source, target), values),
+    ]
+    format_cached.cache_clear()
+    runs.append(('filter (memoized)',
+                 lambda value: format_cached(value, fmt, locale, source,
+                                             target), values))
+    for name, function, inputs in runs:
+        click.echo(f'{name:<34}{time_calls(function, inputs):>9.2f} us/call')
+    click.echo(f'memo: {format_cached.cache_info()}')
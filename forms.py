@@ -1,7 +1,32 @@
 from datetime import datetime
 from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL, InputRequired
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField, TextAreaField
+from wtforms.validators import DataRequired, AnyOf, URL, InputRequired, Optional
+
+# Genres offered by the venue and artist forms
+genre_choices = [
+    ('Alternative', 'Alternative'),
+    ('Blues', 'Blues'),
+    ('Classical', 'Classical'),
+    ('Country', 'Country'),
+    ('Electronic', 'Electronic'),
+    ('Folk', 'Folk'),
+    ('Funk', 'Funk'),
+    ('Hip-Hop', 'Hip-Hop'),
+    ('Heavy Metal', 'Heavy Metal'),
+    ('Instrumental', 'Instrumental'),
+    ('Jazz', 'Jazz'),
+    ('Musical Theatre', 'Musical Theatre'),
+    ('Pop', 'Pop'),
+    ('Punk', 'Punk'),
+    ('R&B', 'R&B'),
+    ('Reggae', 'Reggae'),
+    ('Rock n Roll', 'Rock n Roll'),
+    ('Soul', 'Soul'),
+    ('Other', 'Other'),
+]
+
+
 class ShowForm(Form):
     artist_id = StringField(
         'artist_id', validators=[InputRequired()]
@@ -14,6 +39,50 @@ class ShowForm(Form):
         validators=[DataRequired()],
         default= datetime.today()
     )
+    duration = IntegerField(
+        # minutes; 2 hours (the database default) when empty
+        'duration', validators=[Optional()]
+    )
+
+class ScheduleForm(Form):
+    # a recurring schedule of shows (schedule.py)
+    artist_id = StringField(
+        'artist_id', validators=[InputRequired()]
+    )
+    venue_id = StringField(
+        'venue_id', validators=[InputRequired()]
+    )
+    recurrence = SelectField(
+        'recurrence', validators=[InputRequired()],
+        choices=[
+            ('weekly', 'Weekly'),
+            ('dates', 'On these dates'),
+            ('rrule', 'Recurrence rule (RRULE)'),
+        ]
+    )
+    start_time = DateTimeField(
+        'start_time', validators=[Optional()]
+    )
+    duration = IntegerField(
+        # minutes, the same for every show
+        'duration', validators=[Optional()]
+    )
+    count = IntegerField(
+        'count', validators=[Optional()]
+    )
+    until = DateTimeField(
+        'until', validators=[Optional()]
+    )
+    interval = IntegerField(
+        'interval', validators=[Optional()], default=1
+    )
+    dates = TextAreaField(
+        # one start time per line
+        'dates'
+    )
+    rrule = StringField(
+        'rrule'
+    )
 
 class VenueForm(Form):
     # FIXME: phone_validation not worked
@@ -99,26 +168,7 @@ class VenueForm(Form):
     genres = SelectMultipleField(
         # TODO implement enum restriction
 
-        'genres', validators=[DataRequired()], choices=[('Alternative', 'Alternative'),
-            ('Blues', 'Blues'),
-            ('Classical', 'Classical'),
-            ('Country', 'Country'),
-            ('Electronic', 'Electronic'),
-            ('Folk', 'Folk'),
-            ('Funk', 'Funk'),
-            ('Hip-Hop', 'Hip-Hop'),
-            ('Heavy Metal', 'Heavy Metal'),
-            ('Instrumental', 'Instrumental'),
-            ('Jazz', 'Jazz'),
-            ('Musical Theatre', 'Musical Theatre'),
-            ('Pop', 'Pop'),
-            ('Punk', 'Punk'),
-            ('R&B', 'R&B'),
-            ('Reggae', 'Reggae'),
-            ('Rock n Roll', 'Rock n Roll'),
-            ('Soul', 'Soul'),
-            ('Other', 'Other'),
-        ]
+        'genres', validators=[DataRequired()], choices=genre_choices
     )
     facebook_link = StringField(
         'facebook_link', validators=[URL()]
@@ -212,27 +262,7 @@ class ArtistForm(Form):
     genres = SelectMultipleField(
         # TODO implement enum restriction
         'genres', validators=[DataRequired()],
-        choices=[
-            ('Alternative', 'Alternative'),
-            ('Blues', 'Blues'),
-            ('Classical', 'Classical'),
-            ('Country', 'Country'),
-            ('Electronic', 'Electronic'),
-            ('Folk', 'Folk'),
-            ('Funk', 'Funk'),
-            ('Hip-Hop', 'Hip-Hop'),
-            ('Heavy Metal', 'Heavy Metal'),
-            ('Instrumental', 'Instrumental'),
-            ('Jazz', 'Jazz'),
-            ('Musical Theatre', 'Musical Theatre'),
-            ('Pop', 'Pop'),
-            ('Punk', 'Punk'),
-            ('R&B', 'R&B'),
-            ('Reggae', 'Reggae'),
-            ('Rock n Roll', 'Rock n Roll'),
-            ('Soul', 'Soul'),
-            ('Other', 'Other'),
-        ]
+        choices=genre_choices
     )
     facebook_link = StringField(
         # TODO implement enum restriction
@@ -0,0 +1,381 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import io
+import csv
+import json
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+import click
+from flask.cli import with_appcontext
+from psycopg2.errors import ExclusionViolation
+from psycopg2.extras import execute_values
+from models import db, Show
+from counters import counter_drift
+from formatting import show_time
+#----------------------------------------------------------------------------#
+# Bulk import of venues, artists and shows.
+#
+# Records are streamed from CSV or JSONL files, validated, and loaded in
+# batches with COPY (or multi-row INSERT ... VALUES as a fallback), one
+# transaction per batch. The number of records already loaded from each file
+# is stored in the import_checkpoint table inside the same transaction as the
+# batch, so an interrupted import resumes exactly where it stopped. A batch
+# holding a show that overlaps another of its venue or artist is loaded
+# again without such shows.
+#----------------------------------------------------------------------------#
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def text(value):
+    return None if value in (None, '') else str(value)
+
+
+def boolean(value):
+    if isinstance(value, bool) or value is None:
+        return value
+    return str(value).strip().lower() in ('1', 't', 'true', 'yes', 'y')
+
+
+def genres(value):
+    # a JSON list, or a ';'-separated string in CSV files
+    if isinstance(value, str):
+        value = json.loads(value) if value.startswith('[') else [
+            genre.strip() for genre in value.split(';') if genre.strip()]
+    if not isinstance(value, list) or not value:
+        raise InvalidRecord('genres must be a non-empty list')
+    return [str(genre) for genre in value]
+
+
+def timestamp(value):
+    # an ISO 8601 time (or a datetime) as stored: naive, in SHOW_TIMEZONE
+    if not isinstance(value, datetime):
+        # fromisoformat() on 3.7+ does not take a 'Z' suffix
+        value = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    return show_time(value)
+
+
+def minutes(value):
+    # a duration in whole minutes (forms, the API and imports)
+    if isinstance(value, timedelta):
+        duration = value
+    else:
+        duration = timedelta(minutes=int(value))
+    if duration <= timedelta(0):
+        raise ValueError('duration must be positive')
+    return duration
+
+
+# column -> (converter, required) for each importable table
+FIELDS = {
+    'venues': {
+        'id': (int, False),
+        'name': (text, True),
+        'city': (text, True),
+        'state': (text, True),
+        'address': (text, True),
+        'phone': (text, True),
+        'genres': (genres, True),
+        'image_link': (text, False),
+        'facebook_link': (text, False),
+        'website': (text, False),
+        'seeking_talent': (boolean, False),
+        'seeking_description': (text, False),
+    },
+    'artists': {
+        'id': (int, False),
+        'name': (text, True),
+        'city': (text, True),
+        'state': (text, True),
+        'phone': (text, True),
+        'genres': (genres, True),
+        'image_link': (text, False),
+        'facebook_link': (text, False),
+        'website': (text, False),
+        'seeking_venue': (boolean, False),
+        'seeking_description': (text, False),
+    },
+    'show': {
+        'id': (int, False),
+        'venue_id': (int, True),
+        'artist_id': (int, True),
+        'start_time': (timestamp, True),
+        # the database default (2 hours) when left out
+        'duration': (minutes, False),
+    },
+}
+
+#----------------------------------------------------------------------------#
+# Reading and validation.
+#----------------------------------------------------------------------------#
+
+
+def read_records(path):
+    # stream dicts from a .csv (with header row) or .jsonl file
+    with open(path, newline='', encoding='utf-8') as source:
+        if path.endswith('.csv'):
+            yield from csv.DictReader(source)
+        else:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def validate(record, fields, columns):
+    # the record as a tuple of `columns` values; raises InvalidRecord
+    row = []
+    for column in columns:
+        convert, required = fields[column]
+        value = record.get(column)
+        if value in (None, ''):
+            if required:
+                raise InvalidRecord(f'{column} is required')
+            row.append(None)
+            continue
+        try:
+            row.append(convert(value))
+        except (TypeError, ValueError) as error:
+            raise InvalidRecord(f'{column}: {error}')
+    return tuple(row)
+
+#----------------------------------------------------------------------------#
+# Loading.
+#----------------------------------------------------------------------------#
+
+
+def copy_value(value):
+    # one field of COPY ... (FORMAT csv); an unquoted empty field is NULL
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, list):
+        return '{' + ','.join(
+            '"' + item.replace('\\', '\\\\').replace('"', '\\"') + '"'
+            for item in value) + '}'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return f'{value.total_seconds()} seconds'
+    return value
+
+
+def load_copy(cursor, table, columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([copy_value(value) for value in row])
+    buffer.seek(0)
+    cursor.copy_expert(
+        f'COPY {table} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)',
+        buffer)
+
+
+def load_values(cursor, table, columns, rows):
+    execute_values(
+        cursor, f'INSERT INTO {table} ({", ".join(columns)}) VALUES %s',
+        rows, page_size=1000)
+
+
+def load_skipping_overlaps(cursor, table, columns, rows):
+    # rows the exclusion constraints refuse are skipped (ON CONFLICT DO
+    # NOTHING); returns the number inserted
+    return len(execute_values(
+        cursor, f'INSERT INTO {table} ({", ".join(columns)}) VALUES %s '
+        'ON CONFLICT DO NOTHING RETURNING 1', rows, page_size=1000,
+        fetch=True))
+
+
+LOADERS = {'copy': load_copy, 'values': load_values}
+
+
+def ensure_bookkeeping(cursor):
+    cursor.execute(
+        'CREATE TABLE IF NOT EXISTS import_checkpoint ('
+        'source TEXT PRIMARY KEY, records BIGINT NOT NULL)')
+    cursor.execute(
+        'CREATE TABLE IF NOT EXISTS import_deferred_index ('
+        'name TEXT PRIMARY KEY, tablename TEXT NOT NULL, '
+        'definition TEXT NOT NULL)')
+
+
+def checkpoint(cursor, source):
+    cursor.execute(
+        'SELECT records FROM import_checkpoint WHERE source = %s', (source,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def drop_secondary_indexes(cursor, table):
+    # Drop the secondary indexes of `table`, remembering their definitions
+    # so rebuild_indexes() can build them once after the load. Definitions
+    # saved by an interrupted earlier run are kept.
+    cursor.execute(
+        "SELECT i.indexname, i.indexdef FROM pg_indexes i "
+        "WHERE i.tablename = %s AND i.schemaname = current_schema() "
+        "AND NOT EXISTS (SELECT 1 FROM pg_constraint c "
+        "WHERE c.conname = i.indexname)", (table,))
+    for name, definition in cursor.fetchall():
+        cursor.execute(
+            'INSERT INTO import_deferred_index (name, tablename, definition) '
+            'VALUES (%s, %s, %s) ON CONFLICT (name) DO NOTHING',
+            (name, table, definition))
+        cursor.execute(f'DROP INDEX {name}')
+
+
+def rebuild_indexes(cursor):
+    cursor.execute('SELECT name, definition FROM import_deferred_index')
+    for name, definition in cursor.fetchall():
+        started = time.perf_counter()
+        cursor.execute(definition)
+        cursor.execute(
+            'DELETE FROM import_deferred_index WHERE name = %s', (name,))
+        click.echo(f'  built index {name} '
+                   f'in {time.perf_counter() - started:.1f}s')
+
+
+def reset_sequence(cursor, table):
+    # explicit ids were loaded: move the id sequence past them
+    cursor.execute(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+        f"GREATEST((SELECT max(id) FROM {table}), 1))")
+
+
+def import_file(connection, table, path, batch_size, load, known=None):
+    # Load one file in batches, resuming after its checkpoint. `known`
+    # maps foreign key columns to the set of ids that exist. Returns
+    # (loaded, rejected) record counts.
+    fields = FIELDS[table]
+    cursor = connection.cursor()
+    source = f'{table}:{path}'
+    done = checkpoint(cursor, source)
+    records = enumerate(read_records(path), start=1)
+    # skip what earlier runs already loaded
+    for _ in islice(records, done):
+        pass
+    columns = None
+    loaded = rejected = 0
+    started = time.perf_counter()
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            break
+        if columns is None:
+            # load the columns the file provides (the id is optional)
+            columns = [column for column in fields
+                       if column in batch[0][1] or fields[column][1]]
+        rows = []
+        for number, record in batch:
+            try:
+                row = validate(record, fields, columns)
+                for column, ids in (known or {}).items():
+                    if row[columns.index(column)] not in ids:
+                        raise InvalidRecord(f'{column} does not exist')
+                rows.append(row)
+            except InvalidRecord as error:
+                rejected += 1
+                click.echo(f'  {path}:{number}: skipped, {error}', err=True)
+        inserted = len(rows)
+        if rows:
+            try:
+                load(cursor, table, columns, rows)
+            except ExclusionViolation:
+                # a show overlapping another of its venue or artist fails
+                # the whole batch: load it again without those
+                connection.rollback()
+                inserted = load_skipping_overlaps(cursor, table, columns,
+                                                  rows)
+                rejected += len(rows) - inserted
+                click.echo(f'  {path}: skipped {len(rows) - inserted} '
+                           'overlapping show(s)', err=True)
+        done = batch[-1][0]
+        cursor.execute(
+            'INSERT INTO import_checkpoint (source, records) VALUES (%s, %s) '
+            'ON CONFLICT (source) DO UPDATE SET records = EXCLUDED.records',
+            (source, done))
+        connection.commit()
+        loaded += inserted
+        elapsed = max(time.perf_counter() - started, 1e-6)
+        click.echo(f'  {table}: {loaded} loaded, {rejected} rejected, '
+                   f'{loaded / elapsed:,.0f} rows/s')
+    if columns and 'id' in columns:
+        reset_sequence(cursor, table)
+        connection.commit()
+    return loaded, rejected
+
+
+def existing_ids(connection, table):
+    cursor = connection.cursor(name=f'{table}_ids')
+    cursor.itersize = 100000
+    cursor.execute(f'SELECT id FROM {table}')
+    ids = {row[0] for row in cursor}
+    cursor.close()
+    return ids
+
+
+@click.command('import-data')
+@click.option('--venues', type=click.Path(exists=True, dir_okay=False),
+              help='Venues .csv or .jsonl file.')
+@click.option('--artists', type=click.Path(exists=True, dir_okay=False),
+              help='Artists .csv or .jsonl file.')
+@click.option('--shows', type=click.Path(exists=True, dir_okay=False),
+              help='Shows .csv or .jsonl file.')
+@click.option('--batch-size', default=50000, show_default=True)
+@click.option('--method', type=click.Choice(sorted(LOADERS)), default='copy',
+              show_default=True, help='COPY, or multi-row INSERT ... VALUES.')
+@click.option('--defer-indexes', is_flag=True,
+              help='Drop secondary indexes on show and rebuild them at the end.')
+@click.option('--restart', is_flag=True,
+              help='Forget checkpoints and load the files from the start.')
+@with_appcontext
+def import_data(venues, artists, shows, batch_size, method, defer_indexes,
+                restart):
+    """Bulk-load venues, artists and shows from CSV/JSONL files."""
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        # index builds and large batches outlast the web statement_timeout
+        cursor.execute('SET statement_timeout = 0')
+        ensure_bookkeeping(cursor)
+        if restart:
+            cursor.execute('DELETE FROM import_checkpoint')
+        connection.commit()
+        load = LOADERS[method]
+        started = time.perf_counter()
+        total = 0
+        for table, path in (('venues', venues), ('artists', artists)):
+            if path:
+                click.echo(f'Importing {table} from {path}')
+                total += import_file(
+                    connection, table, path, batch_size, load)[0]
+        if shows:
+            click.echo(f'Importing shows from {shows}')
+            if defer_indexes:
+                drop_secondary_indexes(cursor, Show.__tablename__)
+                connection.commit()
+            # foreign keys are checked against the ids in memory, so one bad
+            # row is skipped instead of failing its whole COPY batch
+            known = {'venue_id': existing_ids(connection, 'venues'),
+                     'artist_id': existing_ids(connection, 'artists')}
+            total += import_file(
+                connection, 'show', shows, batch_size, load, known)[0]
+        # also builds indexes deferred by an interrupted earlier run
+        rebuild_indexes(cursor)
+        for table in ('venues', 'artists', 'show'):
+            cursor.execute(f'ANALYZE {table}')
+        connection.commit()
+        if shows:
+            # COPY bypassed count_new_shows(): recompute the show counters
+            drift = counter_drift(fix=True)
+            click.echo('Recounted shows of {} venue(s) and {} artist(s)'.format(
+                len(drift['venues']), len(drift['artists'])))
+        elapsed = max(time.perf_counter() - started, 1e-6)
+        click.echo(f'Imported {total} records in {elapsed:.1f}s '
+                   f'({total / elapsed:,.0f} rows/s)')
+    finally:
+        connection.close()
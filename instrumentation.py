@@ -0,0 +1,191 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import re
+import json
+import time
+import threading
+from collections import Counter
+from flask import (g, request, current_app, jsonify, abort,
+                   has_request_context, request_started, request_finished)
+from sqlalchemy import event
+from database import pool_stats
+#----------------------------------------------------------------------------#
+# Per-request SQL instrumentation.
+#
+# Cursor events count every statement a request sends and time it; Flask's
+# request signals open and close the per-request tally. Each response gets
+# X-Query-Count and X-DB-Time-Ms headers and a JSON log line. Statements are
+# reduced to a shape (literals and bound parameters masked), and a shape
+# that runs more than SQL_REPEAT_THRESHOLD times in one request is logged as
+# a probable N+1. Totals per endpoint are kept in memory, per process, and
+# served as JSON at SQL_STATS_URL, next to the pool metrics at
+# POOL_STATS_URL.
+#----------------------------------------------------------------------------#
+
+PARAMETERS = re.compile(r"%\(\w+\)s|%s|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+REPEATED_PLACEHOLDERS = re.compile(r'\?(?:\s*,\s*\?)+')
+WHITESPACE = re.compile(r'\s+')
+
+
+def local_only():
+    # the app has no admin authentication: answer local requests only
+    if request.remote_addr not in current_app.config.get(
+            'SQL_STATS_ALLOWED_HOSTS', ('127.0.0.1', '::1')):
+        abort(404)
+
+
+def statement_shape(statement):
+    # the statement with every literal / parameter as '?', so the same query
+    # with different values (or IN lists of any length) has one shape
+    shape = PARAMETERS.sub('?', statement)
+    shape = REPEATED_PLACEHOLDERS.sub('?', shape)
+    return WHITESPACE.sub(' ', shape).strip()
+
+
+class EndpointStats:
+    # running totals for one endpoint
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.db_ms = 0.0
+        self.max_queries = 0
+        self.repeat_warnings = 0
+
+    def add(self, queries, db_ms, repeated):
+        self.requests += 1
+        self.queries += queries
+        self.db_ms += db_ms
+        self.max_queries = max(self.max_queries, queries)
+        self.repeat_warnings += bool(repeated)
+
+    def as_dict(self):
+        return {
+            "requests": self.requests,
+            "queries": self.queries,
+            "avg_queries": round(self.queries / self.requests, 2),
+            "max_queries": self.max_queries,
+            "db_ms": round(self.db_ms, 2),
+            "avg_db_ms": round(self.db_ms / self.requests, 2),
+            "repeat_warnings": self.repeat_warnings,
+        }
+
+
+class SQLInstrumentation:
+    def __init__(self):
+        self.app = None
+        self.engine = None
+        self.replicas = []
+        self.repeat_threshold = 5
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app, engine, *replicas):
+        self.app = app
+        self.engine = engine
+        self.replicas = replicas
+        self.repeat_threshold = app.config.get('SQL_REPEAT_THRESHOLD', 5)
+        for each in (engine,) + replicas:
+            event.listen(each, 'before_cursor_execute', self._before_execute)
+            event.listen(each, 'after_cursor_execute', self._after_execute)
+        request_started.connect(self._request_started, app)
+        request_finished.connect(self._request_finished, app)
+        url = app.config.get('SQL_STATS_URL')
+        if url:
+            app.add_url_rule(url, 'sql_stats', self._stats_view)
+        url = app.config.get('POOL_STATS_URL')
+        if url:
+            app.add_url_rule(url, 'pool_stats', self._pool_view)
+        app.extensions['sql_instrumentation'] = self
+
+    # statements
+
+    def _before_execute(self, conn, cursor, statement, parameters, context,
+                        executemany):
+        # kept on the statement's execution context, so a statement that
+        # raises (no after_cursor_execute) leaves nothing on the connection;
+        # the few executions without a context (column defaults) overwrite
+        # a single slot instead
+        if context is not None:
+            context._query_started = time.perf_counter()
+        else:
+            conn.info['query_started'] = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context,
+                       executemany):
+        started = context._query_started if context is not None else \
+            conn.info.pop('query_started')
+        elapsed = time.perf_counter() - started
+        # statements outside a request (CLI commands, startup) aren't tallied
+        if not has_request_context() or 'sql_shapes' not in g:
+            return
+        g.sql_count += 1
+        g.sql_seconds += elapsed
+        g.sql_shapes[statement_shape(statement)] += 1
+
+    # requests
+
+    def _request_started(self, sender, **extra):
+        g.sql_count = 0
+        g.sql_seconds = 0.0
+        g.sql_shapes = Counter()
+
+    def _request_finished(self, sender, response, **extra):
+        if 'sql_shapes' not in g:
+            return
+        db_ms = g.sql_seconds * 1000
+        endpoint = request.endpoint or 'unmatched'
+        response.headers['X-Query-Count'] = str(g.sql_count)
+        response.headers['X-DB-Time-Ms'] = f'{db_ms:.2f}'
+
+        repeated = {shape: count for shape, count in g.sql_shapes.items()
+                    if count > self.repeat_threshold}
+        for shape, count in repeated.items():
+            self.app.logger.warning(json.dumps({
+                "event": "sql_repeated_statement",
+                "endpoint": endpoint,
+                "path": request.path,
+                "count": count,
+                "statement": shape,
+            }))
+        self.app.logger.info(json.dumps({
+            "event": "sql_request",
+            "method": request.method,
+            "path": request.path,
+            "endpoint": endpoint,
+            "status": response.status_code,
+            "queries": g.sql_count,
+            "db_ms": round(db_ms, 2),
+        }))
+        with self._lock:
+            self._stats.setdefault(endpoint, EndpointStats()).add(
+                g.sql_count, db_ms, repeated)
+
+    # stats
+
+    def stats(self):
+        with self._lock:
+            return {endpoint: stats.as_dict()
+                    for endpoint, stats in sorted(self._stats.items())}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def _stats_view(self):
+        local_only()
+        if request.args.get('reset'):
+            self.reset()
+        return jsonify(self.stats())
+
+    def _pool_view(self):
+        local_only()
+        stats = pool_stats(self.engine)
+        if self.replicas:
+            stats['replicas'] = [pool_stats(replica)
+                                 for replica in self.replicas]
+        return jsonify(stats)
+
+
+sql_instrumentation = SQLInstrumentation()
@@ -0,0 +1,37 @@
+"""trigram search indexes on venues and artists
+
+Revision ID: 5f0c2b9a7d41
+Revises: bc87d18d39c1
+Create Date: 2026-10-18 10:12:31.402215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f0c2b9a7d41'
+down_revision = 'bc87d18d39c1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('venues', 'artists'):
+        # GIN trigram indexes answer ILIKE '%term%' and similarity()
+        for column in ('name', 'city', 'state'):
+            op.create_index('ix_{}_{}_trgm'.format(table, column), table,
+                            [column], unique=False, postgresql_using='gin',
+                            postgresql_ops={column: 'gin_trgm_ops'})
+        # GIN index on the genres array answers @> and &&
+        op.create_index('ix_{}_genres'.format(table), table, ['genres'],
+                        unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    for table in ('artists', 'venues'):
+        op.drop_index('ix_{}_genres'.format(table), table_name=table)
+        for column in ('state', 'city', 'name'):
+            op.drop_index('ix_{}_{}_trgm'.format(table, column),
+                          table_name=table)
@@ -0,0 +1,33 @@
+"""foreign key and time indexes on show
+
+Revision ID: a3e91c7f5b20
+Revises: 5f0c2b9a7d41
+Create Date: 2026-10-18 11:02:47.118530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3e91c7f5b20'
+down_revision = '5f0c2b9a7d41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # per-venue / per-artist show lookups, ordered or bounded by time
+    op.create_index('ix_show_venue_id_start_time', 'show',
+                    ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_show_artist_id_start_time', 'show',
+                    ['artist_id', 'start_time'], unique=False)
+    # compact index for time-range scans across all shows
+    op.create_index('ix_show_start_time_brin', 'show', ['start_time'],
+                    unique=False, postgresql_using='brin')
+
+
+def downgrade():
+    op.drop_index('ix_show_start_time_brin', table_name='show')
+    op.drop_index('ix_show_artist_id_start_time', table_name='show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='show')
@@ -0,0 +1,37 @@
+"""repair genres stored one letter per element, area indexes for browsing
+
+Revision ID: b7d2e4f6a8c3
+Revises: f3a9c1e5d7b2
+Create Date: 2026-10-18 21:14:05.530172
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d2e4f6a8c3'
+down_revision = 'f3a9c1e5d7b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venues', 'artists'):
+        # The create / edit forms used to store request.form['genres'], one
+        # string, which the ARRAY type split into letters ('Jazz' became
+        # {J,a,z,z}). No genre is one letter long: join such arrays back
+        # into the genre that was picked.
+        op.execute(f'''
+            UPDATE {table} SET genres = ARRAY[array_to_string(genres, '')]
+            WHERE cardinality(genres) > 1 AND NOT EXISTS (
+                SELECT 1 FROM unnest(genres) AS g WHERE length(g) <> 1)''')
+        # exact city / state filters of the browse pages (browse.py); the
+        # genres GIN index is 5f0c2b9a7d41's
+        op.create_index(f'ix_{table}_state_city', table, ['state', 'city'],
+                        unique=False)
+
+
+def downgrade():
+    for table in ('artists', 'venues'):
+        op.drop_index(f'ix_{table}_state_city', table_name=table)
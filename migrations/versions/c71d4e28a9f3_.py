@@ -0,0 +1,29 @@
+"""keyset pagination indexes for shows and artists
+
+Revision ID: c71d4e28a9f3
+Revises: a3e91c7f5b20
+Create Date: 2026-10-18 11:48:05.630914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c71d4e28a9f3'
+down_revision = 'a3e91c7f5b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # /shows pages on (start_time, id), /artists pages on (name, id)
+    op.create_index('ix_show_start_time_id', 'show', ['start_time', 'id'],
+                    unique=False)
+    op.create_index('ix_artists_name_id', 'artists', ['name', 'id'],
+                    unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_artists_name_id', table_name='artists')
+    op.drop_index('ix_show_start_time_id', table_name='show')
@@ -0,0 +1,59 @@
+"""precomputed artist / venue recommendations
+
+Revision ID: c9e1f3a5b7d4
+Revises: b7d2e4f6a8c3
+Create Date: 2026-10-18 21:52:40.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9e1f3a5b7d4'
+down_revision = 'b7d2e4f6a8c3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # filled by `flask compute-recommendations` (recommend.py)
+    op.create_table(
+        'recommendation',
+        sa.Column('venue_id', sa.Integer(), nullable=False),
+        sa.Column('artist_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.Column('genre_score', sa.Float(), nullable=False),
+        sa.Column('area_score', sa.Float(), nullable=False),
+        sa.Column('past_shows', sa.Integer(), nullable=False),
+        sa.Column('venue_rank', sa.Integer(), nullable=True),
+        sa.Column('artist_rank', sa.Integer(), nullable=True),
+        sa.Column('computed_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['venue_id'], ['venues.id'],
+                                ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['artist_id'], ['artists.id'],
+                                ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('venue_id', 'artist_id'))
+    # a venue's artists / an artist's venues, best first
+    op.create_index('ix_recommendation_venue_id_venue_rank', 'recommendation',
+                    ['venue_id', 'venue_rank'], unique=False)
+    op.create_index('ix_recommendation_artist_id_artist_rank',
+                    'recommendation', ['artist_id', 'artist_rank'],
+                    unique=False)
+    # API ETags (migration e8b3c5d7a9f1)
+    op.execute("INSERT INTO table_version (table_name) "
+               "VALUES ('recommendation')")
+    op.execute('CREATE TRIGGER recommendation_version '
+               'AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON recommendation '
+               'FOR EACH STATEMENT EXECUTE PROCEDURE bump_table_version()')
+
+
+def downgrade():
+    op.execute('DROP TRIGGER recommendation_version ON recommendation')
+    op.execute("DELETE FROM table_version "
+               "WHERE table_name = 'recommendation'")
+    op.drop_index('ix_recommendation_artist_id_artist_rank',
+                  table_name='recommendation')
+    op.drop_index('ix_recommendation_venue_id_venue_rank',
+                  table_name='recommendation')
+    op.drop_table('recommendation')
@@ -0,0 +1,53 @@
+"""materialized upcoming / past show counters on venues and artists
+
+Revision ID: d4f1a8b6c2e7
+Revises: c71d4e28a9f3
+Create Date: 2026-10-18 19:20:41.208364
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f1a8b6c2e7'
+down_revision = 'c71d4e28a9f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venues', 'artists'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(),
+                                       server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(),
+                                       server_default='0', nullable=False))
+    op.create_table(
+        'show_counter_state',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('rolled_until', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'))
+    op.execute('INSERT INTO show_counter_state (id, rolled_until) '
+               'VALUES (1, LOCALTIMESTAMP)')
+    # backfill the counters as of that watermark
+    for table, column in (('venues', 'venue_id'), ('artists', 'artist_id')):
+        op.execute(f'''
+            UPDATE {table} AS t
+            SET upcoming_shows_count = c.upcoming, past_shows_count = c.past
+            FROM (
+                SELECT {column} AS id,
+                       count(*) FILTER (WHERE start_time > s.rolled_until)
+                           AS upcoming,
+                       count(*) FILTER (WHERE start_time <= s.rolled_until)
+                           AS past
+                FROM show, show_counter_state AS s
+                GROUP BY {column}
+            ) AS c
+            WHERE t.id = c.id''')
+
+
+def downgrade():
+    op.drop_table('show_counter_state')
+    for table in ('artists', 'venues'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
@@ -0,0 +1,50 @@
+"""table versions for API ETags
+
+Revision ID: e8b3c5d7a9f1
+Revises: d4f1a8b6c2e7
+Create Date: 2026-10-18 19:41:12.517093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b3c5d7a9f1'
+down_revision = 'd4f1a8b6c2e7'
+branch_labels = None
+depends_on = None
+
+TABLES = ('venues', 'artists', 'show')
+
+
+def upgrade():
+    op.create_table(
+        'table_version',
+        sa.Column('table_name', sa.String(), nullable=False),
+        sa.Column('version', sa.BigInteger(), server_default='0',
+                  nullable=False),
+        sa.PrimaryKeyConstraint('table_name'))
+    op.execute("INSERT INTO table_version (table_name) VALUES "
+               + ', '.join(f"('{table}')" for table in TABLES))
+    # every statement that changes a table bumps its version, whoever
+    # runs it (views, the importer's COPY, the counter jobs, psql)
+    op.execute('''
+        CREATE FUNCTION bump_table_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE table_version SET version = version + 1
+            WHERE table_name = TG_TABLE_NAME;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql''')
+    for table in TABLES:
+        op.execute(f'CREATE TRIGGER {table}_version '
+                   f'AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} '
+                   f'FOR EACH STATEMENT EXECUTE PROCEDURE bump_table_version()')
+
+
+def downgrade():
+    for table in TABLES:
+        op.execute(f'DROP TRIGGER {table}_version ON {table}')
+    op.execute('DROP FUNCTION bump_table_version()')
+    op.drop_table('table_version')
@@ -0,0 +1,58 @@
+"""show durations, no overlapping shows per venue or artist
+
+Revision ID: f3a9c1e5d7b2
+Revises: e8b3c5d7a9f1
+Create Date: 2026-10-18 20:02:37.118420
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a9c1e5d7b2'
+down_revision = 'e8b3c5d7a9f1'
+branch_labels = None
+depends_on = None
+
+# constraint -> key column (bookings.py maps violations to messages)
+CONSTRAINTS = (('show_venue_no_overlap', 'venue_id'),
+               ('show_artist_no_overlap', 'artist_id'))
+
+
+def upgrade():
+    op.add_column('show', sa.Column(
+        'duration', sa.Interval(), server_default=sa.text("interval '2 hours'"),
+        nullable=False))
+    op.create_check_constraint('ck_show_duration', 'show',
+                               "duration >= interval '0'")
+    # Shows listed before this revision may overlap. Keep the first listed
+    # of each overlap as it is and give the later ones an empty span (zero
+    # duration): they stay on the pages but book nothing, and can be found
+    # with duration = '0'.
+    for _, column in CONSTRAINTS:
+        op.execute(f'''
+            UPDATE show AS s SET duration = interval '0'
+            WHERE s.duration > interval '0' AND EXISTS (
+                SELECT 1 FROM show AS e
+                WHERE e.{column} = s.{column} AND e.id < s.id
+                  AND e.duration > interval '0'
+                  AND e.start_time > s.start_time - interval '2 hours'
+                  AND e.start_time < s.start_time + s.duration)''')
+    # Exclusion constraints: no two shows of a venue (of an artist) with
+    # overlapping [start_time, start_time + duration). The id is compared
+    # as a one-element int4range, so GiST's built-in range operator class
+    # covers both columns and btree_gist is not needed. Their indexes also
+    # answer availability lookups (bookings.py).
+    for name, column in CONSTRAINTS:
+        op.execute(f'''
+            ALTER TABLE show ADD CONSTRAINT {name} EXCLUDE USING gist (
+                int4range({column}, {column}, '[]') WITH =,
+                tsrange(start_time, start_time + duration) WITH &&)''')
+
+
+def downgrade():
+    for name, _ in CONSTRAINTS:
+        op.drop_constraint(name, 'show')
+    op.drop_constraint('ck_show_duration', 'show')
+    op.drop_column('show', 'duration')
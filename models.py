@@ -2,29 +2,36 @@
 # Imports
 #----------------------------------------------------------------------------#
 
-from flask import Flask
-from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from config import *
+from replicas import RoutingSQLAlchemy
 #----------------------------------------------------------------------------#
-# App Config.
+# Database.
+#
+# Unbound: importing the models builds no app. create_app() in app.py binds
+# `db` to an app (db.init_app) with the engine options from config.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-app.config['SQLALCHEMY_DATABASE_URI'] = DatabaseURI.SQLALCHEMY_DATABASE_URI
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = SQLALCHEMY_TRACK_MODIFICATIONS
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+# sessions that can route reads to a replica (replicas.py)
+db = RoutingSQLAlchemy()
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 
 
+def search_indexes(table):
+    # trigram indexes behind ILIKE search, plus the genres array index
+    # (migration 5f0c2b9a7d41) and the area index of browse.py
+    return tuple(
+        db.Index(f'ix_{table}_{column}_trgm', column, postgresql_using='gin',
+                 postgresql_ops={column: 'gin_trgm_ops'})
+        for column in ('name', 'city', 'state')) + (
+        db.Index(f'ix_{table}_genres', 'genres', postgresql_using='gin'),
+        # browse filters (migration b7d2e4f6a8c3)
+        db.Index(f'ix_{table}_state_city', 'state', 'city'),)
+
+
 class Venue(db.Model):
     __tablename__ = 'venues'
+    __table_args__ = search_indexes('venues')
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
@@ -39,6 +46,11 @@ class Venue(db.Model):
     website = db.Column(db.String(500))
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
+    # show counters as of show_counter_state.rolled_until (counters.py)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False,
+                                     default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False,
+                                 default=0, server_default='0')
     shows = db.relationship('Show', backref='venue')
 
     def __repr__(self):
@@ -47,6 +59,10 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = 'artists'
+    __table_args__ = search_indexes('artists') + (
+        # keyset pagination of /artists (migration c71d4e28a9f3)
+        db.Index('ix_artists_name_id', 'name', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
@@ -60,6 +76,11 @@ class Artist(db.Model):
     website = db.Column(db.String(500))
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(300))
+    # show counters as of show_counter_state.rolled_until (counters.py)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False,
+                                     default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False,
+                                 default=0, server_default='0')
     shows = db.relationship('Show', backref='artist')
 
     def __repr__(self):
@@ -69,13 +90,84 @@ class Artist(db.Model):
 # TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
 class Show(db.Model):
     __tablename__ = 'show'
+    # migration a3e91c7f5b20
+    __table_args__ = (
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_show_start_time_brin', 'start_time',
+                 postgresql_using='brin'),
+        # keyset pagination of /shows (migration c71d4e28a9f3)
+        db.Index('ix_show_start_time_id', 'start_time', 'id'),
+        # plus the exclusion constraints show_venue_no_overlap and
+        # show_artist_no_overlap on the span (migration f3a9c1e5d7b2,
+        # bookings.py)
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     start_time = db.Column(db.DateTime, nullable=False)
+    # the show occupies [start_time, start_time + duration); zero for shows
+    # that overlapped others when durations were introduced
+    duration = db.Column(db.Interval, nullable=False,
+                         server_default=db.text("interval '2 hours'"))
     venue_id = db.Column(db.Integer, db.ForeignKey(
         'venues.id'), nullable=False)
     artist_id = db.Column(db.Integer, db.ForeignKey(
         'artists.id'), nullable=False)
 
+    @property
+    def end_time(self):
+        return self.start_time + self.duration
+
     def __repr__(self):
-        return f'<Show {self.id} {self.start_time}>'
\ No newline at end of file
+        return f'<Show {self.id} {self.start_time}>'
+
+
+class Recommendation(db.Model):
+    # Artists for a venue and venues for an artist, scored and ranked by
+    # `flask compute-recommendations` (recommend.py, migration c9e1f3a5b7d4).
+    # venue_rank ranks the artist among the venue's picks (artists seeking
+    # a venue), artist_rank the venue among the artist's (venues seeking
+    # talent); None where the pair is not among them.
+    __tablename__ = 'recommendation'
+    __table_args__ = (
+        db.Index('ix_recommendation_venue_id_venue_rank',
+                 'venue_id', 'venue_rank'),
+        db.Index('ix_recommendation_artist_id_artist_rank',
+                 'artist_id', 'artist_rank'),
+    )
+
+    venue_id = db.Column(db.Integer, db.ForeignKey(
+        'venues.id', ondelete='CASCADE'), primary_key=True)
+    artist_id = db.Column(db.Integer, db.ForeignKey(
+        'artists.id', ondelete='CASCADE'), primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+    # the parts of the score: genre overlap (Jaccard), same city / state,
+    # and the shows the pair already played together
+    genre_score = db.Column(db.Float, nullable=False)
+    area_score = db.Column(db.Float, nullable=False)
+    past_shows = db.Column(db.Integer, nullable=False)
+    venue_rank = db.Column(db.Integer)
+    artist_rank = db.Column(db.Integer)
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+
+class ShowCounterState(db.Model):
+    # single row: the watermark of the show counters (migration d4f1a8b6c2e7)
+    __tablename__ = 'show_counter_state'
+
+    id = db.Column(db.Integer, primary_key=True)
+    rolled_until = db.Column(db.DateTime, nullable=False)
+
+
+class TableVersion(db.Model):
+    # Bumped by a statement trigger on every change to a table (migration
+    # e8b3c5d7a9f1), in the slot of the writer's backend (a1c4e7b9d2f6), so
+    # writers do not queue on one row; a table's version is the sum over its
+    # slots. The API's ETags are built from these.
+    __tablename__ = 'table_version'
+
+    table_name = db.Column(db.String, primary_key=True)
+    slot = db.Column(db.Integer, primary_key=True, default=0,
+                     server_default='0')
+    version = db.Column(db.BigInteger, nullable=False, default=0,
+                        server_default='0')
@@ -0,0 +1,146 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from flask import (Blueprint, render_template, request, current_app, abort,
+                   url_for)
+from queries import (decode_cursor, page_size, keyset_page,
+                     artists_playing_at, venues_played_by)
+from sqlalchemy.orm.exc import NoResultFound
+from models import db
+from browse import GENRES, browse_filters, browse_query, facets
+from cache import cache
+from replicas import replica_cache_ttl
+#----------------------------------------------------------------------------#
+# Pages shared by the venues, artists and shows blueprints: the home page,
+# the error pages, the genre browse and recommendation pages, and the
+# pagination and cache invalidation their views use.
+#----------------------------------------------------------------------------#
+
+bp = Blueprint('pages', __name__)
+
+
+@bp.route('/')
+def index():
+    return render_template('pages/home.html')
+
+
+@bp.app_errorhandler(405)
+def method_not_allowed(error):
+    return render_template('errors/405.html'), 405
+
+
+@bp.app_errorhandler(404)
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+
+@bp.app_errorhandler(400)
+def handle_bad_request(error):
+    return render_template('errors/400.html'), 400
+
+
+@bp.app_errorhandler(500)
+def server_error(error):
+    return render_template('errors/500.html'), 500
+
+#----------------------------------------------------------------------------#
+# Pagination
+#----------------------------------------------------------------------------#
+
+
+def paginate(query, keys, *types):
+    # one keyset page of `query` from the limit / after / before query
+    # arguments; `types` decode the cursor values of `keys`
+    return keyset_page(
+        query, keys,
+        page_size(request.args.get('limit'),
+                  current_app.config['LISTING_PAGE_SIZE']),
+        after=decode_cursor(request.args.get('after'), *types),
+        before=decode_cursor(request.args.get('before'), *types))
+
+#----------------------------------------------------------------------------#
+# Browsing by genre and area (browse.py).
+#----------------------------------------------------------------------------#
+
+
+def browse_arguments(filters, **changes):
+    # the query arguments of `filters` with `changes`, defaults left out
+    arguments = {"genre": filters['genres'], "match": filters['match'],
+                 "city": filters['city'], "state": filters['state'],
+                 "upcoming": 1 if filters['upcoming'] else None}
+    arguments.update(changes)
+    if arguments['match'] == 'all':
+        del arguments['match']
+    return {name: value for name, value in arguments.items() if value}
+
+
+def browse(model, namespace):
+    # the /venues/browse or /artists/browse page: a page of the matches by
+    # name, and the genre facets of all of them
+    try:
+        filters = browse_filters(request.args)
+    except ValueError:
+        abort(400)
+
+    def browse_page():
+        rows, pager = paginate(browse_query(model, filters),
+                               [model.name, model.id], str, int)
+        return ([row._asdict() for row in rows], pager,
+                [tuple(row) for row in facets(model, filters)])
+    # new shows change the upcoming filter and invalidate 'shows'
+    results, pager, counts = cache.get_or_set(
+        [namespace, 'shows'], 'browse:' + request.query_string.decode(),
+        browse_page, ttl=replica_cache_ttl())
+    links = [
+        {"genre": genre, "count": count,
+         "selected": genre in filters['genres'],
+         # the page with the genre toggled
+         "url": url_for(request.endpoint, **browse_arguments(
+             filters, genre=[g for g in GENRES if (g == genre) != (
+                 g in filters['genres'])]))}
+        for genre, count in counts]
+    return render_template('pages/browse.html', kind=namespace,
+                           results=results, pager=pager, facets=links,
+                           filters=filters, genres=GENRES,
+                           arguments=browse_arguments(filters))
+
+#----------------------------------------------------------------------------#
+# Recommendations (recommend.py).
+#----------------------------------------------------------------------------#
+
+
+def recommendations(model, entity_id, kind, recommended):
+    # the recommendations page of venue / artist `entity_id`: the rows
+    # `recommended` reads from the recommendation table, nothing scored
+    def recommendation_page():
+        entity = db.session.query(model.id, model.name).filter(
+            model.id == entity_id).one()
+        return entity._asdict(), [
+            row._asdict() for row in recommended(entity_id)]
+    try:
+        entity, picks = cache.get_or_set(
+            [f'{kind}:{entity_id}', 'recommendations'], 'recommendations',
+            recommendation_page, ttl=replica_cache_ttl())
+    except NoResultFound:
+        abort(404)
+    return render_template('pages/recommendations.html', kind=kind,
+                           entity=entity, picks=picks)
+
+#----------------------------------------------------------------------------#
+# Cache invalidation.
+#----------------------------------------------------------------------------#
+
+
+def invalidate_venue(venue_id):
+    # a venue changed: its page, the listings, and the pages of the
+    # artists that play there (they show its name and image)
+    cache.invalidate(f'venue:{venue_id}', 'venues', 'shows', *[
+        f'artist:{artist_id}' for artist_id in artists_playing_at(venue_id)])
+
+
+def invalidate_artist(artist_id):
+    # an artist changed: its page, the listings, and the pages of the
+    # venues it plays at
+    cache.invalidate(f'artist:{artist_id}', 'artists', 'shows', *[
+        f'venue:{venue_id}' for venue_id in venues_played_by(artist_id)])
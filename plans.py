@@ -0,0 +1,148 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import re
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import event, func
+from models import db, Show
+from cache import cache, NullCache
+from replicas import replicas
+#----------------------------------------------------------------------------#
+# Query plan regression check.
+#
+# Drives the read routes through the test client, with the view cache off
+# (a cached page sends no SQL to check), captures every SELECT touching the
+# show table that they send to the primary or to a replica, and EXPLAINs
+# each on the database that ran it. Any plan with a sequential scan on show
+# fails the check. When the local show table is smaller than --min-rows the
+# planner would rightly prefer a seq scan, so plans are taken with
+# enable_seqscan off: a seq scan that survives that has no index to use.
+#----------------------------------------------------------------------------#
+
+SHOW_TABLE = re.compile(r'\bshow\b')
+
+
+def seq_scans(plan, relation):
+    # every Seq Scan node on `relation` in an EXPLAIN (FORMAT JSON) tree
+    found = []
+    if plan.get('Node Type') == 'Seq Scan' and \
+            plan.get('Relation Name') == relation:
+        found.append(plan)
+    for child in plan.get('Plans', []):
+        found.extend(seq_scans(child, relation))
+    return found
+
+
+def capture_statements(client, method, url, data=None):
+    # (engine, statement, parameters) of the SELECTs touching show that one
+    # request sends
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and \
+                SHOW_TABLE.search(statement):
+            statements.append((conn.engine, statement, parameters))
+
+    # the @read_replica views query a replica when one is configured
+    engines = [db.engine, *replicas.engines]
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        client.open(url, method=method, data=data)
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', capture)
+    return statements
+
+
+def explain(engine, statement, parameters, force_index):
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        if force_index:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + statement, parameters)
+        return cursor.fetchone()[0][0]['Plan']
+    finally:
+        connection.rollback()
+        connection.close()
+
+
+def busiest(column):
+    # the venue / artist with the most shows, to exercise the detail pages
+    return db.session.query(column).group_by(column).order_by(
+        func.count(Show.id).desc()).limit(1).scalar() or 1
+
+
+def read_routes(venue_id, artist_id, term):
+    # (method, url, form data) of every route checked
+    return [
+        ('GET', '/venues', None),
+        ('GET', f'/venues/{venue_id}', None),
+        ('GET', f'/artists/{artist_id}', None),
+        ('GET', '/shows', None),
+        ('POST', '/venues/search', {'search_term': term}),
+        ('POST', '/artists/search', {'search_term': term}),
+        # probes of the double-booking constraints' indexes
+        ('GET', f'/api/v1/venues/{venue_id}/availability?'
+                'start=2030-01-04T18:00&end=2030-01-05T02:00', None),
+        ('GET', f'/api/v1/artists/{artist_id}/availability?'
+                'start=2030-01-04T18:00&end=2030-01-05T02:00', None),
+        # calendar windows: range scans of the (id, start_time) indexes
+        ('GET', f'/api/v1/venues/{venue_id}/calendar?month=2030-01', None),
+        ('GET', f'/api/v1/artists/{artist_id}/calendar.ics?month=2030-01',
+         None),
+    ]
+
+
+def route_plans(client, method, url, data, force_index):
+    # [(statement, seq scans on show)] for the SELECTs on show one request
+    # sends
+    return [
+        (statement, seq_scans(
+            explain(engine, statement, parameters, force_index),
+            Show.__tablename__))
+        for engine, statement, parameters in capture_statements(
+            client, method, url, data)]
+
+
+@click.command('check-plans')
+@click.option('--min-rows', default=10000, show_default=True,
+              help='Show table size from which real plans are checked.')
+@click.option('--venue-id', type=int, help='Venue for /venues/<id>.')
+@click.option('--artist-id', type=int, help='Artist for /artists/<id>.')
+@click.option('--term', default='a', show_default=True,
+              help='Search term for the search routes.')
+@with_appcontext
+def check_plans(min_rows, venue_id, artist_id, term):
+    """Fail if a read route plans a sequential scan on show."""
+    rows = db.session.execute(
+        "SELECT reltuples FROM pg_class WHERE relname = 'show'").scalar()
+    force_index = (rows or 0) < min_rows
+    if force_index:
+        click.echo(f'show has ~{int(rows or 0)} rows (< {min_rows}): '
+                   'planning with enable_seqscan off')
+    venue_id = venue_id or busiest(Show.venue_id)
+    artist_id = artist_id or busiest(Show.artist_id)
+    db.session.remove()
+
+    backend, cache.backend = cache.backend, NullCache()
+    client = current_app.test_client()
+    failures = 0
+    try:
+        for method, url, data in read_routes(venue_id, artist_id, term):
+            plans = route_plans(client, method, url, data, force_index)
+            for statement, scans in plans:
+                if scans:
+                    failures += 1
+                    click.echo(f'FAIL {method} {url}: seq scan on show in\n'
+                               f'{statement}\n', err=True)
+            click.echo(f'{method} {url}: {len(plans)} statement(s) on show')
+    finally:
+        cache.backend = backend
+    if failures:
+        raise SystemExit(1)
+    click.echo('OK: no sequential scans on show')
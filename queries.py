@@ -0,0 +1,272 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import json
+import binascii
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from itertools import groupby
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm.exc import NoResultFound
+from werkzeug.exceptions import BadRequest
+from models import db, Venue, Artist, Show
+#----------------------------------------------------------------------------#
+# Pagination.
+#----------------------------------------------------------------------------#
+
+
+def encode_cursor(*values):
+    # Opaque, url-safe token for a keyset position: the sort-key values of
+    # the last row on a page. Datetimes travel as ISO strings.
+    return urlsafe_b64encode(json.dumps(
+        values, default=lambda value: value.isoformat()).encode()).decode()
+
+
+def decode_cursor(token, *types):
+    # Inverse of encode_cursor(); `types` converts each value back (e.g.
+    # datetime.fromisoformat, int). No token means the first page.
+    if not token:
+        return None
+    try:
+        values = json.loads(urlsafe_b64decode(token.encode()))
+        if len(values) != len(types):
+            raise ValueError(token)
+        return tuple(convert(value) for convert, value in zip(types, values))
+    except (ValueError, TypeError, binascii.Error):
+        raise BadRequest(f'Invalid cursor {token!r}')
+
+
+def page_size(value, default, maximum=100):
+    # page size requested by the client, clamped to [1, maximum]
+    try:
+        return max(1, min(int(value), maximum))
+    except (TypeError, ValueError):
+        return default
+
+
+def keyset_query(query, keys, size, after=None, before=None):
+    # One page of `query` in ascending order of the `keys` columns, which
+    # must be selected by the query and end in a unique column. `after` /
+    # `before` are decoded cursors: the page starts right after, or ends
+    # right before, that position. The row comparison is answered by a
+    # B-tree index on the same columns, so every page costs the same.
+    if before is not None:
+        query = query.filter(tuple_(*keys) < tuple_(*before)).order_by(
+            *[key.desc() for key in keys])
+    else:
+        if after is not None:
+            query = query.filter(tuple_(*keys) > tuple_(*after))
+        query = query.order_by(*keys)
+    # fetch one extra row to learn whether the page is the last one
+    return query.limit(size + 1)
+
+
+def keyset_result(rows, keys, size, after=None, before=None):
+    # the rows of a keyset_query() page and {"next", "prev", "limit"} for
+    # the page links
+    more = len(rows) > size
+    rows = rows[:size]
+    if before is not None:
+        rows.reverse()
+    has_next = more if before is None else True
+    has_prev = more if before is not None else after is not None
+
+    def position(row):
+        return encode_cursor(*[getattr(row, key.key) for key in keys])
+    return rows, {
+        "next": position(rows[-1]) if rows and has_next else None,
+        "prev": position(rows[0]) if rows and has_prev else None,
+        "limit": size,
+    }
+
+
+def keyset_page(query, keys, size, after=None, before=None):
+    rows = keyset_query(query, keys, size, after, before).all()
+    return keyset_result(rows, keys, size, after, before)
+
+
+#----------------------------------------------------------------------------#
+# Venues.
+#----------------------------------------------------------------------------#
+
+
+def venue_areas_query():
+    # The whole /venues page from one read of venues, with no join to show:
+    # upcoming show counts are the materialized counters (counters.py). Rows
+    # are ordered so the venues of one (city, state) area are adjacent.
+    return db.session.query(
+        Venue.city, Venue.state, Venue.id, Venue.name,
+        Venue.upcoming_shows_count.label('num_upcoming_shows')).order_by(
+            Venue.city, Venue.state, Venue.id)
+
+
+def group_areas(rows):
+    # group the ordered rows into areas in a single pass
+    return [
+        {
+            "city": city,
+            "state": state,
+            "venues": [
+                {
+                    "id": row.id,
+                    "name": row.name,
+                    "num_upcoming_shows": row.num_upcoming_shows,
+                }
+                for row in area_rows
+            ]
+        }
+        for (city, state), area_rows in groupby(
+            rows, key=lambda row: (row.city, row.state))
+    ]
+
+
+def venue_areas():
+    return group_areas(venue_areas_query().all())
+
+
+#----------------------------------------------------------------------------#
+# Shows.
+#----------------------------------------------------------------------------#
+
+
+def show_listing():
+    # shows with their venue and artist names, for keyset pages on
+    # (start_time, id)
+    return db.session.query(
+        Show.id, Show.start_time,
+        Venue.id.label('venue_id'), Venue.name.label('venue_name'),
+        Artist.id.label('artist_id'),
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('image_link')).filter(
+            Show.venue_id == Venue.id, Show.artist_id == Artist.id)
+
+
+def show_tiles(rows):
+    # show_listing() rows as the /shows page lists them
+    return [
+        {
+            "show_id": row.id,
+            "venue_id": row.venue_id,
+            "venue_name": row.venue_name,
+            "artist_id": row.artist_id,
+            "artist_name": row.artist_name,
+            "artist_image_link": row.image_link,
+            "start_time": row.start_time
+        }
+        for row in rows
+    ]
+
+
+#----------------------------------------------------------------------------#
+# Venue / artist detail pages.
+#----------------------------------------------------------------------------#
+
+
+def row_dict(instance):
+    # column values of a model instance as a plain (picklable) dict
+    return {column.name: getattr(instance, column.name)
+            for column in instance.__table__.columns}
+
+
+def show_counts(column, entity_id, timenow):
+    # (upcoming, past) show counts of one venue or artist from a single
+    # aggregate over the (column, start_time) index
+    return db.session.query(
+        func.count(Show.id).filter(Show.start_time > timenow),
+        func.count(Show.id).filter(Show.start_time <= timenow)).filter(
+            column == entity_id)
+
+
+def upcoming_shows(query, timenow, limit):
+    # the next `limit` shows of `query` (already filtered to one venue or
+    # artist and selecting Show.id and Show.start_time), soonest first
+    return query.filter(Show.start_time > timenow).order_by(
+        Show.start_time, Show.id).limit(limit)
+
+
+def past_shows_page(query, timenow, size, before=None):
+    # One page of the past shows of `query`, most recent first. `before` is
+    # the decoded (start_time, id) of the last show already displayed.
+    query = query.filter(Show.start_time <= timenow)
+    if before is not None:
+        query = query.filter(
+            tuple_(Show.start_time, Show.id) < tuple_(*before))
+    return query.order_by(
+        Show.start_time.desc(), Show.id.desc()).limit(size + 1)
+
+
+def past_shows_result(rows, size):
+    # the rows of a past_shows_page() and the cursor of the next (older)
+    # page, or None
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    return rows, encode_cursor(rows[-1].start_time, rows[-1].id)
+
+
+def detail_queries(model, entity_id, timenow, limit, past_before=None):
+    # The queries of a venue or artist page, independent of each other:
+    # the venue / artist row, its show counts (one aggregate), its next
+    # `limit` shows and a page of its past shows. The show queries are
+    # bounded, so the page cost does not grow with the venue's history.
+    if model is Venue:
+        column, other, prefix = Show.venue_id, Artist, 'artist'
+    else:
+        column, other, prefix = Show.artist_id, Venue, 'venue'
+    shows = db.session.query(
+        Show.id, Show.start_time, other.id.label(f'{prefix}_id'),
+        other.name.label(f'{prefix}_name'),
+        other.image_link.label(f'{prefix}_image_link')).join(other).filter(
+            column == entity_id)
+    return (
+        db.session.query(*model.__table__.columns).filter(
+            model.id == entity_id),
+        show_counts(column, entity_id, timenow),
+        upcoming_shows(shows, timenow, limit),
+        past_shows_page(shows, timenow, limit, past_before))
+
+
+def detail_data(entity, counts, upcoming, past, limit):
+    # the page data from the results of detail_queries(): the entity row
+    # (None: raises NoResultFound), the counts row and the show rows
+    if entity is None:
+        raise NoResultFound()
+    data = entity._asdict()
+    data['upcoming_shows_count'], data['past_shows_count'] = counts
+    past, data['past_shows_next'] = past_shows_result(past, limit)
+    for key, rows in (('upcoming_shows', upcoming), ('past_shows', past)):
+        data[key] = []
+        for row in rows:
+            show = row._asdict()
+            show['show_id'] = show.pop('id')
+            data[key].append(show)
+    return data
+
+
+def entity_detail(model, entity_id, timenow, limit, past_before=None):
+    entity, counts, upcoming, past = detail_queries(
+        model, entity_id, timenow, limit, past_before)
+    return detail_data(entity.first(), counts.one(), upcoming.all(),
+                       past.all(), limit)
+
+
+def venue_detail(venue_id, timenow, limit, past_before=None):
+    # everything the venue page shows; raises NoResultFound
+    return entity_detail(Venue, venue_id, timenow, limit, past_before)
+
+
+def artist_detail(artist_id, timenow, limit, past_before=None):
+    # everything the artist page shows; raises NoResultFound
+    return entity_detail(Artist, artist_id, timenow, limit, past_before)
+
+
+def venues_played_by(artist_id):
+    # ids of the venues an artist has shows at
+    return [venue_id for venue_id, in db.session.query(
+        Show.venue_id).filter(Show.artist_id == artist_id).distinct()]
+
+
+def artists_playing_at(venue_id):
+    # ids of the artists with shows at a venue
+    return [artist_id for artist_id, in db.session.query(
+        Show.artist_id).filter(Show.venue_id == venue_id).distinct()]
@@ -0,0 +1,210 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from models import db, Venue, Artist, Recommendation
+from browse import GENRES
+from cache import cache
+#----------------------------------------------------------------------------#
+# Artist / venue recommendations.
+#
+# For a venue, the artists seeking a venue; for an artist, the venues
+# seeking talent; each ranked by
+#
+#   GENRE_WEIGHT    genre overlap, |a & b| / |a | b| of the genre bitsets
+#   AREA_WEIGHT     same city and state (1), same state only (0.5)
+#   HISTORY_WEIGHT  shows the pair already has together, full at
+#                   HISTORY_SHOWS
+#
+# `flask compute-recommendations` (from cron, nightly) scores the pairs in
+# one statement: each venue's and artist's genres become an integer bitset
+# over GENRES, so whether a pair shares a genre is one AND and the overlap
+# a popcount, done set-at-a-time by Postgres. Only pairs with some signal
+# are scored: a shared genre, the same state or a past show; the
+# co-bookings are one GROUP BY over show. The best
+# RECOMMENDATIONS_PER_ENTITY of each venue and of each artist replace the
+# recommendation table in one transaction. Needs PostgreSQL 12 (CTEs
+# marked MATERIALIZED); bit_count() is 14+, older servers get the same
+# popcount in integer arithmetic (popcount()).
+#
+# The pages and the API read a venue's (an artist's) ranked rows by the
+# (venue_id, venue_rank) / (artist_id, artist_rank) index; nothing is
+# scored at request time.
+#----------------------------------------------------------------------------#
+
+GENRE_WEIGHT = 0.5
+AREA_WEIGHT = 0.3
+HISTORY_WEIGHT = 0.2
+HISTORY_SHOWS = 5
+
+# server_version_num of the oldest PostgreSQL RECOMPUTE runs on
+MIN_SERVER_VERSION = 120000
+
+# server_version_num of the first PostgreSQL with bit_count()
+BIT_COUNT_VERSION = 140000
+
+
+def popcount(bitset, version):
+    # SQL for the number of 1 bits of the integer `bitset` (an expression):
+    # bit_count() where the server has it, else the same count with integer
+    # arithmetic (bit pairs, nibbles, then the bytes summed by one multiply)
+    if version >= BIT_COUNT_VERSION:
+        return f'bit_count(CAST({bitset} AS bit(32)))'
+    pairs = f'({bitset} - ({bitset} >> 1 & 1431655765))'
+    nibbles = f'({pairs} & 858993459) + ({pairs} >> 2 & 858993459)'
+    bytes_ = (f'CAST((({nibbles}) + (({nibbles}) >> 4)) & 252645135 '
+              'AS bigint)')
+    return f'CAST({bytes_} * 16843009 >> 24 & 255 AS integer)'
+
+
+RECOMPUTE = '''
+-- MATERIALIZED: each bitset computed once, not once per pair
+WITH genre AS (
+    SELECT name, CAST(1 AS integer) << CAST(position - 1 AS integer) AS bit
+    FROM unnest(CAST(:genres AS varchar[])) WITH ORDINALITY
+         AS g(name, position)
+), venue AS MATERIALIZED (
+    SELECT id, city, state, seeking, genres,
+           {genre_count} AS genre_count
+    FROM (
+        SELECT v.id, v.city, v.state,
+               COALESCE(v.seeking_talent, false) AS seeking,
+               (SELECT COALESCE(bit_or(genre.bit), 0) FROM genre
+                WHERE genre.name = ANY(v.genres)) AS genres
+        FROM venues AS v) AS v
+), artist AS MATERIALIZED (
+    SELECT id, city, state, seeking, genres,
+           {genre_count} AS genre_count
+    FROM (
+        SELECT a.id, a.city, a.state,
+               COALESCE(a.seeking_venue, false) AS seeking,
+               (SELECT COALESCE(bit_or(genre.bit), 0) FROM genre
+                WHERE genre.name = ANY(a.genres)) AS genres
+        FROM artists AS a) AS a
+), booked AS (
+    SELECT venue_id, artist_id, count(*) AS shows
+    FROM show
+    GROUP BY venue_id, artist_id
+), pair AS (
+    SELECT v.id AS venue_id, a.id AS artist_id,
+           v.seeking AS venue_seeking, a.seeking AS artist_seeking,
+           v.genre_count, a.genre_count AS artist_genre_count,
+           {shared} AS shared,
+           CASE WHEN v.state = a.state AND v.city = a.city THEN 1.0
+                WHEN v.state = a.state THEN 0.5
+                ELSE 0 END AS area_score,
+           COALESCE(b.shows, 0) AS past_shows
+    FROM venue AS v
+    JOIN artist AS a ON v.seeking OR a.seeking
+    LEFT JOIN booked AS b ON b.venue_id = v.id AND b.artist_id = a.id
+    -- candidates: some signal is non-zero
+    WHERE v.genres & a.genres <> 0 OR v.state = a.state
+          OR b.shows IS NOT NULL
+), scored AS (
+    SELECT *,
+           :genre_weight * genre_score + :area_weight * area_score
+           + :history_weight * LEAST(past_shows, :history_shows)
+             / CAST(:history_shows AS float) AS score
+    FROM (
+        -- |a & b| / |a | b|, with |a | b| = |a| + |b| - |a & b|
+        SELECT venue_id, artist_id, venue_seeking, artist_seeking,
+               area_score, past_shows,
+               CASE WHEN shared = 0 THEN 0
+                    ELSE CAST(shared AS float)
+                         / (genre_count + artist_genre_count - shared)
+               END AS genre_score
+        FROM pair) AS pair
+), ranked AS (
+    -- seeking candidates first, so row_number() ranks among them
+    SELECT *,
+           CASE WHEN artist_seeking THEN row_number() OVER (
+               PARTITION BY venue_id
+               ORDER BY artist_seeking DESC, score DESC, artist_id) END
+               AS venue_rank,
+           CASE WHEN venue_seeking THEN row_number() OVER (
+               PARTITION BY artist_id
+               ORDER BY venue_seeking DESC, score DESC, venue_id) END
+               AS artist_rank
+    FROM scored
+)
+INSERT INTO recommendation (venue_id, artist_id, score, genre_score,
+                            area_score, past_shows, venue_rank, artist_rank,
+                            computed_at)
+SELECT venue_id, artist_id, score, genre_score, area_score, past_shows,
+       CASE WHEN venue_rank <= :per_entity THEN venue_rank END,
+       CASE WHEN artist_rank <= :per_entity THEN artist_rank END,
+       :computed_at
+FROM ranked
+WHERE venue_rank <= :per_entity OR artist_rank <= :per_entity
+'''
+
+
+def compute_recommendations(per_entity, now=None):
+    # Rescore the venue / artist pairs sharing a genre and replace the
+    # table with the best `per_entity` of each; returns the number of rows
+    # stored. Readers see the previous scores until the commit.
+    version = int(db.session.execute('SHOW server_version_num').scalar())
+    if version < MIN_SERVER_VERSION:
+        raise click.ClickException(
+            'compute-recommendations needs PostgreSQL 12 or later '
+            f'(server_version_num {version})')
+    # a batch: past the web statement_timeout, window sorts in memory
+    db.session.execute('SET LOCAL statement_timeout = 0')
+    db.session.execute("SET LOCAL work_mem = '256MB'")
+    db.session.execute('DELETE FROM recommendation')
+    recompute = RECOMPUTE.format(
+        genre_count=popcount('genres', version),
+        shared=popcount('(v.genres & a.genres)', version))
+    stored = db.session.execute(recompute, {
+        'genres': GENRES, 'genre_weight': GENRE_WEIGHT,
+        'area_weight': AREA_WEIGHT, 'history_weight': HISTORY_WEIGHT,
+        'history_shows': HISTORY_SHOWS, 'per_entity': per_entity,
+        'computed_at': now or datetime.now()}).rowcount
+    db.session.commit()
+    return stored
+
+
+def recommended_artists(venue_id):
+    # the venue's ranked artists, best first
+    return db.session.query(
+        Artist.id, Artist.name, Artist.city, Artist.state, Artist.genres,
+        Artist.image_link, Recommendation.score, Recommendation.genre_score,
+        Recommendation.area_score, Recommendation.past_shows,
+        Recommendation.computed_at).join(
+            Artist, Artist.id == Recommendation.artist_id).filter(
+                Recommendation.venue_id == venue_id,
+                Recommendation.venue_rank.isnot(None)).order_by(
+                    Recommendation.venue_rank).all()
+
+
+def recommended_venues(artist_id):
+    # the artist's ranked venues, best first
+    return db.session.query(
+        Venue.id, Venue.name, Venue.city, Venue.state, Venue.genres,
+        Venue.image_link, Recommendation.score, Recommendation.genre_score,
+        Recommendation.area_score, Recommendation.past_shows,
+        Recommendation.computed_at).join(
+            Venue, Venue.id == Recommendation.venue_id).filter(
+                Recommendation.artist_id == artist_id,
+                Recommendation.artist_rank.isnot(None)).order_by(
+                    Recommendation.artist_rank).all()
+
+
+@click.command('compute-recommendations')
+@click.option('--per-entity', type=int, default=None,
+              help='Recommendations kept per venue and per artist '
+                   '(default: RECOMMENDATIONS_PER_ENTITY).')
+@with_appcontext
+def compute_recommendations_command(per_entity):
+    """Rescore artist / venue matches into the recommendation table."""
+    per_entity = per_entity or \
+        current_app.config['RECOMMENDATIONS_PER_ENTITY']
+    started = datetime.now()
+    stored = compute_recommendations(per_entity, started)
+    cache.invalidate('recommendations')
+    elapsed = (datetime.now() - started).total_seconds()
+    click.echo(f'Stored {stored} recommendation(s) in {elapsed:.1f}s')
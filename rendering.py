@@ -0,0 +1,184 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import os
+import json
+import time
+import threading
+from collections import defaultdict
+import click
+from flask import g, jsonify, has_request_context, request_finished
+from flask.cli import with_appcontext
+from jinja2 import FileSystemBytecodeCache, Template, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from instrumentation import local_only
+from replicas import replica_cache_ttl
+#----------------------------------------------------------------------------#
+# Template rendering.
+#
+# Three parts:
+#  - a bytecode cache on disk (TEMPLATE_BYTECODE_DIR), so a new worker loads
+#    compiled templates instead of parsing them; `flask compile-templates`
+#    fills it at deploy time.
+#  - {% cache namespaces, name[, ttl] %} ... {% endcache %}, caching the
+#    rendered fragment in the view cache under the given namespaces, e.g.
+#    [f'venue:{id}'], so the invalidations done on writes also drop the
+#    fragments built from the changed entity.
+#  - an opt-in render profiler (TEMPLATE_PROFILING): per request, the time
+#    spent in each template and block (inclusive of nested blocks) goes to
+#    a Server-Timing header and a JSON log line, and per-process totals are
+#    served at TEMPLATE_STATS_URL.
+#----------------------------------------------------------------------------#
+
+
+class FragmentCacheExtension(Extension):
+    # {% cache ['venue:' ~ venue.id], 'tile:' ~ venue.id, 300 %}...
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        parser.stream.expect('comma')
+        args.append(parser.parse_expression())
+        if parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_cached', args), [], [],
+                               body).set_lineno(lineno)
+
+    def _cached(self, namespaces, name, ttl, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        # stored as a plain string; it was escaped when first rendered.
+        # Fragments of replica data get the same short TTL as the data.
+        return Markup(cache.get_or_set(
+            list(namespaces), f'fragment:{name}', lambda: str(caller()),
+            ttl or replica_cache_ttl()))
+
+
+class ProfiledTemplate(Template):
+    # a Template whose root and block render functions report their time
+    @classmethod
+    def _from_namespace(cls, environment, namespace, globals):
+        template = super()._from_namespace(environment, namespace, globals)
+        template.root_render_func = timed(
+            template.name, template.root_render_func)
+        template.blocks = {
+            block: timed(f'{template.name}#{block}', render)
+            for block, render in template.blocks.items()}
+        return template
+
+
+def timed(label, render):
+    # Render functions are generators of output strings; time spent between
+    # the first and last one, consumer included (a ''.join), is charged to
+    # `label`.
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            yield from render(*args, **kwargs)
+        finally:
+            record(label, time.perf_counter() - started)
+    return wrapper
+
+
+def record(label, seconds):
+    if has_request_context():
+        timings = g.setdefault('template_timings', defaultdict(float))
+        timings[label] += seconds
+    profiler.add(label, seconds)
+
+
+class RenderProfiler:
+    def __init__(self):
+        self.app = None
+        self._totals = defaultdict(lambda: [0, 0.0])
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        request_finished.connect(self._request_finished, app)
+        url = app.config.get('TEMPLATE_STATS_URL')
+        if url:
+            app.add_url_rule(url, 'template_stats', self._stats_view)
+
+    def add(self, label, seconds):
+        with self._lock:
+            total = self._totals[label]
+            total[0] += 1
+            total[1] += seconds
+
+    def stats(self):
+        with self._lock:
+            return {
+                label: {"renders": count, "ms": round(seconds * 1000, 2),
+                        "avg_ms": round(seconds * 1000 / count, 3)}
+                for label, (count, seconds) in sorted(self._totals.items())}
+
+    def _request_finished(self, sender, response, **extra):
+        timings = g.pop('template_timings', None)
+        if not timings:
+            return
+        # Server-Timing shows up in the browser's network panel
+        response.headers['Server-Timing'] = ', '.join(
+            f'tpl{number};desc="{label}";dur={seconds * 1000:.2f}'
+            for number, (label, seconds) in enumerate(
+                sorted(timings.items(), key=lambda item: -item[1])))
+        self.app.logger.info(json.dumps({
+            "event": "template_render",
+            "timings_ms": {label: round(seconds * 1000, 2)
+                           for label, seconds in timings.items()},
+        }))
+
+    def _stats_view(self):
+        local_only()
+        return jsonify(self.stats())
+
+
+profiler = RenderProfiler()
+
+
+def init_templates(app, cache):
+    # bytecode cache, {% cache %} and (optionally) the profiler, before any
+    # template is loaded
+    env = app.jinja_env
+    directory = app.config.get('TEMPLATE_BYTECODE_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        env.bytecode_cache = FileSystemBytecodeCache(directory)
+    env.add_extension(FragmentCacheExtension)
+    env.fragment_cache = cache
+    if app.config.get('TEMPLATE_PROFILING'):
+        env.template_class = ProfiledTemplate
+        profiler.init_app(app)
+
+
+def load_templates(env):
+    # compile (or load from the bytecode cache) every page template;
+    # returns their names
+    names = env.list_templates(filter_func=lambda name: name.endswith('.html'))
+    for name in names:
+        env.get_template(name)
+    return names
+
+
+@click.command('compile-templates')
+@with_appcontext
+def compile_templates():
+    """Compile every template into the bytecode cache."""
+    from flask import current_app
+    env = current_app.jinja_env
+    if env.bytecode_cache is None:
+        raise click.UsageError('TEMPLATE_BYTECODE_DIR is not set')
+    names = load_templates(env)
+    click.echo(f'Compiled {len(names)} templates into '
+               f'{current_app.config["TEMPLATE_BYTECODE_DIR"]}')
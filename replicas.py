@@ -0,0 +1,222 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import time
+import threading
+from itertools import count
+from functools import wraps, partial
+from flask import g, request, has_request_context, has_app_context
+from flask import session as cookie_session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import create_engine, event, orm
+from sqlalchemy.exc import SQLAlchemyError
+from database import engine_options, init_engine
+#----------------------------------------------------------------------------#
+# Read replica routing.
+#
+# Views decorated with @read_replica send their queries to a streaming
+# replica from DATABASE_REPLICA_URLS; everything else, and every flush, goes
+# to the primary. Replicas are picked round robin among the healthy ones. A
+# replica is healthy when it answers and its replay lag is under
+# REPLICA_MAX_LAG_SECONDS; that is rechecked at most every
+# REPLICA_CHECK_INTERVAL seconds, and a replica whose connection fails is
+# taken out until the next check (the request that lost it runs again on
+# the primary). With no healthy replica reads fall back to the primary.
+#
+# Read-your-writes: a request that commits a write sets a cookie, and that
+# client's reads stay on the primary for REPLICA_STICKY_SECONDS, longer
+# than a healthy replica can lag. View cache keys name the source of the
+# data (read_source()), so those reads never get what a replica cached.
+#----------------------------------------------------------------------------#
+
+STICKY_COOKIE = 'read_primary_until'
+
+# replay lag in seconds; 0 when the replica has replayed all it received
+# (an idle primary has no new transactions to replay) and on a primary
+REPLICA_LAG = '''
+SELECT COALESCE(CASE
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+END, 0)
+'''
+
+
+class RoutingSession(SignallingSession):
+    # queries go to the replica in info['replica'] when a view set one;
+    # flushes always go to the primary
+    def get_bind(self, mapper=None, clause=None):
+        replica = self.info.get('replica')
+        if replica is not None and not self._flushing:
+            return replica
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def flushed(session, flush_context):
+    session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def committed(session):
+    if session.info.pop('wrote', False) and has_request_context():
+        g.db_wrote = True
+
+
+class ReplicaSet:
+    def __init__(self):
+        self.app = None
+        self.db = None
+        self.engines = []
+        # engine -> (healthy, monotonic time of the last check)
+        self._health = {}
+        self._turn = count()
+        self._lock = threading.Lock()
+
+    def init_app(self, app, db):
+        self.app = app
+        self.db = db
+        config = app.config
+        self.max_lag = config.get('REPLICA_MAX_LAG_SECONDS', 5)
+        self.check_interval = config.get('REPLICA_CHECK_INTERVAL', 10)
+        self.sticky_seconds = config.get('REPLICA_STICKY_SECONDS', 10)
+        self.cache_ttl = config.get('REPLICA_CACHE_TTL', 5)
+        # same pool settings as the primary, but give up quickly on a
+        # replica that doesn't answer
+        options = engine_options(config)
+        options['connect_args'] = dict(
+            options.get('connect_args', {}),
+            connect_timeout=config.get('REPLICA_CONNECT_TIMEOUT', 2))
+        self.engines = [init_engine(create_engine(url, **options), config)
+                        for url in config.get('DATABASE_REPLICA_URLS', [])]
+        for engine in self.engines:
+            event.listen(engine, 'handle_error', partial(self._failed, engine))
+        app.after_request(self._stick_to_primary)
+        app.extensions['replicas'] = self
+
+    # health
+
+    def _probe(self, engine):
+        try:
+            with engine.connect() as connection:
+                lag = connection.execute(REPLICA_LAG).scalar()
+        except SQLAlchemyError:
+            return False
+        if lag > self.max_lag:
+            self.app.logger.warning(
+                f'replica {engine.url.host or "local"} lags {lag:.1f}s')
+            return False
+        return True
+
+    def healthy(self, engine):
+        now = time.monotonic()
+        with self._lock:
+            healthy, checked = self._health.get(engine, (True, None))
+            if checked is not None and now - checked < self.check_interval:
+                return healthy
+            # claim the check so concurrent requests don't all probe
+            self._health[engine] = (healthy, now)
+        healthy = self._probe(engine)
+        with self._lock:
+            self._health[engine] = (healthy, now)
+        return healthy
+
+    def _failed(self, engine, context):
+        # a lost or refused connection takes the replica out until the next
+        # check, and has the request retried on the primary (read_replica)
+        if context.is_disconnect:
+            with self._lock:
+                self._health[engine] = (False, time.monotonic())
+            if has_request_context():
+                g.replica_lost = True
+
+    def choose(self):
+        # the next healthy replica, or None to read from the primary
+        if not self.engines:
+            return None
+        start = next(self._turn)
+        for offset in range(len(self.engines)):
+            engine = self.engines[(start + offset) % len(self.engines)]
+            if self.healthy(engine):
+                return engine
+        return None
+
+    # read-your-writes
+
+    def _stick_to_primary(self, response):
+        if g.get('db_wrote') and self.engines:
+            until = int(time.time() + self.sticky_seconds)
+            response.set_cookie(STICKY_COOKIE, str(until),
+                                max_age=self.sticky_seconds, httponly=True)
+        return response
+
+    def for_request(self):
+        # the replica to serve this request's reads, or None
+        try:
+            sticky = float(request.cookies.get(STICKY_COOKIE, 0))
+        except ValueError:
+            sticky = 0
+        if sticky > time.time():
+            return None
+        return self.choose()
+
+
+replicas = ReplicaSet()
+
+
+def read_replica(view):
+    # serve the view's queries from a replica when one is available; if the
+    # replica's connection drops meanwhile, run the view again on the primary
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        session = replicas.db.session
+        session.info['replica'] = replicas.for_request()
+        try:
+            if session.info['replica'] is None:
+                return view(*args, **kwargs)
+            g.pop('replica_lost', None)
+            flashes = list(cookie_session.get('_flashes', []))
+            try:
+                response = view(*args, **kwargs)
+            except Exception:
+                # the views catch errors broadly: a lost connection may come
+                # out as another exception, or as an error page
+                if not g.pop('replica_lost', False):
+                    raise
+            else:
+                if not g.pop('replica_lost', False):
+                    return response
+            session.rollback()
+            session.info['replica'] = None
+            # without the first attempt's error messages
+            if cookie_session.get('_flashes', []) != flashes:
+                cookie_session['_flashes'] = flashes
+            return view(*args, **kwargs)
+        finally:
+            session.info.pop('replica', None)
+    return wrapper
+
+
+def read_source():
+    # 'replica' while a view reads from a replica, else 'primary'. The view
+    # cache keeps the two apart (ViewCache.source): after a write invalidates
+    # an entry, a reader on a lagging replica stores the old data again, and
+    # a client reading the primary (its own write) must not be served that.
+    if replicas.db is not None and has_app_context() and \
+            replicas.db.session.info.get('replica') is not None:
+        return 'replica'
+    return 'primary'
+
+
+def replica_cache_ttl():
+    # Cache TTL for data read in this request. Data read from a replica may
+    # predate a write that already invalidated the cache, so it is kept only
+    # briefly; None keeps the default TTL.
+    if replicas.db.session.info.get('replica') is not None:
+        return replicas.cache_ttl
+    return None
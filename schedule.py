@@ -0,0 +1,183 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from datetime import timedelta
+from collections import namedtuple
+from dateutil.rrule import rrulestr
+from flask import current_app
+from sqlalchemy import exists
+from sqlalchemy.exc import IntegrityError
+from models import db, Venue, Artist
+from importer import timestamp, minutes
+from counters import count_new_shows
+from bookings import DEFAULT_DURATION, booking_conflict
+#----------------------------------------------------------------------------#
+# Recurring shows.
+#
+# A residency is booked as one schedule: a venue, an artist and a recurrence
+#
+#   weekly    start_time, then every `interval` weeks, `count` times or
+#             until `until`
+#   dates     an explicit list of start times
+#   rrule     an RFC 5545 RRULE (FREQ=WEEKLY;BYDAY=FR;COUNT=52...) from
+#             start_time
+#
+# expanded here to its start times (wall clock, in SHOW_TIMEZONE like every
+# start_time), at most SCHEDULE_MAX_SHOWS of them. The venue and artist are
+# checked once, all the shows are inserted by one INSERT ... SELECT over the
+# array of start times, and their counters bumped by count_new_shows(), in
+# the caller's transaction. Every show gets the same duration.
+#----------------------------------------------------------------------------#
+
+RECURRENCES = ('weekly', 'dates', 'rrule')
+
+# :duration NULL: the column default
+INSERT_SHOWS = '''
+INSERT INTO show (venue_id, artist_id, start_time, duration)
+SELECT :venue_id, :artist_id, s.start_time,
+       COALESCE(CAST(:duration AS interval), {default})
+FROM unnest(CAST(:starts AS timestamp[])) AS s(start_time)
+RETURNING id, venue_id, artist_id, start_time
+'''.format(default=DEFAULT_DURATION)
+
+# the start times among :starts that overlap a show of the venue or of the
+# artist (probes of the exclusion constraints' indexes)
+OVERLAPPING = '''
+SELECT s.start_time
+FROM unnest(CAST(:starts AS timestamp[])) AS s(start_time)
+WHERE EXISTS (
+    SELECT 1 FROM show
+    WHERE tsrange(start_time, start_time + duration) && tsrange(
+              s.start_time,
+              s.start_time + COALESCE(CAST(:duration AS interval), {default}))
+      AND (int4range(venue_id, venue_id, '[]')
+               = int4range(:venue_id, :venue_id, '[]')
+           OR int4range(artist_id, artist_id, '[]')
+               = int4range(:artist_id, :artist_id, '[]')))
+ORDER BY s.start_time
+'''.format(default=DEFAULT_DURATION)
+
+# what count_new_shows() needs of a show
+ScheduledShow = namedtuple('ScheduledShow',
+                           'id venue_id artist_id start_time')
+
+
+class InvalidSchedule(ValueError):
+    pass
+
+
+class ScheduleConflict(InvalidSchedule):
+    # a show of the schedule overlaps another of the venue or the artist
+    pass
+
+
+def limit():
+    return current_app.config['SCHEDULE_MAX_SHOWS']
+
+
+def weekly(start, count=None, until=None, interval=1):
+    if count is None and until is None:
+        raise InvalidSchedule('weekly needs a count or an until date')
+    if interval < 1:
+        raise InvalidSchedule('interval must be at least 1')
+    step = timedelta(weeks=interval)
+    starts = []
+    moment = start
+    while (count is None or len(starts) < count) and (
+            until is None or moment <= until):
+        if len(starts) == limit():
+            raise InvalidSchedule(f'more than {limit()} shows')
+        starts.append(moment)
+        moment += step
+    return starts
+
+
+def recurring(start, rule):
+    # dateutil finds some bad rules (INTERVAL=0) only while iterating
+    starts = []
+    try:
+        # an RRULE without COUNT or UNTIL never ends; stop one past the
+        # limit
+        for moment in rrulestr(rule, dtstart=start):
+            if len(starts) == limit():
+                raise InvalidSchedule(f'more than {limit()} shows')
+            starts.append(moment)
+    except InvalidSchedule:
+        raise
+    except (ValueError, TypeError) as error:
+        raise InvalidSchedule(f'rrule: {error}')
+    return starts
+
+
+def expand(recurrence, start_time=None, count=None, until=None, interval=1,
+           dates=None, rule=None):
+    # the sorted, distinct start times of a schedule; raises InvalidSchedule
+    if recurrence not in RECURRENCES:
+        raise InvalidSchedule(
+            f'recurrence must be one of {", ".join(RECURRENCES)}')
+    try:
+        start = timestamp(start_time) if start_time else None
+        until = timestamp(until) if until else None
+        count = int(count) if count not in (None, '') else None
+        interval = int(interval) if interval not in (None, '') else 1
+        dates = [timestamp(date) for date in dates or []]
+    except (TypeError, ValueError) as error:
+        raise InvalidSchedule(str(error))
+    if recurrence == 'dates':
+        starts = dates
+        if len(set(starts)) > limit():
+            raise InvalidSchedule(f'more than {limit()} shows')
+    elif start is None:
+        raise InvalidSchedule('start_time is required')
+    elif recurrence == 'weekly':
+        starts = weekly(start, count, until, interval)
+    elif not rule:
+        raise InvalidSchedule('rrule is required')
+    else:
+        starts = recurring(start, rule)
+    if not starts:
+        raise InvalidSchedule('the schedule has no shows')
+    return sorted(set(starts))
+
+
+def schedule_shows(venue_id, artist_id, starts, duration=None):
+    # Insert a show at each of `starts`, in one statement, and count them;
+    # returns the ScheduledShows. Commit is left to the caller. A double
+    # booking rejects the whole schedule, naming the start times at fault.
+    try:
+        venue_id, artist_id = int(venue_id), int(artist_id)
+    except (TypeError, ValueError):
+        raise InvalidSchedule('venue_id and artist_id must be ids')
+    try:
+        duration = minutes(duration) if duration not in (None, '') else None
+    except (TypeError, ValueError) as error:
+        raise InvalidSchedule(f'duration: {error}')
+    venue_exists, artist_exists = db.session.query(
+        exists().where(Venue.id == venue_id),
+        exists().where(Artist.id == artist_id)).one()
+    if not venue_exists:
+        raise InvalidSchedule(f'No venue {venue_id}')
+    if not artist_exists:
+        raise InvalidSchedule(f'No artist {artist_id}')
+    parameters = {'venue_id': venue_id, 'artist_id': artist_id,
+                  'starts': list(starts), 'duration': duration}
+    try:
+        with db.session.begin_nested():
+            rows = db.session.execute(INSERT_SHOWS, parameters).fetchall()
+    except IntegrityError as error:
+        conflict = booking_conflict(error)
+        if conflict is None:
+            raise
+        overlapping = [row.start_time for row in
+                       db.session.execute(OVERLAPPING, parameters)]
+        if not overlapping:
+            raise ScheduleConflict(
+                f'{conflict} (the shows overlap each other)')
+        listed = ', '.join(str(start) for start in overlapping[:5])
+        if len(overlapping) > 5:
+            listed += f' and {len(overlapping) - 5} more'
+        raise ScheduleConflict(f'{conflict}: {listed}')
+    shows = [ScheduledShow(*row) for row in rows]
+    count_new_shows(shows)
+    return shows
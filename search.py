@@ -0,0 +1,74 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from sqlalchemy import func, or_, and_, case, cast, literal
+from sqlalchemy.dialects.postgresql import ARRAY
+from forms import genre_choices
+from models import db
+from queries import encode_cursor, decode_cursor
+#----------------------------------------------------------------------------#
+# Ranked search over venues and artists.
+#
+# Matching is done with ILIKE on name, city and state, which the pg_trgm GIN
+# indexes (migration 5f0c2b9a7d41) answer without a sequential scan, and with
+# array containment on genres, answered by the GIN index on the genres
+# column. Results are ordered by trigram similarity to the search term and
+# paginated by keyset on (rank, id).
+#----------------------------------------------------------------------------#
+
+# A name match outranks a genre match, which outranks a city/state match.
+NAME_WEIGHT = 1.0
+GENRE_WEIGHT = 0.6
+PLACE_WEIGHT = 0.4
+
+
+def escape_like(term):
+    # make %, _ and \ in user input match literally inside ILIKE
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def matching_genres(term):
+    # the known genres the term names exactly, ignoring case
+    return [genre for genre, _ in genre_choices
+            if genre.lower() == term.lower()]
+
+
+def search(model, term, limit, cursor=None):
+    # Search `model` (Venue or Artist) for `term`. Returns up to `limit`
+    # rows of (id, name, city, state, num_upcoming_shows, rank), best match
+    # first, and the cursor of the next page, or None when this is the last
+    # page.
+    term = term.strip()
+    pattern = '%' + escape_like(term) + '%'
+    genres = matching_genres(term)
+    conditions = [model.name.ilike(pattern),
+                  model.city.ilike(pattern),
+                  model.state.ilike(pattern)]
+    if genres:
+        conditions.append(model.genres.op('@>')(
+            cast(genres, ARRAY(db.String(120)))))
+    rank = cast(func.greatest(
+        func.similarity(model.name, term) * NAME_WEIGHT,
+        func.similarity(model.city, term) * PLACE_WEIGHT,
+        func.similarity(model.state, term) * PLACE_WEIGHT,
+        case([(conditions[-1], GENRE_WEIGHT)], else_=0) if genres else 0),
+        db.Float).label('rank')
+    query = db.session.query(
+        model.id, model.name, model.city, model.state,
+        model.upcoming_shows_count.label('num_upcoming_shows'),
+        rank).filter(or_(*conditions))
+    position = decode_cursor(cursor, float, int)
+    if position:
+        # rows strictly after the last row of the previous page
+        last_rank, last_id = position
+        query = query.filter(or_(
+            rank < literal(last_rank, db.Float),
+            and_(rank == literal(last_rank, db.Float), model.id > last_id)))
+    # fetch one extra row to learn whether there is a next page
+    rows = query.order_by(rank.desc(), model.id).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].rank, rows[-1].id)
+    return rows, next_cursor
@@ -0,0 +1,208 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import gc
+import os
+import time
+import signal
+import click
+from flask import current_app, jsonify
+from flask.cli import with_appcontext
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import configure_mappers
+from models import db
+from database import pool_settings
+from replicas import replicas
+from rendering import load_templates
+from formatting import FORMATS, formatter
+#----------------------------------------------------------------------------#
+# Production serving.
+#
+#   flask serve                # gunicorn, sized for this host
+#   flask reload-server        # new code, no dropped requests
+#
+# `flask serve` runs gunicorn on the app already imported by the CLI.
+# Before forking it loads everything workers would otherwise each load on
+# first use: mappers, every template and the Babel locale data. The workers
+# then share those pages copy-on-write. Workers x threads are derived from
+# the cores available and the database pool: each worker may open
+# pool_size + max_overflow connections, and all of them together must stay
+# within DB_MAX_CONNECTIONS. Debug mode is refused, and so is the
+# per-process lru view cache with more than one worker: a write would
+# invalidate the cache of the worker that served it only.
+#
+# Reloads: HUP restarts the workers gracefully on the preloaded code
+# (configuration changes); `flask reload-server` sends USR2, which starts a
+# new master on the current code next to the old one on the same sockets,
+# and then TERM to the old master, which finishes its requests and exits.
+#
+# READINESS_URL answers 200 once the database answers, 503 otherwise, for a
+# load balancer or orchestrator to route traffic by.
+#----------------------------------------------------------------------------#
+
+
+def available_cores():
+    # the cores this process may run on (cgroup / affinity aware)
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def autotune(config, cores=None):
+    # (workers, threads): threads per worker match the pool size, so a
+    # thread seldom waits for a connection; workers are 2 x cores + 1 at
+    # most, fewer when their connections would exceed DB_MAX_CONNECTIONS
+    cores = cores or available_cores()
+    settings = pool_settings(config)
+    threads = config.get('WEB_THREADS') or settings['pool_size']
+    if config.get('DB_DISABLE_POOL'):
+        # a connection per busy thread, no pool around them
+        per_worker = threads
+    else:
+        per_worker = settings['pool_size'] + settings['max_overflow']
+    workers = config.get('WEB_WORKERS') or max(1, min(
+        2 * cores + 1, config['DB_MAX_CONNECTIONS'] // per_worker))
+    return workers, threads
+
+
+def preload(app):
+    # load what every worker needs before the fork, then drop anything
+    # that must not be shared with the children
+    configure_mappers()
+    load_templates(app.jinja_env)
+    locale = app.config.get('DATETIME_LOCALE', 'en_US')
+    zone = app.config.get('SHOW_TIMEZONE', 'UTC')
+    for name in FORMATS:
+        formatter(name, locale, zone, zone)
+    dispose_engines(app)
+    # keep the collector from touching (and so copying) the preloaded
+    # objects in every worker
+    gc.freeze()
+
+
+def dispose_engines(app):
+    # connections opened in the master must not be used by the workers
+    with app.app_context():
+        db.engine.dispose()
+    for engine in replicas.engines:
+        engine.dispose()
+
+
+def ready():
+    # readiness probe: can this worker reach the primary?
+    try:
+        with db.engine.connect() as connection:
+            connection.execute(text('SELECT 1'))
+    except SQLAlchemyError as error:
+        return jsonify({"status": "unavailable",
+                        "error": type(error).__name__}), 503
+    return jsonify({"status": "ready"})
+
+
+def init_serving(app):
+    url = app.config.get('READINESS_URL')
+    if url:
+        app.add_url_rule(url, 'ready', ready)
+
+
+def run_server(application, options):
+    # gunicorn running an application object that is already loaded; only
+    # imported here, by the serve command
+    from gunicorn.app.base import BaseApplication
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return application
+
+    Server().run()
+
+
+def server_options(config, workers, threads):
+    return {
+        'bind': config['WEB_BIND'],
+        'workers': workers,
+        'threads': threads,
+        'worker_class': 'gthread' if threads > 1 else 'sync',
+        'preload_app': True,
+        'timeout': config['WEB_TIMEOUT'],
+        'graceful_timeout': config['WEB_GRACEFUL_TIMEOUT'],
+        # restart workers now and then, staggered, to bound memory growth
+        'max_requests': config['WEB_MAX_REQUESTS'],
+        'max_requests_jitter': config['WEB_MAX_REQUESTS'] // 10,
+        'pidfile': config['WEB_PIDFILE'],
+        'post_fork': lambda server, worker: dispose_engines(
+            server.app.load()),
+    }
+
+
+@click.command('serve')
+@click.option('--workers', type=int, help='Override the autotuned count.')
+@click.option('--threads', type=int, help='Override the autotuned count.')
+@click.option('--bind', help='Address to listen on (default: WEB_BIND).')
+@click.option('--dry-run', is_flag=True, help='Print the settings and exit.')
+@with_appcontext
+def serve(workers, threads, bind, dry_run):
+    """Serve the app with gunicorn, preloaded and sized for this host."""
+    app = current_app._get_current_object()
+    if app.debug:
+        raise click.ClickException(
+            'Debug mode is on (FLASK_DEBUG); serve runs without it')
+    tuned_workers, tuned_threads = autotune(app.config)
+    options = server_options(app.config, workers or tuned_workers,
+                             threads or tuned_threads)
+    if bind:
+        options['bind'] = bind
+    if options['workers'] > 1 and app.config.get('CACHE_BACKEND') == 'lru':
+        # each worker would invalidate only its own copy on a write
+        raise click.ClickException(
+            'CACHE_BACKEND lru is per process; with several workers use '
+            'sqlite or redis (or null), or --workers 1')
+    click.echo(f'{available_cores()} cores, DB profile '
+               f'{app.config["DB_PROFILE"]}: {options["workers"]} workers x '
+               f'{options["threads"]} threads on {options["bind"]}')
+    if dry_run:
+        return
+    preload(app)
+    run_server(app, options)
+
+
+def read_pid(path):
+    try:
+        with open(path) as pidfile:
+            return int(pidfile.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+@click.command('reload-server')
+@click.option('--timeout', default=60, show_default=True,
+              help='Seconds to wait for the new master.')
+@with_appcontext
+def reload_server(timeout):
+    """Restart the server on the current code without dropping requests."""
+    path = current_app.config['WEB_PIDFILE']
+    old = read_pid(path)
+    if old is None:
+        raise click.ClickException(f'No server pid in {path}')
+    os.kill(old, signal.SIGUSR2)
+    # the new master writes <pidfile>.2 once it is up, and takes over the
+    # pidfile when the old one has exited
+    deadline = time.monotonic() + timeout
+    new = None
+    while new is None:
+        if time.monotonic() > deadline:
+            raise click.ClickException(
+                'The new master did not start; the old one keeps serving')
+        time.sleep(0.5)
+        new = read_pid(path + '.2')
+    # its workers load the app before they accept; give them that long
+    time.sleep(current_app.config['WEB_RELOAD_GRACE'])
+    os.kill(old, signal.SIGTERM)
+    click.echo(f'Master {old} retired, now serving from {new}')
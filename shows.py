@@ -0,0 +1,153 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import sys
+from datetime import datetime
+from flask import Blueprint, render_template, request, flash, abort
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import BadRequest, MethodNotAllowed
+from models import db, Show
+from forms import ShowForm, ScheduleForm
+from queries import show_listing, show_tiles
+from counters import count_new_shows
+from schedule import (expand, schedule_shows, InvalidSchedule,
+                      ScheduleConflict)
+from bookings import booking_conflict
+from importer import minutes
+from cache import cache
+from replicas import read_replica, replica_cache_ttl
+from pages import paginate
+#----------------------------------------------------------------------------#
+# Show pages: listing, create and recurring schedules.
+#----------------------------------------------------------------------------#
+
+bp = Blueprint('shows', __name__)
+
+
+@bp.route('/shows')
+@read_replica
+def shows():
+    try:
+        def show_page():
+            # displays one page of shows at /shows, in start time order
+            show_rows, pager = paginate(
+                show_listing(), [Show.start_time, Show.id],
+                datetime.fromisoformat, int)
+            return show_tiles(show_rows), pager
+        data, pager = cache.get_or_set(
+            ['shows'], request.query_string.decode(), show_page,
+            ttl=replica_cache_ttl())
+    except BadRequest:
+        abort(400)
+    except Exception as e:
+        flash(f'Error: {str(sys.exc_info()[0])}')
+    return render_template('pages/shows.html', shows=data, pager=pager)
+
+
+# Create Shows
+# --------------------------------------------------------------
+@bp.route('/shows/create')
+def create_shows():
+    # renders form. do not touch.
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+
+@bp.route('/shows/create', methods=['POST'])
+def create_show_submission():
+    # called to create new shows in the db, upon
+    # submitting new show listing form
+    form = ShowForm()
+    error = False
+    try:
+        newShow = Show(start_time=request.form['start_time'],
+                       venue_id=request.form['venue_id'],
+                       artist_id=request.form['artist_id'])
+        if request.form.get('duration'):
+            # else the database default
+            newShow.duration = minutes(request.form['duration'])
+        # on successful db insert, flash success
+        db.session.add(newShow)
+        db.session.flush()
+        # upcoming / past counters of its venue and artist, same transaction
+        count_new_shows([newShow])
+        db.session.commit()
+        # a new show changes its venue and artist pages and the listings
+        cache.invalidate(f'venue:{int(request.form["venue_id"])}',
+                         f'artist:{int(request.form["artist_id"])}',
+                         'venues', 'shows')
+        flash('Show was successfully listed!')
+    # error Method Not Allowed
+    except MethodNotAllowed as mt:
+        db.session.rollback()
+        db.session.close()
+        abort(405)
+    except BadRequest:
+        abort(400)
+    except IntegrityError as integrity_error:
+        db.session.rollback()
+        conflict = booking_conflict(integrity_error)
+        if conflict is None:
+            flash('An error occurred. Show could not be listed.')
+        else:
+            # double booking: back to the form, as filled in
+            flash(f'Show could not be listed: {conflict}.')
+            return render_template('forms/new_show.html', form=form), 409
+    except ValueError as invalid:
+        db.session.rollback()
+        flash(f'Show could not be listed: {invalid}.')
+        return render_template('forms/new_show.html', form=form), 400
+    except Exception:
+        error = True
+        db.session.rollback()
+        flash(f'An error occurred. Show could not be listed.')
+    finally:
+        db.session.close()
+    return render_template('pages/home.html')
+
+
+# Schedule Shows
+# --------------------------------------------------------------
+@bp.route('/shows/schedule')
+def schedule_shows_form():
+    form = ScheduleForm()
+    return render_template('forms/schedule_shows.html', form=form)
+
+
+@bp.route('/shows/schedule', methods=['POST'])
+def schedule_shows_submission():
+    # books a recurring residency: every show of the schedule in one
+    # insert and one commit
+    form = ScheduleForm()
+    try:
+        starts = expand(request.form['recurrence'],
+                        start_time=request.form.get('start_time'),
+                        count=request.form.get('count'),
+                        until=request.form.get('until'),
+                        interval=request.form.get('interval'),
+                        dates=[line for line in request.form.get(
+                            'dates', '').splitlines() if line.strip()],
+                        rule=request.form.get('rrule'))
+        shows = schedule_shows(request.form['venue_id'],
+                               request.form['artist_id'], starts,
+                               request.form.get('duration'))
+        db.session.commit()
+        cache.invalidate(f'venue:{int(request.form["venue_id"])}',
+                         f'artist:{int(request.form["artist_id"])}',
+                         'venues', 'shows')
+        flash(f'{len(shows)} shows were successfully scheduled!')
+    except InvalidSchedule as error:
+        db.session.rollback()
+        # back to the form, as filled in
+        flash(f'Shows could not be scheduled: {error}')
+        return render_template('forms/schedule_shows.html', form=form), (
+            409 if isinstance(error, ScheduleConflict) else 400)
+    except BadRequest:
+        abort(400)
+    except Exception:
+        db.session.rollback()
+        flash('An error occurred. Shows could not be scheduled.')
+    finally:
+        db.session.close()
+    return render_template('pages/home.html')
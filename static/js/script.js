@@ -2,3 +2,11 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// dates are rendered in the browser's timezone from the next page on
+(function () {
+  var tz = window.Intl && Intl.DateTimeFormat().resolvedOptions().timeZone;
+  if (tz && document.cookie.indexOf('tz=' + tz) === -1) {
+    document.cookie = 'tz=' + tz + '; path=/; max-age=31536000; samesite=lax';
+  }
+})();
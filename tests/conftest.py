@@ -0,0 +1,158 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import os
+from datetime import datetime, timedelta
+import pytest
+from flask_migrate import Migrate, upgrade
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.engine.url import make_url
+from app import create_app
+from models import db, Venue, Artist, Show
+from replicas import replicas
+from counters import count_new_shows
+#----------------------------------------------------------------------------#
+# Test fixtures.
+#
+#   python -m pytest
+#
+# The tests run against PostgreSQL databases of their own: TEST_DATABASE_URL
+# and, standing in for a streaming replica of it, TEST_REPLICA_URL. Each is
+# created when missing and migrated to head (flask db upgrade) once per
+# session; every test starts from empty tables. The view cache is off, so
+# every request sends its SQL. When the server cannot be reached the tests
+# that need a database are skipped; the others still run.
+#----------------------------------------------------------------------------#
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL',
+                                   'postgresql:///fyyur_test')
+TEST_REPLICA_URL = os.environ.get('TEST_REPLICA_URL',
+                                  'postgresql:///fyyur_test_replica')
+
+TEST_CONFIG = {
+    'TESTING': True,
+    # debug: no error.log written by the tests
+    'DEBUG': True,
+    'DB_PROFILE': 'test',
+    'CACHE_BACKEND': 'null',
+    'WTF_CSRF_ENABLED': False,
+    'DATABASE_REPLICA_URLS': [],
+}
+
+# every row the tests write; show and recommendation go with them (CASCADE)
+TABLES = 'venues, artists'
+
+
+def prepare(url):
+    # create the database `url` names if missing and migrate it to head;
+    # skips the test when the server is unreachable
+    admin = make_url(url)
+    name, admin.database = admin.database, 'postgres'
+    engine = create_engine(admin, isolation_level='AUTOCOMMIT')
+    try:
+        try:
+            connection = engine.connect()
+        except OperationalError as error:
+            pytest.skip(f'cannot reach the test database {make_url(url)!r} '
+                        f'(TEST_DATABASE_URL, TEST_REPLICA_URL): '
+                        f'{str(error.orig).strip()}')
+        with connection:
+            exists = connection.execute(
+                'SELECT 1 FROM pg_database WHERE datname = %s',
+                name).scalar()
+            if not exists:
+                connection.execute(f'CREATE DATABASE "{name}"')
+    finally:
+        engine.dispose()
+    app = create_app({**TEST_CONFIG, 'SQLALCHEMY_DATABASE_URI': url})
+    Migrate(app, db)
+    with app.app_context():
+        upgrade(directory=os.path.join(ROOT, 'migrations'))
+        db.engine.dispose()
+    return url
+
+
+def empty(engine):
+    with engine.begin() as connection:
+        connection.execute(f'TRUNCATE {TABLES} RESTART IDENTITY CASCADE')
+
+
+@pytest.fixture(scope='session')
+def database_url():
+    return prepare(TEST_DATABASE_URL)
+
+
+@pytest.fixture(scope='session')
+def replica_url(database_url):
+    return prepare(TEST_REPLICA_URL)
+
+
+@pytest.fixture
+def make_app(database_url):
+    # create_app() on the test database, with `config` on top; the app
+    # context stays pushed for the test
+    made = []
+
+    def make(**config):
+        app = create_app({**TEST_CONFIG,
+                          'SQLALCHEMY_DATABASE_URI': database_url, **config})
+        context = app.app_context()
+        context.push()
+        made.append(context)
+        empty(db.engine)
+        return app
+
+    yield make
+    for context in reversed(made):
+        db.session.remove()
+        db.engine.dispose()
+        for engine in replicas.engines:
+            engine.dispose()
+        context.pop()
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def add_catalog(venues, shows_per_venue, start=None):
+    # `venues` venues over two areas and `shows_per_venue` upcoming shows at
+    # each, a day apart, all by one artist; returns the venues' ids
+    start = start or datetime.now().replace(microsecond=0) + \
+        timedelta(days=1)
+    artist = Artist(name='The Testers', city='San Francisco', state='CA',
+                    phone='326-123-5000', genres=['Jazz'],
+                    seeking_venue=True)
+    added = []
+    for number in range(venues):
+        city, state = [('San Francisco', 'CA'), ('New York', 'NY')][
+            number % 2]
+        venue = Venue(name=f'Venue {number}', city=city, state=state,
+                      address=f'{number} Main Street', phone='123-123-1234',
+                      genres=['Jazz', 'Folk'], seeking_talent=True)
+        venue.shows = [
+            Show(artist=artist, start_time=start + timedelta(
+                days=number * shows_per_venue + day))
+            for day in range(shows_per_venue)]
+        db.session.add(venue)
+        added.append(venue)
+    db.session.flush()
+    # as every insert of shows does (counters.py)
+    count_new_shows([show for venue in added for show in venue.shows])
+    db.session.commit()
+    return [venue.id for venue in added]
+
+
+@pytest.fixture
+def catalog(app):
+    return add_catalog
@@ -0,0 +1,36 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import pytest
+from api import ical_line
+#----------------------------------------------------------------------------#
+# iCalendar content lines (api.ical_line), without a database: folded into
+# lines of at most 75 octets, continuation lines starting with a space.
+#----------------------------------------------------------------------------#
+
+
+def test_short_lines_are_not_folded():
+    line = 'SUMMARY:' + 'x' * 67
+    assert ical_line(line) == line.encode()
+
+
+@pytest.mark.parametrize('line', [
+    'SUMMARY:' + 'x' * 68,
+    'DESCRIPTION:' + 'The Musical Hop ' * 40,
+    # two-, three- and four-byte UTF-8 sequences across every fold point
+    'LOCATION:' + 'Café Zoë ' * 30,
+    'SUMMARY:' + '東京ライブ' * 40,
+    'SUMMARY:a' + '🎷🎺' * 40,
+])
+def test_long_lines_are_folded(line):
+    folded = ical_line(line).split(b'\r\n')
+    assert len(folded) > 1
+    for number, part in enumerate(folded):
+        assert len(part) <= 75
+        assert number == 0 or part.startswith(b' ')
+        # never inside a UTF-8 sequence
+        part.decode()
+    # unfolding gives the line back
+    assert b''.join(part[1:] if number else part
+                    for number, part in enumerate(folded)) == line.encode()
@@ -0,0 +1,52 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import gzip
+from datetime import datetime
+from export import csv_chunks, gzip_chunks
+#----------------------------------------------------------------------------#
+# Streaming exports (export.py).
+#----------------------------------------------------------------------------#
+
+COLUMNS = ['name', 'genres', 'seeking', 'start_time', 'website']
+ROWS = [
+    ['Venue 0', ['Jazz', 'Folk'], True, datetime(2026, 5, 1, 20), None],
+    ['Venue, 1', [], False, datetime(2026, 5, 2, 20), 'https://x.test'],
+    ['Venue 2', ['Blues'], None, datetime(2026, 5, 3, 20), ''],
+]
+CSV = (b'name,genres,seeking,start_time,website\r\n'
+       b'Venue 0,Jazz;Folk,true,2026-05-01T20:00:00,\r\n'
+       b'"Venue, 1",,false,2026-05-02T20:00:00,https://x.test\r\n'
+       b'Venue 2,Blues,,2026-05-03T20:00:00,\r\n')
+
+
+def test_csv_chunks_one_per_batch():
+    chunks = list(csv_chunks(COLUMNS, iter(ROWS), batch_size=2))
+    # header and two rows, then the last row
+    assert len(chunks) == 2
+    assert b''.join(chunks) == CSV
+
+
+def test_csv_chunks_of_no_rows_is_the_header():
+    assert list(csv_chunks(COLUMNS, iter([]), batch_size=2)) == [
+        CSV.split(b'\r\n')[0] + b'\r\n']
+
+
+def test_gzip_chunks_decompress_to_the_input():
+    chunks = list(csv_chunks(COLUMNS, iter(ROWS * 1000), batch_size=100))
+    assert gzip.decompress(b''.join(gzip_chunks(iter(chunks)))) == \
+        b''.join(chunks)
+    assert gzip.decompress(b''.join(gzip_chunks(iter([])))) == b''
+
+
+def test_export_answers_local_requests_only(client, catalog):
+    catalog(venues=2, shows_per_venue=1)
+    response = client.get('/export/venues',
+                          environ_base={'REMOTE_ADDR': '127.0.0.1'})
+    assert response.status_code == 200
+    assert b'Venue 1' in response.data
+
+    response = client.get('/export/venues',
+                          environ_base={'REMOTE_ADDR': '203.0.113.9'})
+    assert response.status_code == 404
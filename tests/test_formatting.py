@@ -0,0 +1,55 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+import pytest
+from flask import Flask, current_app
+from importer import timestamp
+from formatting import format_datetime
+#----------------------------------------------------------------------------#
+# Show times (formatting.py), without a database: naive times are in
+# SHOW_TIMEZONE, aware ones are converted to it, and the `datetime` filter
+# shows them in the visitor's timezone (the `tz` cookie).
+#----------------------------------------------------------------------------#
+
+
+@pytest.fixture
+def config():
+    app = Flask(__name__)
+    app.config.update(SHOW_TIMEZONE='America/Los_Angeles',
+                      DATETIME_LOCALE='en_US')
+    with app.test_request_context():
+        yield app.config
+
+
+@pytest.mark.parametrize('value, stored', [
+    ('2026-05-01T20:00', datetime(2026, 5, 1, 20)),
+    ('2026-05-01T20:00:00-07:00', datetime(2026, 5, 1, 20)),
+    ('2026-05-02T03:00:00Z', datetime(2026, 5, 1, 20)),
+    ('2026-05-01T23:00:00-04:00', datetime(2026, 5, 1, 20)),
+    # standard time
+    ('2026-12-01T20:00:00-08:00', datetime(2026, 12, 1, 20)),
+])
+def test_timestamps_are_stored_in_the_show_timezone(config, value, stored):
+    assert timestamp(value) == stored
+
+
+@pytest.mark.parametrize('tz, value, shown', [
+    # no cookie, or one naming no zone: SHOW_TIMEZONE itself
+    (None, datetime(2026, 5, 1, 20), 'Fri 05, 01, 2026 8:00PM'),
+    ('Nowhere/Special', datetime(2026, 5, 1, 20), 'Fri 05, 01, 2026 8:00PM'),
+    ('America/New_York', datetime(2026, 5, 1, 20),
+     'Fri 05, 01, 2026 11:00PM'),
+    # the next day, and standard time
+    ('Europe/Berlin', datetime(2026, 5, 1, 20), 'Sat 05, 02, 2026 5:00AM'),
+    ('Europe/Berlin', datetime(2026, 12, 1, 20), 'Wed 12, 02, 2026 5:00AM'),
+    # older callers pass strings
+    ('America/New_York', '2026-05-01T20:00', 'Fri 05, 01, 2026 11:00PM'),
+])
+def test_datetimes_are_shown_in_the_visitor_timezone(config, tz, value,
+                                                     shown):
+    app = current_app._get_current_object()
+    headers = {'Cookie': f'tz={tz}'} if tz else {}
+    with app.test_request_context(headers=headers):
+        assert format_datetime(value) == shown
@@ -0,0 +1,46 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from plans import (read_routes, route_plans, capture_statements, explain,
+                   seq_scans)
+from replicas import replicas
+from tests.conftest import add_catalog
+#----------------------------------------------------------------------------#
+# Query plans (`flask check-plans` as a test).
+#
+# The test tables are tiny, so plans are taken with enable_seqscan off, as
+# check-plans does below --min-rows: a seq scan on show that survives that
+# has no index to use.
+#----------------------------------------------------------------------------#
+
+
+def test_read_routes_plan_no_seq_scan_on_show(client, catalog):
+    venue_id = catalog(venues=3, shows_per_venue=4)[0]
+    artist_id = 1
+    checked = {}
+    for method, url, data in read_routes(venue_id, artist_id, 'Venue'):
+        plans = route_plans(client, method, url, data, force_index=True)
+        for statement, scans in plans:
+            assert not scans, f'{method} {url}: seq scan on show in\n' \
+                              f'{statement}'
+        checked[url] = len(plans)
+
+    # the view cache is off: the detail pages and calendars did query show
+    assert checked[f'/venues/{venue_id}'] > 0
+    assert checked[f'/artists/{artist_id}'] > 0
+    assert checked[f'/api/v1/venues/{venue_id}/calendar?month=2030-01'] > 0
+
+
+def test_replica_statements_are_explained_on_the_replica(make_app,
+                                                         replica_url):
+    app = make_app(DATABASE_REPLICA_URLS=[replica_url])
+    venue_id = add_catalog(venues=1, shows_per_venue=2)[0]
+    statements = capture_statements(app.test_client(), 'GET',
+                                    f'/venues/{venue_id}')
+
+    assert statements
+    assert {engine for engine, _, _ in statements} == {replicas.engines[0]}
+    for engine, statement, parameters in statements:
+        assert not seq_scans(explain(engine, statement, parameters, True),
+                             'show')
@@ -0,0 +1,46 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import pytest
+from models import db
+from counters import counter_drift
+#----------------------------------------------------------------------------#
+# Query counts.
+#
+# A page's statement count (X-Query-Count, from the SQL instrumentation)
+# must not grow with the rows it lists: N venues with M shows each still
+# render in the same number of queries.
+#----------------------------------------------------------------------------#
+
+
+def query_count(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return int(response.headers['X-Query-Count']), response
+
+
+@pytest.mark.parametrize('url', ['/venues', '/shows'])
+def test_listing_queries_do_not_grow_with_rows(client, catalog, url):
+    catalog(venues=2, shows_per_venue=1)
+    few, _ = query_count(client, url)
+
+    catalog(venues=20, shows_per_venue=5)
+    many, response = query_count(client, url)
+
+    assert many == few
+    assert b'Venue 1' in response.data
+
+
+def test_venues_page_lists_every_venue(client, catalog):
+    ids = catalog(venues=5, shows_per_venue=2)
+    _, response = query_count(client, '/venues')
+    for venue_id in ids:
+        assert f'/venues/{venue_id}"'.encode() in response.data
+    assert db.session.execute('SELECT count(*) FROM show').scalar() == 10
+
+
+def test_catalog_keeps_the_show_counters(catalog):
+    # the listings read the counters, not show
+    catalog(venues=3, shows_per_venue=2)
+    assert counter_drift() == {'venues': [], 'artists': []}
@@ -0,0 +1,59 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import re
+from datetime import datetime
+import pytest
+from models import db, Venue, Artist, Show
+from recommend import (compute_recommendations, recommended_artists,
+                       popcount, BIT_COUNT_VERSION)
+#----------------------------------------------------------------------------#
+# Recommendations (recommend.py).
+#----------------------------------------------------------------------------#
+
+
+def python(sql):
+    # the integer-arithmetic popcount() as Python: SQL's CASTs dropped, its
+    # operators bind as Python's do (* before >> before &)
+    return re.sub(r' AS \w+\)', ')', sql.replace('CAST(', '('))
+
+
+@pytest.mark.parametrize('bitset', [
+    0, 1, 2, 3, 255, 256, 0b1010101, 2 ** 16 - 1, 2 ** 30, 2 ** 31 - 1,
+    *range(0, 2 ** 31, 76543211)])
+def test_popcount_without_bit_count(bitset):
+    sql = popcount('bitset', BIT_COUNT_VERSION - 1)
+    assert 'bit_count' not in sql
+    assert eval(python(sql), {'bitset': bitset}) == bin(bitset).count('1')
+
+
+def test_popcount_with_bit_count():
+    assert popcount('bitset', BIT_COUNT_VERSION) == \
+        'bit_count(CAST(bitset AS bit(32)))'
+
+
+def artist(name, genres, state='CA'):
+    return Artist(name=name, city='San Francisco', state=state,
+                  phone='326-123-5000', genres=genres, seeking_venue=True)
+
+
+def test_area_and_history_recommend_without_a_shared_genre(app):
+    venue = Venue(name='The Jazz Room', city='San Francisco', state='CA',
+                  address='1 Main Street', phone='123-123-1234',
+                  genres=['Jazz'], seeking_talent=True)
+    regular = artist('The Regulars', ['Folk'])
+    venue.shows = [Show(artist=regular, start_time=datetime(2020, 1, day, 20))
+                   for day in range(1, 6)]
+    db.session.add_all([
+        venue, regular, artist('No Genres', []),
+        artist('Jazz Elsewhere', ['Blues', 'Jazz'], state='NY'),
+        artist('Folk Elsewhere', ['Folk'], state='NY')])
+    db.session.commit()
+
+    compute_recommendations(per_entity=10)
+
+    picks = [pick.name for pick in recommended_artists(venue.id)]
+    # shows together and the same state count without a shared genre; an
+    # artist with none of them is no candidate
+    assert picks == ['The Regulars', 'No Genres', 'Jazz Elsewhere']
@@ -0,0 +1,174 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import socket
+import time
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import event
+from models import db
+from replicas import replicas, STICKY_COOKIE
+from tests.conftest import empty
+#----------------------------------------------------------------------------#
+# Read replica routing (replicas.py).
+#
+# The test database is the primary and TEST_REPLICA_URL a second database
+# posing as its replica. The two hold different venues, so a page shows
+# which one it read, and every statement is recorded with the database it
+# ran on.
+#----------------------------------------------------------------------------#
+
+VENUE = '''
+INSERT INTO venues (name, city, state, address, phone, genres)
+VALUES (%s, 'San Francisco', 'CA', '1 Main Street', '123-123-1234',
+        '{Jazz}')
+'''
+
+# the form of POST /venues/create
+NEW_VENUE = {
+    'name': 'Just Listed', 'city': 'San Francisco', 'state': 'CA',
+    'address': '2 Main Street', 'phone': '123-123-1234', 'image_link': '',
+    'facebook_link': '', 'genres': ['Jazz'], 'website': '',
+    'seeking_description': ''}
+
+
+@contextmanager
+def served_by(*engines):
+    # the database name of each statement run on `engines` in the block
+    served = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        served.append(conn.engine.url.database)
+
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield served
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', record)
+
+
+def unused_url(url):
+    # `url` on a local port nothing listens on: a replica that is down
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    database = url.rsplit('/', 1)[1]
+    return f'postgresql://127.0.0.1:{port}/{database}'
+
+
+@pytest.fixture
+def primary_and_replica(make_app, replica_url):
+    # an app reading from `replica_urls`, one venue in each database
+    def make(replica_urls=(replica_url,)):
+        app = make_app(DATABASE_REPLICA_URLS=list(replica_urls))
+        db.engine.execute(VENUE, 'On The Primary')
+        for engine in replicas.engines:
+            if str(engine.url) == replica_url:
+                empty(engine)
+                engine.execute(VENUE, 'On The Replica')
+        return app
+    return make
+
+
+def test_read_views_query_the_replica(primary_and_replica):
+    app = primary_and_replica()
+    client = app.test_client()
+    with served_by(db.engine, *replicas.engines) as served:
+        response = client.get('/venues')
+
+    assert response.status_code == 200
+    assert b'On The Replica' in response.data
+    assert b'On The Primary' not in response.data
+    assert served and set(served) == {replicas.engines[0].url.database}
+
+
+def test_write_views_query_the_primary(primary_and_replica):
+    app = primary_and_replica()
+    client = app.test_client()
+    with served_by(db.engine, *replicas.engines) as served:
+        response = client.get('/venues/1/edit')
+
+    assert response.status_code == 200
+    assert set(served) == {db.engine.url.database}
+
+
+def test_reads_stay_on_the_primary_after_a_write(primary_and_replica):
+    app = primary_and_replica()
+    client = app.test_client()
+    response = client.post('/venues/create', data=NEW_VENUE)
+    assert response.status_code == 200
+    assert STICKY_COOKIE in response.headers['Set-Cookie']
+
+    # the client sends the cookie back: its reads see its own write
+    with served_by(db.engine, *replicas.engines) as served:
+        response = client.get('/venues')
+    assert b'Just Listed' in response.data
+    assert set(served) == {db.engine.url.database}
+
+    # once the cookie has run out, reads go back to the replica
+    client.set_cookie('localhost', STICKY_COOKIE, str(int(time.time()) - 1))
+    with served_by(db.engine, *replicas.engines) as served:
+        response = client.get('/venues')
+    assert b'Just Listed' not in response.data
+    assert set(served) == {replicas.engines[0].url.database}
+
+
+def test_reads_fall_back_to_the_primary_when_the_replica_is_down(
+        primary_and_replica, replica_url):
+    app = primary_and_replica([unused_url(replica_url)])
+    client = app.test_client()
+    with served_by(db.engine) as served:
+        response = client.get('/venues')
+
+    assert response.status_code == 200
+    assert b'On The Primary' in response.data
+    assert served
+    assert replicas.healthy(replicas.engines[0]) is False
+
+
+def test_a_down_replica_is_skipped_for_a_healthy_one(primary_and_replica,
+                                                     replica_url):
+    app = primary_and_replica([unused_url(replica_url), replica_url])
+    client = app.test_client()
+    for _ in range(2):
+        # round robin would pick the down replica first on one of these
+        response = client.get('/venues')
+        assert response.status_code == 200
+        assert b'On The Replica' in response.data
+
+
+def test_cached_replica_data_is_not_served_after_a_write(make_app,
+                                                         replica_url):
+    # the replica never sees the write, like one lagging behind it
+    app = make_app(DATABASE_REPLICA_URLS=[replica_url],
+                   CACHE_BACKEND='lru')
+    empty(replicas.engines[0])
+    writer, reader = app.test_client(), app.test_client()
+    writer.post('/venues/create', data=NEW_VENUE)
+
+    # another client caches the listing anew, from the replica
+    assert b'Just Listed' not in reader.get('/venues').data
+    assert b'Just Listed' in writer.get('/venues').data
+
+
+def test_a_replica_lost_mid_request_is_retried_on_the_primary(
+        primary_and_replica, replica_url):
+    app = primary_and_replica()
+    client = app.test_client()
+    assert b'On The Replica' in client.get('/venues').data
+
+    # the pooled replica connection dies before the next request uses it
+    db.engine.execute(
+        'SELECT pg_terminate_backend(pid) FROM pg_stat_activity '
+        'WHERE datname = %s', replicas.engines[0].url.database)
+    with served_by(db.engine) as served:
+        response = client.get('/venues')
+
+    assert response.status_code == 200
+    assert b'On The Primary' in response.data
+    assert b'Error' not in response.data
+    assert served
+    assert replicas.healthy(replicas.engines[0]) is False
@@ -0,0 +1,68 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+import pytest
+from flask import Flask
+from schedule import expand, InvalidSchedule
+#----------------------------------------------------------------------------#
+# Schedule expansion (schedule.expand), without a database.
+#----------------------------------------------------------------------------#
+
+
+@pytest.fixture(autouse=True)
+def config():
+    # expand() reads SCHEDULE_MAX_SHOWS from the app config
+    app = Flask(__name__)
+    app.config['SCHEDULE_MAX_SHOWS'] = 10
+    with app.app_context():
+        yield app.config
+
+
+def test_weekly():
+    assert expand('weekly', '2026-05-01T20:00', count=3, interval=2) == [
+        datetime(2026, 5, 1, 20), datetime(2026, 5, 15, 20),
+        datetime(2026, 5, 29, 20)]
+
+
+def test_weekly_until_includes_the_last_day():
+    assert expand('weekly', '2026-05-01T20:00',
+                  until='2026-05-15T20:00')[-1] == datetime(2026, 5, 15, 20)
+
+
+def test_dates_are_sorted_and_distinct():
+    assert expand('dates', dates=['2026-05-02T20:00', '2026-05-01T20:00',
+                                  '2026-05-02T20:00']) == [
+        datetime(2026, 5, 1, 20), datetime(2026, 5, 2, 20)]
+
+
+def test_rrule():
+    assert expand('rrule', '2026-05-01T20:00',
+                  rule='FREQ=WEEKLY;BYDAY=FR,SA;COUNT=3') == [
+        datetime(2026, 5, 1, 20), datetime(2026, 5, 2, 20),
+        datetime(2026, 5, 8, 20)]
+
+
+@pytest.mark.parametrize('arguments', [
+    dict(recurrence='monthly', start_time='2026-05-01T20:00'),
+    dict(recurrence='weekly', start_time='2026-05-01T20:00'),
+    dict(recurrence='weekly', start_time='2026-05-01T20:00', count=3,
+         interval=0),
+    dict(recurrence='weekly', count=3),
+    dict(recurrence='weekly', start_time='not a time', count=3),
+    dict(recurrence='weekly', start_time='2026-05-01T20:00', count=11),
+    dict(recurrence='dates', dates=[]),
+    dict(recurrence='rrule', start_time='2026-05-01T20:00'),
+    dict(recurrence='rrule', start_time='2026-05-01T20:00',
+         rule='FREQ=SOMETIMES'),
+    # parses, and fails only once iterated
+    dict(recurrence='rrule', start_time='2026-05-01T20:00',
+         rule='FREQ=WEEKLY;INTERVAL=0;COUNT=3'),
+    # never ends
+    dict(recurrence='rrule', start_time='2026-05-01T20:00',
+         rule='FREQ=DAILY'),
+])
+def test_invalid_schedules(arguments):
+    with pytest.raises(InvalidSchedule):
+        expand(**arguments)
@@ -0,0 +1,272 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import sys
+from datetime import datetime
+from flask import (Blueprint, render_template, request, current_app, flash,
+                   redirect, url_for, abort)
+from sqlalchemy.orm.exc import NoResultFound
+from werkzeug.exceptions import BadRequest, MethodNotAllowed
+from models import db, Venue
+from forms import VenueForm
+from queries import page_size, decode_cursor, venue_areas, venue_detail
+from search import search
+from browse import known_genres
+from cache import cache
+from replicas import read_replica, replica_cache_ttl
+from pages import browse, recommendations, invalidate_venue
+from recommend import recommended_artists
+#----------------------------------------------------------------------------#
+# Venue pages: listing, search, detail, create, edit and delete.
+#----------------------------------------------------------------------------#
+
+bp = Blueprint('venues', __name__)
+
+
+@bp.route('/venues')
+@read_replica
+def venues():
+    try:
+        # areas, venues and upcoming show counts in one query
+        data = cache.get_or_set(
+            ['venues'], 'areas', venue_areas,
+            ttl=replica_cache_ttl())
+    # if any error occured!
+    except BadRequest:
+        abort(400)
+    except Exception as e:
+        flash(f'Error: {str(sys.exc_info()[0])}')
+    # return venue page with data
+    return render_template('pages/venues.html', areas=data)
+
+
+# search venue
+@bp.route('/venues/search', methods=['GET', 'POST'])
+@read_replica
+def search_venues():
+    try:
+        # get value from searchbox (GET for the next-page links)
+        search_term = request.values.get('search_term', '')
+        # ranked, paginated search by name, city, state and genre
+        venues, next_cursor = search(
+            Venue, search_term,
+            page_size(request.values.get('limit'),
+                      current_app.config['SEARCH_PAGE_SIZE']),
+            request.values.get('cursor'))
+        response = {
+            "count": len(venues),
+            "next_cursor": next_cursor,
+            "data": [
+                {
+                    "id": venue.id,
+                    "name": venue.name,
+                    "num_upcoming_shows": venue.num_upcoming_shows,
+                }
+                for venue in venues
+            ]
+        }
+    # error handling
+    # error Method Not Allowed
+    except MethodNotAllowed as mt:
+        abort(405)
+    except BadRequest:
+        abort(400)
+    except Exception as e:
+        flash(f'Error: {str(sys.exc_info()[0])}')
+    return render_template('pages/search_venues.html',
+                           results=response, search_term=search_term)
+
+
+# venues by genre, city / state and upcoming shows, with genre counts
+@bp.route('/venues/browse')
+@read_replica
+def browse_venues():
+    return browse(Venue, 'venues')
+
+
+# Show Venue data by Id
+@bp.route('/venues/<int:venue_id>')
+@read_replica
+def show_venue(venue_id):
+    try:
+        # shows the venue page with the given venue_id
+        past_before = request.args.get('past_before')
+        data = cache.get_or_set(
+            [f'venue:{venue_id}'], f'detail:{past_before}',
+            lambda: venue_detail(
+                venue_id, datetime.now(), current_app.config['DETAIL_SHOWS_LIMIT'],
+                decode_cursor(past_before, datetime.fromisoformat, int)),
+            ttl=replica_cache_ttl())
+    # error handling
+    # No Result Found
+    except NoResultFound:
+        abort(404)
+    except BadRequest:
+        abort(400)
+    except Exception as e:
+        flash(f'Error: {str(sys.exc_info()[0])}')
+    return render_template('pages/show_venue.html', venue=data)
+
+
+# artists seeking a venue, best matches first (`flask
+# compute-recommendations` scores them)
+@bp.route('/venues/<int:venue_id>/recommendations')
+@read_replica
+def venue_recommendations(venue_id):
+    return recommendations(Venue, venue_id, 'venue', recommended_artists)
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+
+@bp.route('/venues/create', methods=['GET'])
+def create_venue_form():
+    form = VenueForm()
+    return render_template('forms/new_venue.html', form=form)
+
+
+@bp.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+    form = VenueForm()
+    error = False
+    try:
+        # taking input value from Forms for store in database
+        newVenue = Venue(name=request.form['name'],
+                         city=request.form['city'],
+                         state=request.form['state'],
+                         address=request.form['address'],
+                         phone=request.form['phone'],
+                         image_link=request.form['image_link'],
+                         facebook_link=request.form['facebook_link'],
+                         genres=known_genres(request.form.getlist('genres')),
+                         website=request.form['website'],
+                         seeking_talent=True if "request.form['seeking_description']" != '' else False,
+                         seeking_description=request.form['seeking_description']
+                         )
+        db.session.add(newVenue)
+        db.session.commit()
+        # a new venue only shows up in the /venues listing
+        cache.invalidate('venues')
+
+        # on successful db insert, flash success
+        flash('Venue ' + request.form['name'] + ' was successfully listed!')
+    # Error Handling
+    # error Method Not Allowed
+    except MethodNotAllowed as mt:
+        db.session.rollback()
+        abort(405)
+    # except
+    except BadRequest:
+        abort(400)
+    except Exception:
+        error = True
+        db.session.rollback()
+        flash('An error occurred. Venue ' +
+              request.form['name'] + ' could not be listed.')
+    finally:
+        # Always Close the session.
+        db.session.close()
+    return render_template('pages/home.html')
+
+# Update Venue
+# ----------------------------------------------
+
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+    try:
+        form = VenueForm()
+        # Select venue data from db using venue_id and store in list
+        venue_query = Venue.query.filter(Venue.id == venue_id).one()
+        venue = []
+        for u in [venue_query]:
+            venue_dict = u.__dict__
+            venue_dict.pop('_sa_instance_state', None)
+            venue.append(venue_dict)
+    # Error Handling
+    except NoResultFound:
+        abort(404)
+    except BadRequest:
+        abort(400)
+    except Exception as e:
+        flash(f'Error: {str(sys.exc_info()[0])}')
+    return render_template('forms/edit_venue.html', form=form, venue=venue[0])
+
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+    # Select venue data from db using venue_id
+    venue = Venue.query.filter(Venue.id == venue_id).one()
+    try:
+        # taking form values if available and update db
+        if request.form['name']:
+            venue.name = request.form['name']
+        if request.form['city']:
+            venue.city = request.form['city']
+        if request.form['state']:
+            venue.state = request.form['state']
+        if request.form['address']:
+            venue.address = request.form['address']
+        if request.form['phone']:
+            venue.phone = request.form['phone']
+        if request.form['image_link']:
+            venue.image_link = request.form['image_link']
+        if request.form['facebook_link']:
+            venue.facebook_link = request.form['facebook_link']
+        if request.form.getlist('genres'):
+            # every selected genre; form['genres'] is only the first
+            venue.genres = known_genres(request.form.getlist('genres'))
+        if request.form['website']:
+            venue.website = request.form['website']
+        if request.form['seeking_description']:
+            venue.seeking_description = request.form['seeking_description']
+        if request.form['seeking_description'] != '':
+            venue.seeking_talent = True
+        else:
+            venue.seeking_talent = False
+        # commit session
+        db.session.add(venue)
+        db.session.commit()
+        invalidate_venue(venue_id)
+        flash(f'Venue {request.form["name"]} was successfully updated!')
+    # Error Handling
+    # error Method Not Allowed
+    except MethodNotAllowed as mt:
+        db.session.rollback()
+        abort(405)
+    except BadRequest:
+        db.session.rollback()
+        abort(400)
+    except Exception:
+        db.session.rollback()
+        flash(f'Error: {str(sys.exc_info()[0])}')
+    finally:
+        db.session.close()
+    return redirect(url_for('venues.show_venue', venue_id=venue_id))
+
+
+# Delete Venue
+# ---------------------------------------------
+@bp.route('/venues/<venue_id>/delete', methods=['DELETE'])
+def delete_venue(venue_id):
+    try:
+        # delete venue data row using given_id
+        Venue.query.filter(Venue.id == venue_id).delete()
+        db.session.commit()
+        invalidate_venue(venue_id)
+        flash(f'Venue id {venue_id} was successfully deleted!')
+    # Error Handling
+    # error Method Not Allowed
+    except MethodNotAllowed as mt:
+        db.session.rollback()
+        abort(405)
+    except BadRequest:
+        db.session.rollback()
+        abort(400)
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error: {str(sys.exc_info()[0])}')
+    finally:
+        db.session.close()
+    return redirect(url_for('pages.index'))